@@ -1,24 +1,125 @@
+import asyncio
 import json
 import logging
+import math
+import os
 import ssl
 import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-import threading
 
+import numpy as np
 import paho.mqtt.client as mqtt
 import uvicorn
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from datetime import date, datetime, timezone
+from itertools import islice
+from typing import List, Optional
 
-from ml_predit import MaizeETCPredictor
-from openweather import WeatherETcCalculator
+from fastapi import FastAPI, Path as PathParam, Query, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
 
-app = FastAPI()
+from components import LazyComponent, startup_report
+from crop_kc import CROPS, DEFAULT_CROP
+from decision_log import DecisionLog, read_day
+from irrigation import compute_eto_sites, decide, motor_decisions_hysteresis, plan_horizon
+from metrics import (
+    CONTENT_TYPE, CONTROL_LOOP_LAST_RUN, DEVICES_REGISTERED, HTTP_REQUEST_SECONDS, MOTOR_COMMANDS,
+    MOTOR_COMMANDS_PENDING, MQTT_CONNECTED, SENSOR_INGEST_SECONDS, SENSOR_MESSAGES, render,
+)
+from ml_predit import MaizeETCPredictor, parse_weights
+from motor_commands import MotorCommandPublisher
+from mqtt_async import AsyncMqttClient
+from openweather import (
+    DEFAULT_ALTITUDE, DEFAULT_LAT, DEFAULT_LON, DEFAULT_SITE, WeatherService, close_async_client, get_async_client,
+)
+from sensor_store import DEFAULT_DEVICE, SensorStore, start_of_today
+from shared_state import (
+    DEVICE_ID_BYTES, NAME_PATTERN, SITE_BYTES, SharedSensorView, SharedState, acquire_ingest_lock, check_name,
+    check_registration, decision, default_path, registration,
+)
 
-maize_predictor = MaizeETCPredictor()
-weather_calculator = WeatherETcCalculator()
 
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s %(levelname)s %(message)s")
+@asynccontextmanager
+async def lifespan(app):
+    log_config()
+    role = await setup_shared_state()
+    # HTTP-only workers never connect to the broker (see SHARED_STATE_PATH)
+    components = READER_COMPONENTS if role == "reader" else COMPONENTS
+
+    # Nothing heavy happens at import time; the components are independent,
+    # so they are built concurrently off the event loop.
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(None, component.get) for component in components),
+        return_exceptions=True,
+    )
+    startup_state["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    for component, result in zip(components, results):
+        report = component.report()
+        if isinstance(result, Exception):
+            _LOGGER.error("Startup: %s failed after %s ms: %s", component.name, report["ms"], result)
+        else:
+            _LOGGER.info("Startup: %s ready in %s ms", component.name, report["ms"])
+    _LOGGER.info("Startup complete in %s ms", startup_state["total_ms"])
+
+    # The service is useless without its models; MQTT may come up degraded
+    predictor = predictor_component.get()
+    _LOGGER.info(
+        "ETo models ready: %s (load=%.1f ms, warm-up=%.2f ms)",
+        ", ".join(predictor.models),
+        predictor.load_seconds * 1000,
+        predictor.warmup_seconds * 1000,
+    )
+
+    if role == "reader":
+        yield
+        await close_async_client()
+        return
+
+    mqtt_clients = [c.get_or_none() for c in (sensor_mqtt_component, motor_mqtt_component)]
+    mqtt_clients = [client for client in mqtt_clients if client is not None]
+    for client in mqtt_clients:
+        await client.start()
+    await motor_commands.start()
+    decision_log.start()
+    tasks = [asyncio.create_task(run_control_loop())]
+    if role == "ingest":
+        tasks.append(asyncio.create_task(run_shared_sync_loop()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    await motor_commands.stop()
+    for client in mqtt_clients:
+        await client.stop()
+    await close_async_client()
+    await loop.run_in_executor(None, decision_log.stop)
+    sensor_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Comma-separated subset of ml_predit.MODEL_FILES, combined with ETO_ENSEMBLE;
+# ETO_ENSEMBLE=weighted takes ETO_WEIGHTS, e.g. "lightgbm=2,xgboost=1"
+ETO_MODELS = [name.strip() for name in os.getenv("ETO_MODELS", "lightgbm").split(",") if name.strip()]
+ETO_ENSEMBLE = os.getenv("ETO_ENSEMBLE", "mean")
+ETO_WEIGHTS = parse_weights(os.getenv("ETO_WEIGHTS"))
+
+# One calculator per site; sites in the same grid cell share a forecast fetch.
+# WEATHER_SITES_FILE: JSON {"site_id": {"lat": .., "lon": .., "altitude": ..}}
+weather_service = WeatherService()
+weather_service.add_site(DEFAULT_SITE, DEFAULT_LAT, DEFAULT_LON, DEFAULT_ALTITUDE)
+if os.getenv("WEATHER_SITES_FILE"):
+    weather_service.load_sites(os.getenv("WEATHER_SITES_FILE"))
+weather_calculator = weather_service.calculator(DEFAULT_SITE)
+
+# DEBUG adds per-message / per-prediction detail; keep it off in production
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
 _LOGGER = logging.getLogger(__name__)
 
 # ---------- CONFIG ----------
@@ -26,55 +127,151 @@ AWS_IOT_ENDPOINT = "a25qi08bvrm85c-ats.iot.ap-south-1.amazonaws.com"
 
 # Sensor subscriber client (receives data from Arduino)
 SENSOR_CLIENT_ID = "iotconsole-bc2ee19b-6a70-4846-9ae7-487339ff8ff0"
-SENSOR_TOPIC = "irregation/pub"
+SENSOR_TOPIC = "irregation/pub"                 # legacy single node -> DEFAULT_DEVICE
+SENSOR_TOPIC_FILTER = "irregation/+/pub"        # one topic per node: irregation/<device_id>/pub
 
 # Motor publisher client (sends commands to Arduino)
 MOTOR_CLIENT_ID = "python-backend-irrigation-api"
-MOTOR_TOPIC = "irregation/motor"
+MOTOR_TOPIC = "irregation/motor"                # legacy single relay
+MOTOR_TOPIC_TEMPLATE = "irregation/{device_id}/motor"
 
 PORT = 8883
 # ----------------------------
 
-latest_water_flow = None
-latest_soil_moisture = None
+# Telemetry history per device; SENSOR_SEGMENT_DIR enables on-disk spill.
+# Buffers grow with use up to retention x SENSOR_MAX_RATE_HZ samples per device;
+# telemetry from more than SENSOR_MAX_DEVICES distinct ids is dropped.
+SENSOR_RETENTION_SECONDS = int(os.getenv("SENSOR_RETENTION_SECONDS", "86400"))
+sensor_store = SensorStore(
+    retention=SENSOR_RETENTION_SECONDS,
+    rate_hz=float(os.getenv("SENSOR_MAX_RATE_HZ", "1")),
+    segment_dir=os.getenv("SENSOR_SEGMENT_DIR") or None,
+    max_devices=int(os.getenv("SENSOR_MAX_DEVICES", "10000")),
+)
 
+# Every motor decision (inputs, ETc, threshold, motor state) is queued here and
+# written by a background thread, one JSON-lines file per UTC day
+decision_log = DecisionLog(
+    os.getenv("DECISION_LOG_DIR", os.path.join("logs", "decisions")),
+    max_bytes=int(os.getenv("DECISION_LOG_MAX_MB", "64")) * 1024 * 1024,
+    compress=os.getenv("DECISION_LOG_COMPRESS", "0") == "1",
+)
 
-# ========= MQTT CALLBACKS =========
+# Multi-worker mode (uvicorn --workers N): set SHARED_STATE_PATH to a file
+# every worker can map (e.g. /dev/shm/irrigation-state). The worker that wins
+# the ingest lock ("ingest") runs MQTT, the control loop and the decision log
+# and publishes telemetry / decisions there; the others ("reader") serve HTTP
+# from it. Unset: single process, everything in memory.
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH") or None
+SHARED_STATE_ROLE = os.getenv("SHARED_STATE_ROLE", "auto")     # auto | ingest | reader
+SHARED_STATE_WAIT_SECONDS = float(os.getenv("SHARED_STATE_WAIT_SECONDS", "30"))
+SHARED_SYNC_SECONDS = float(os.getenv("SHARED_SYNC_SECONDS", "1"))
+SHARED_EVALUATE_TIMEOUT = float(os.getenv("SHARED_EVALUATE_TIMEOUT", "30"))
+shared = {"state": None, "role": "single", "lock": None, "registrations": None, "pending": set()}
 
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        _LOGGER.info("Connected to AWS IoT (rc=%s)", rc)
-        # Subscribe to sensor data from Arduino
-        client.subscribe(SENSOR_TOPIC, qos=1)
-        _LOGGER.info("Subscribed to SENSOR_TOPIC: %s", SENSOR_TOPIC)
-    else:
-        _LOGGER.error("Connection failed with rc=%s", rc)
+# Where HTTP handlers read telemetry: sensor_store, or the shared table in readers
+telemetry = sensor_store
 
 
-def on_disconnect(client, userdata, rc):
-    _LOGGER.warning("Disconnected (rc=%s)", rc)
+# Sowing date, crop and weather site per device, used to derive DAS / Kc / ETo for fleet evaluation
+device_sowing = {}
+device_crop = {}
+device_site = {}
 
+# Background control loop: ETo is refreshed every CONTROL_INTERVAL_SECONDS
+# for every site in use (top-level weather / ETo are the default site's),
+# decisions are re-evaluated on every telemetry packet, and motor commands go
+# through motor_commands (deduplicated against the last acked state).
+CONTROL_INTERVAL_SECONDS = int(os.getenv("CONTROL_INTERVAL_SECONDS", "300"))
+control_state = {
+    "computed_at": None,
+    "weather": None,
+    "predicted_eto": None,
+    "calculated_eto": None,
+    "sites": {},
+    "devices": {}
+}
 
-def on_message(client, userdata, msg):
-    global latest_water_flow, latest_soil_moisture
+# Dead band of the motor rule: a stopped pump restarts only once water flow is
+# MOTOR_FLOW_HYSTERESIS L below the ETc threshold and soil moisture
+# MOTOR_MOISTURE_HYSTERESIS % below the limit.
+MOTOR_FLOW_HYSTERESIS = float(os.getenv("MOTOR_FLOW_HYSTERESIS", "0"))
+MOTOR_MOISTURE_HYSTERESIS = float(os.getenv("MOTOR_MOISTURE_HYSTERESIS", "1"))
 
-    try:
-        payload = msg.payload.decode("utf-8")
-        payload_json = json.loads(payload)
-    except Exception as e:
-        _LOGGER.warning("Failed to decode message: %s", e)
-        return
 
-    _LOGGER.info("Message on topic %s: %s", msg.topic, payload)
+def device_id_for(topic, payload_json):
+    """Device id from the payload, else from irregation/<device_id>/pub."""
+    if payload_json.get("device_id"):
+        return str(payload_json["device_id"])
+    if topic == SENSOR_TOPIC:
+        return DEFAULT_DEVICE
+    parts = topic.split("/")
+    return parts[1] if len(parts) == 3 else DEFAULT_DEVICE
 
-    if msg.topic == SENSOR_TOPIC:
-        latest_water_flow = payload_json.get("volume_l", 0) / 1000  # Convert to L
-        latest_soil_moisture = payload_json.get("soil_moisture_pct", 0)
 
-        _LOGGER.info(
-            "Sensor data received → water_flow=%.3f L, soil_moisture=%.1f%%",
-            latest_water_flow, latest_soil_moisture
-        )
+def motor_topic_for(device_id):
+    return MOTOR_TOPIC if device_id == DEFAULT_DEVICE else MOTOR_TOPIC_TEMPLATE.format(device_id=device_id)
+
+
+# ========= MQTT MESSAGE HANDLER =========
+
+def on_message(topic, payload_bytes):
+    """Sensor telemetry handler, dispatched from the MQTT client's message queue."""
+    with SENSOR_INGEST_SECONDS.time():
+        try:
+            payload = payload_bytes.decode("utf-8")
+            payload_json = json.loads(payload)
+            if not isinstance(payload_json, dict):
+                raise ValueError(f"expected a JSON object, got {type(payload_json).__name__}")
+        except Exception as e:
+            SENSOR_MESSAGES.labels("invalid").inc()
+            _LOGGER.warning("Failed to decode message: %s", e)
+            return
+
+        debug = _LOGGER.isEnabledFor(logging.DEBUG)
+        if debug:
+            _LOGGER.debug("Message on topic %s: %s", topic, payload)
+
+        if not (mqtt.topic_matches_sub(SENSOR_TOPIC, topic) or mqtt.topic_matches_sub(SENSOR_TOPIC_FILTER, topic)):
+            SENSOR_MESSAGES.labels("ignored").inc()
+            return
+
+        device_id = device_id_for(topic, payload_json)
+        try:
+            check_name("Device id", device_id, DEVICE_ID_BYTES)
+        except ValueError as e:
+            SENSOR_MESSAGES.labels("invalid").inc()
+            _LOGGER.warning("Rejected message on %s: %s", topic, e)
+            return
+        try:
+            water_flow = float(payload_json.get("volume_l", 0)) / 1000  # Convert to L
+            soil_moisture = float(payload_json.get("soil_moisture_pct", 0))
+            if not (math.isfinite(water_flow) and math.isfinite(soil_moisture)):
+                raise ValueError("non-finite reading")
+        except (TypeError, ValueError) as e:
+            SENSOR_MESSAGES.labels("invalid").inc()
+            _LOGGER.warning("Rejected message from %s: %s", device_id, e)
+            return
+        previous = sensor_store.latest(device_id)
+        try:
+            sensor_store.ingest(device_id, water_flow, soil_moisture)
+        except ValueError as e:
+            SENSOR_MESSAGES.labels("rejected").inc()
+            _LOGGER.warning("Dropped message from %s: %s", device_id, e)
+            return
+        publish_telemetry(device_id)
+        if previous is not None and time.time() - previous[0] > DEVICE_SILENCE_SECONDS:
+            motor_commands.refresh(device_id)
+        SENSOR_MESSAGES.labels("ok").inc()
+
+        if debug:
+            _LOGGER.debug(
+                "Sensor data received from %s → water_flow=%.3f L, soil_moisture=%.1f%%",
+                device_id, water_flow, soil_moisture
+            )
+
+        # Re-run the motor rule for this device with the cached ETo
+        reevaluate([device_id], source="telemetry")
 
 
 # ========= CREATE MQTT CLIENTS =========
@@ -91,17 +288,8 @@ MOTOR_KEYFILE = Path(r"motor_certs\4dd7563f753ce07f741656e55880b94d90ced655465f7
 
 
 def create_mqtt_client(client_id, root_ca, certfile, keyfile, client_type="sensor"):
-    """Create and configure MQTT client with TLS."""
-    client = mqtt.Client(client_id=client_id, clean_session=True)
-
-    if client_type == "sensor":
-        client.on_connect = on_connect
-        client.on_disconnect = on_disconnect
-        client.on_message = on_message
-    else:
-        # Motor publisher doesn't need message callback
-        client.on_connect = lambda c, u, f, rc: _LOGGER.info("Motor publisher connected (rc=%s)", rc)
-        client.on_disconnect = lambda c, u, rc: _LOGGER.warning("Motor publisher disconnected (rc=%s)", rc)
+    """Create and configure MQTT client with TLS (callbacks are set by AsyncMqttClient)."""
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id, clean_session=True)
 
     # Verify certificate files exist
     if not (root_ca.exists() and certfile.exists() and keyfile.exists()):
@@ -109,7 +297,7 @@ def create_mqtt_client(client_id, root_ca, certfile, keyfile, client_type="senso
         _LOGGER.error("  ROOT_CA: %s (exists: %s)", root_ca, root_ca.exists())
         _LOGGER.error("  CERTFILE: %s (exists: %s)", certfile, certfile.exists())
         _LOGGER.error("  KEYFILE: %s (exists: %s)", keyfile, keyfile.exists())
-        raise SystemExit(1)
+        raise FileNotFoundError(f"certificate files not found for {client_type} client")
 
     tls_version = getattr(ssl, "PROTOCOL_TLS_CLIENT", ssl.PROTOCOL_TLSv1_2)
 
@@ -130,83 +318,53 @@ def create_mqtt_client(client_id, root_ca, certfile, keyfile, client_type="senso
     return client
 
 
-# Create both clients
-sensor_client = create_mqtt_client(SENSOR_CLIENT_ID, SENSOR_ROOT_CA, SENSOR_CERTFILE, SENSOR_KEYFILE, "sensor")
-motor_client = create_mqtt_client(MOTOR_CLIENT_ID, MOTOR_ROOT_CA, MOTOR_CERTFILE, MOTOR_KEYFILE, "motor")
+def log_config():
+    _LOGGER.info("Python Backend Configuration:")
+    _LOGGER.info("  AWS Endpoint: %s", AWS_IOT_ENDPOINT)
+    _LOGGER.info("  Sensor Client ID: %s", SENSOR_CLIENT_ID)
+    _LOGGER.info("  Motor Client ID: %s", MOTOR_CLIENT_ID)
+    _LOGGER.info("  Sensor Topic (Subscribe): %s", SENSOR_TOPIC)
+    _LOGGER.info("  Motor Topic (Publish): %s", MOTOR_TOPIC)
 
 
-sensor_loop_started = False
-motor_loop_started = False
+# ========= COMPONENTS =========
+# Built by the lifespan (or on first use), never at import time.
 
-_LOGGER.info("Python Backend Configuration:")
-_LOGGER.info("  AWS Endpoint: %s", AWS_IOT_ENDPOINT)
-_LOGGER.info("  Sensor Client ID: %s", SENSOR_CLIENT_ID)
-_LOGGER.info("  Motor Client ID: %s", MOTOR_CLIENT_ID)
-_LOGGER.info("  Sensor Topic (Subscribe): %s", SENSOR_TOPIC)
-_LOGGER.info("  Motor Topic (Publish): %s", MOTOR_TOPIC)
+def build_predictor():
+    predictor = MaizeETCPredictor(lazy=True, models=ETO_MODELS, ensemble=ETO_ENSEMBLE, weights=ETO_WEIGHTS)
+    predictor.warm_up()
+    return predictor
 
 
-def mqtt_sensor_loop():
-    """Continuous MQTT connection loop for sensor subscriber with automatic reconnection."""
-    global sensor_loop_started
-    attempt = 0
-    max_backoff = 30
-    
-    # Start the network loop once
-    if not sensor_loop_started:
-        sensor_client.loop_start()
-        sensor_loop_started = True
-    
-    while True:
-        if not sensor_client.is_connected():
-            try:
-                _LOGGER.info("Attempting sensor client connect (attempt=%d)", attempt + 1)
-                sensor_client.connect(AWS_IOT_ENDPOINT, PORT, keepalive=60)
-                attempt = 0
-            except Exception as e:
-                _LOGGER.warning("Sensor connect failed: %s", e)
-                wait_seconds = min(1 << attempt if attempt < 6 else max_backoff, max_backoff)
-                _LOGGER.info("Waiting %d seconds before retry...", wait_seconds)
-                time.sleep(wait_seconds)
-                attempt += 1
-                continue
-        
-        time.sleep(1)
-
-
-def mqtt_motor_loop():
-    """Continuous MQTT connection loop for motor publisher with automatic reconnection."""
-    global motor_loop_started
-    attempt = 0
-    max_backoff = 30
-    
-    # Start the network loop once
-    if not motor_loop_started:
-        motor_client.loop_start()
-        motor_loop_started = True
-    
-    while True:
-        if not motor_client.is_connected():
-            try:
-                _LOGGER.info("Attempting motor client connect (attempt=%d)", attempt + 1)
-                motor_client.connect(AWS_IOT_ENDPOINT, PORT, keepalive=60)
-                attempt = 0
-            except Exception as e:
-                _LOGGER.warning("Motor connect failed: %s", e)
-                wait_seconds = min(1 << attempt if attempt < 6 else max_backoff, max_backoff)
-                _LOGGER.info("Waiting %d seconds before retry...", wait_seconds)
-                time.sleep(wait_seconds)
-                attempt += 1
-                continue
-        
-        time.sleep(1)
+def build_sensor_mqtt():
+    client = create_mqtt_client(SENSOR_CLIENT_ID, SENSOR_ROOT_CA, SENSOR_CERTFILE, SENSOR_KEYFILE, "sensor")
+    return AsyncMqttClient(
+        client, AWS_IOT_ENDPOINT, PORT, keepalive=60,
+        subscriptions=[(SENSOR_TOPIC, 1), (SENSOR_TOPIC_FILTER, 1)],
+        on_message=on_message,
+        name="sensor",
+    )
+
+
+def build_motor_mqtt():
+    client = create_mqtt_client(MOTOR_CLIENT_ID, MOTOR_ROOT_CA, MOTOR_CERTFILE, MOTOR_KEYFILE, "motor")
+    return AsyncMqttClient(client, AWS_IOT_ENDPOINT, PORT, keepalive=60, name="motor")
+
 
+predictor_component = LazyComponent("eto_models", build_predictor)
+sensor_mqtt_component = LazyComponent("sensor_mqtt", build_sensor_mqtt)
+motor_mqtt_component = LazyComponent("motor_mqtt", build_motor_mqtt)
+http_client_component = LazyComponent("http_client", get_async_client)
 
-mqtt_thread = threading.Thread(target=mqtt_sensor_loop, daemon=True)
-mqtt_thread.start()
+COMPONENTS = [predictor_component, sensor_mqtt_component, motor_mqtt_component, http_client_component]
+READER_COMPONENTS = [predictor_component, http_client_component]
+startup_state = {"total_ms": None, "role": "single"}
 
-mqtt_motor_thread = threading.Thread(target=mqtt_motor_loop, daemon=True)
-mqtt_motor_thread.start()
+
+def mqtt_connected(component):
+    """False until the client has been built and is connected."""
+    client = component.get_or_none()
+    return client is not None and client.is_connected()
 
 
 # ========= FASTAPI ROUTE =========
@@ -214,54 +372,369 @@ mqtt_motor_thread.start()
 @app.get("/status")
 def get_status():
     """Check MQTT connection status and sensor data."""
+    latest = telemetry.latest(DEFAULT_DEVICE)
     return JSONResponse(
         content={
-            "sensor_client_connected": sensor_client.is_connected(),
-            "motor_client_connected": motor_client.is_connected(),
-            "latest_water_flow": latest_water_flow,
-            "latest_soil_moisture": latest_soil_moisture
+            "sensor_client_connected": client_connected(sensor_mqtt_component, "sensor_connected"),
+            "motor_client_connected": client_connected(motor_mqtt_component, "motor_connected"),
+            "latest_water_flow": latest[1] if latest else None,
+            "latest_soil_moisture": latest[2] if latest else None,
+            "today": telemetry.aggregate(DEFAULT_DEVICE, start_of_today())
         }
     )
 
 
+def build_pred_input(weather_data):
+    """Model input dict (feature order matters) from aggregated weather; values may be arrays."""
+    return {
+        "min_temp": weather_data["min_temp"],
+        "max_temp": weather_data["max_temp"],
+        "humidity": np.round(weather_data["humidity"], 2),
+        "wind": np.round(weather_data["wind"], 2),
+        "sun_hours": np.round(weather_data["sun_hours"], 2),
+        "radiation": weather_data["radiation"]
+    }
+
+
+class FieldWeather(BaseModel):
+    min_temp: float
+    max_temp: float
+    humidity: float
+    wind: float
+    sun_hours: float
+    radiation: float
+
+
+class FieldRecord(BaseModel):
+    das: int = Field(ge=0)
+    crop: str = DEFAULT_CROP
+    # Falls back to today's cached forecast when omitted
+    weather: Optional[FieldWeather] = None
+
+
+class BatchEtcRequest(BaseModel):
+    records: List[FieldRecord]
+
+
+def publish_motor(device_id, motor_status, on_ack=None):
+    """Queue {"motor": bool} for one device's relay topic (sent once connected)."""
+    topic = motor_topic_for(device_id)
+    motor_mqtt = motor_mqtt_component.get_or_none()
+    if motor_mqtt is None:
+        _LOGGER.warning("Motor client unavailable - command for %s dropped", device_id)
+        return False
+    if not motor_mqtt.is_connected():
+        _LOGGER.warning("Motor client not connected - command for %s queued", device_id)
+    return motor_mqtt.publish_nowait(topic, json.dumps({"motor": motor_status}), qos=1, on_ack=on_ack)
+
+
+# Duplicate decisions are suppressed and bursts coalesced before publishing
+motor_commands = MotorCommandPublisher(
+    publish_motor,
+    coalesce_seconds=float(os.getenv("MOTOR_COALESCE_SECONDS", "0.5")),
+    min_dwell=float(os.getenv("MOTOR_MIN_DWELL_SECONDS", "30")),
+    refresh_interval=float(os.getenv("MOTOR_REFRESH_SECONDS", "600")),
+)
+
+# A node silent for longer than this is assumed to have rebooted when it
+# reports again, so its relay is sent the current state once more
+DEVICE_SILENCE_SECONDS = float(os.getenv("DEVICE_SILENCE_SECONDS", "300"))
+
+
+# ========= METRICS =========
+# Connection state and counters owned by other objects are read on scrape
+
+MQTT_CONNECTED.labels("sensor").set_function(lambda: mqtt_connected(sensor_mqtt_component))
+MQTT_CONNECTED.labels("motor").set_function(lambda: mqtt_connected(motor_mqtt_component))
+for outcome in ("submitted", "sent", "suppressed", "coalesced", "held", "acked", "retried", "failed", "refreshed"):
+    MOTOR_COMMANDS.labels(outcome).set_function(lambda outcome=outcome: getattr(motor_commands, outcome))
+MOTOR_COMMANDS_PENDING.set_function(lambda: motor_commands.stats()["pending"])
+CONTROL_LOOP_LAST_RUN.set_function(lambda: control_state["computed_at"] or 0)
+DEVICES_REGISTERED.set_function(lambda: len(device_sowing))
+
+
+# ========= SHARED STATE (multi-worker) =========
+
+async def setup_shared_state():
+    """Pick this worker's role (single / ingest / reader) and map the shared table."""
+    global telemetry
+    if not SHARED_STATE_PATH:
+        return "single"
+
+    lock = None if SHARED_STATE_ROLE == "reader" else acquire_ingest_lock(SHARED_STATE_PATH)
+    if lock is None and SHARED_STATE_ROLE == "ingest":
+        raise RuntimeError(f"Another process holds the ingest lock of {SHARED_STATE_PATH}")
+
+    if lock is not None:
+        # keep registrations published by a previous ingest worker across a restart
+        sites, rows = {}, []
+        previous = SharedState.open(SHARED_STATE_PATH)
+        if previous is not None:
+            with previous:
+                sites = previous.get_blob("sites", {})
+                rows = previous.read_all()
+        state = SharedState(SHARED_STATE_PATH, create=True)
+        shared.update(state=state, role="ingest", lock=lock)
+        state.put_blob("sites", {
+            **{site_id: site._asdict() for site_id, site in weather_service.sites.items()},
+            **sites,
+        })
+        for row in rows:
+            if registration(row) is not None:
+                sowing, crop, site = registration(row)
+                state.register(row["device_id"].decode("utf-8"), date.fromordinal(sowing), crop, site)
+    else:
+        deadline = time.monotonic() + SHARED_STATE_WAIT_SECONDS
+        while (state := SharedState.open(SHARED_STATE_PATH)) is None:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"No ingest worker created {SHARED_STATE_PATH}")
+            await asyncio.sleep(0.1)
+        shared.update(state=state, role="reader")
+        telemetry = SharedSensorView(state)
+
+    sync_registrations()
+    startup_state["role"] = shared["role"]
+    _LOGGER.info("Shared state %s: %s worker (pid %d)", SHARED_STATE_PATH, shared["role"], os.getpid())
+    return shared["role"]
+
+
+def is_reader():
+    return shared["role"] == "reader"
+
+
+def sync_registrations():
+    """
+    Load device / site registrations made by other workers into the local
+    dicts. A no-op unless the registration counter moved. Devices whose
+    registration changed are queued for the ingest worker to re-evaluate.
+    """
+    state = shared["state"]
+    if state is None:
+        return
+    generation = state.get("registrations")
+    if generation == shared["registrations"]:
+        return
+    shared["registrations"] = generation
+
+    for site_id, site in state.get_blob("sites", {}).items():
+        if weather_service.sites.get(site_id) != (site["lat"], site["lon"], site["altitude"]):
+            weather_service.add_site(site_id, site["lat"], site["lon"], site["altitude"])
+
+    for row in state.read_all():
+        entry = registration(row)
+        if entry is None:
+            continue
+        device_id = row["device_id"].decode("utf-8")
+        sowing, crop, site = date.fromordinal(entry[0]), entry[1], entry[2]
+        if (device_sowing.get(device_id), device_crop.get(device_id), device_site.get(device_id)) != (sowing, crop, site):
+            device_sowing[device_id] = sowing
+            device_crop[device_id] = crop
+            device_site[device_id] = site
+            if shared["role"] == "ingest":
+                shared["pending"].add(device_id)
+
+
+def register_device(device_id, sowing_date, crop, site):
+    """Store a device's registration locally and, if it changed, for the other workers."""
+    changed = (device_sowing.get(device_id), device_crop.get(device_id), device_site.get(device_id)) != (
+        sowing_date, crop, site)
+    device_sowing[device_id] = sowing_date
+    device_crop[device_id] = crop
+    device_site[device_id] = site
+    if changed and shared["state"] is not None:
+        shared["state"].register(device_id, sowing_date, crop, site)
+        if is_reader():
+            return
+        shared["pending"].add(device_id)
+
+
+def register_site(site_id, lat, lon, altitude):
+    calculator = weather_service.add_site(site_id, lat, lon, altitude)
+    state = shared["state"]
+    if state is not None:
+        site = {"lat": lat, "lon": lon, "altitude": altitude}
+        state.update_blob("sites", lambda sites: {**sites, site_id: site}, {})
+        state.bump("registrations")
+    return calculator
+
+
+def publish_telemetry(device_id):
+    """Ingest worker: copy a device's latest sample and today's aggregate to the shared table."""
+    if shared["role"] != "ingest":
+        return
+    midnight = start_of_today()
+    shared["state"].update_sensor(
+        device_id, sensor_store.latest(device_id), sensor_store.aggregate(device_id, midnight), midnight
+    )
+
+
+def client_connected(component, field):
+    """MQTT connection flag; readers see the ingest worker's clients."""
+    if is_reader():
+        return bool(shared["state"].get(field))
+    return mqtt_connected(component)
+
+
+def motor_state(device_id):
+    """Current commanded motor state; readers use the last published decision."""
+    if not is_reader():
+        return motor_commands.state(device_id)
+    row = shared["state"].read(device_id)
+    last = decision(row) if row is not None else None
+    return bool(last["motor"]) if last else False
+
+
+def motors_report():
+    return {
+        "stats": motor_commands.stats(),
+        "motors": {device_id: motor.as_dict() for device_id, motor in sorted(motor_commands.motors.items())}
+    }
+
+
+def state_report():
+    """control_state; readers rebuild it from the control document and the device rows."""
+    if not is_reader():
+        return control_state
+    devices = {}
+    for row in shared["state"].read_all():
+        last = decision(row)
+        if last is not None:
+            devices[row["device_id"].decode("utf-8")] = last
+    return {**shared["state"].get_blob("control", {}), "devices": dict(sorted(devices.items()))}
+
+
+async def request_evaluation():
+    """Reader: ask the ingest worker for an ETo refresh + re-evaluation and wait for it."""
+    state = shared["state"]
+    target = state.bump("evaluate_requests")
+    deadline = time.monotonic() + SHARED_EVALUATE_TIMEOUT
+    while state.get("evaluations") < target:
+        if time.monotonic() > deadline:
+            raise TimeoutError("Ingest worker did not evaluate in time")
+        await asyncio.sleep(0.05)
+
+
+async def run_shared_sync_loop():
+    """
+    Ingest worker: publish MQTT / motor status for the HTTP workers, pick up
+    registrations they made and serve their evaluation requests.
+    """
+    state = shared["state"]
+    while True:
+        try:
+            state.set_fields(
+                heartbeat=time.time(),
+                sensor_connected=int(mqtt_connected(sensor_mqtt_component)),
+                motor_connected=int(mqtt_connected(motor_mqtt_component)),
+            )
+            state.put_blob("motors", motors_report())
+            sync_registrations()
+
+            requested = state.get("evaluate_requests")
+            if requested > state.get("evaluations"):
+                shared["pending"].clear()
+                try:
+                    await refresh_eto()
+                    reevaluate(source="evaluate")
+                finally:
+                    # answered even on failure; the reader reports what is in the table
+                    state.set_fields(evaluations=requested)
+            elif shared["pending"]:
+                pending, shared["pending"] = shared["pending"], set()
+                # a device on a new site has no ETo until its weather is fetched
+                if any(device_site.get(d, DEFAULT_SITE) not in control_state["sites"] for d in pending):
+                    await refresh_eto()
+                reevaluate(pending, source="registration")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _LOGGER.error("Shared state sync failed: %s", e)
+        await asyncio.sleep(SHARED_SYNC_SECONDS)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # registrations made through other workers (a counter read when nothing changed)
+    sync_registrations()
+    start = time.perf_counter()
+    response = await call_next(request)
+    # route template (e.g. /devices/{device_id}) keeps label cardinality bounded
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_SECONDS.labels(request.method, path, response.status_code).observe(time.perf_counter() - start)
+    return response
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of the hot-path metrics."""
+    return Response(content=render(), media_type=CONTENT_TYPE)
+
+
+def unknown_site(site):
+    return JSONResponse(status_code=400, content={"status": "error", "detail": f"Unknown site: {site}"})
+
+
 @app.get("/awsData")
-def get_latest_payload(das: int):
+async def get_latest_payload(das: int = Query(ge=0), site: str = DEFAULT_SITE):
     """Calculate ETC and publish motor control command."""
+    if site not in weather_service.sites:
+        return unknown_site(site)
+    calculator = weather_service.calculator(site)
 
     # 1. Weather
-    weather_data = weather_calculator.get_weather_data()
+    weather_data = await calculator.get_weather_data()
 
-    pred_input = {
-        "min_temp": weather_data["min_temp"],
-        "max_temp": weather_data["max_temp"],
-        "humidity": round(weather_data["humidity"], 2),
-        "wind": round(weather_data["wind"], 2),
-        "sun_hours": round(weather_data["sun_hours"],2),
-        "radiation": weather_data["radiation"]
-    }
+    pred_input = build_pred_input(weather_data)
 
-    # 2. ML & FAO predictions
-    pred_etc = maize_predictor.predict_etc(pred_input, das)
-    calc_etc = weather_calculator.calculate_etc(das)
+    # 2. ML & FAO predictions (model inference runs off the event loop)
+    loop = asyncio.get_running_loop()
+    pred_etc, calc_etc = await asyncio.gather(
+        loop.run_in_executor(None, predictor_component.get().predict_etc, pred_input, das),
+        calculator.calculate_etc(das, weather_data),
+    )
 
     # 3. MQTT sensor values
-    wf = round(latest_water_flow,2) if latest_water_flow is not None else 0
-    sm = latest_soil_moisture if latest_soil_moisture is not None else 0
+    # Water delivered so far today (not the raw last packet) vs. current soil moisture
+    latest = telemetry.latest(DEFAULT_DEVICE)
+    wf = round(telemetry.delivered_today(DEFAULT_DEVICE), 2)
+    sm = latest[2] if latest else 0
 
     # 4. Motor rule
     threshold = min(pred_etc["etc"], calc_etc["etc"])
-    motor_status = not (wf > threshold or sm > 15)
+    motor_status = bool(motor_decisions_hysteresis(
+        wf, sm, threshold, [motor_state(DEFAULT_DEVICE)],
+        MOTOR_FLOW_HYSTERESIS, MOTOR_MOISTURE_HYSTERESIS,
+    )[0])
 
-    # 5. Publish command
-    if motor_client and motor_client.is_connected():
-        try:
-            payload = json.dumps({"motor": motor_status})
-            result = motor_client.publish(MOTOR_TOPIC, payload, qos=1)
-            _LOGGER.info("Published to %s: %s (result=%s)", MOTOR_TOPIC, payload, result.rc)
-        except Exception as e:
-            _LOGGER.error("Failed to publish motor command: %s", e)
-    else:
-        _LOGGER.warning("Motor client not connected - cannot publish motor command")
+    # Only a poll for the default relay's own site drives (and registers) it;
+    # other sites just get the computed payload
+    actuate = site == device_site.get(DEFAULT_DEVICE, DEFAULT_SITE)
+
+    # The control loop keeps this relay up to date between polls
+    if actuate:
+        register_device(
+            DEFAULT_DEVICE, date.fromordinal(date.today().toordinal() - das),
+            device_crop.get(DEFAULT_DEVICE, DEFAULT_CROP), site,
+        )
+
+    # 5. Publish command (only when it differs from the relay's acked state);
+    # HTTP-only workers leave the relay to the ingest worker's re-evaluation
+    if actuate and not is_reader():
+        motor_commands.submit(DEFAULT_DEVICE, motor_status)
+        decision_log.log({
+            "source": "awsData",
+            "device_id": DEFAULT_DEVICE,
+            "site": site,
+            "das": das,
+            "weather": pred_input,
+            "water_flow": wf,
+            "soil_moisture": sm,
+            "predicted_etc": pred_etc["etc"],
+            "calculated_etc": calc_etc["etc"],
+            "threshold": threshold,
+            "motor": motor_status,
+        })
 
     # 6. FINAL RESPONSE (Old structure + new structure + new params)
     return JSONResponse(
@@ -269,8 +742,8 @@ def get_latest_payload(das: int):
             "status": "success",
 
             # NEW debug parameters (keep these)
-            "sensor_client_connected": sensor_client.is_connected(),
-            "motor_client_connected": motor_client.is_connected(),
+            "sensor_client_connected": client_connected(sensor_mqtt_component, "sensor_connected"),
+            "motor_client_connected": client_connected(motor_mqtt_component, "motor_connected"),
 
             # OLD structure restored
             "data": {
@@ -294,6 +767,8 @@ def get_latest_payload(das: int):
             },
             "predicted_etc": pred_etc["etc"],
             "calculated_etc": calc_etc["etc"],
+            "ensemble": pred_etc["ensemble"],
+            "model_predictions": pred_etc["models"],
             "threshold": threshold,
 
             # Motor result
@@ -302,6 +777,372 @@ def get_latest_payload(das: int):
     )
 
 
+@app.post("/awsData/batch")
+async def post_batch_etc(request: BatchEtcRequest):
+    """Predict ETc for many fields with a single model call (no motor publish)."""
+
+    if not request.records:
+        return JSONResponse(content={"status": "success", "results": []})
+
+    crops = [record.crop for record in request.records]
+    unknown = sorted(set(crops) - set(CROPS))
+    if unknown:
+        return JSONResponse(status_code=400, content={"status": "error", "detail": f"Unknown crop: {', '.join(unknown)}"})
+
+    shared_input = None
+    if any(record.weather is None for record in request.records):
+        shared_input = build_pred_input(await weather_calculator.get_weather_data())
+
+    weather_rows = [
+        record.weather.model_dump() if record.weather is not None else shared_input
+        for record in request.records
+    ]
+    das_values = [record.das for record in request.records]
+
+    loop = asyncio.get_running_loop()
+    batch = await loop.run_in_executor(
+        None, predictor_component.get().predict_etc_batch, weather_rows, das_values, crops
+    )
+
+    results = [
+        {
+            "das": das,
+            "crop": crop,
+            "eto": round(float(eto), 4),
+            "kc": round(float(kc), 3),
+            "predicted_etc": float(etc)
+        }
+        for das, crop, eto, kc, etc in zip(das_values, crops, batch["eto"], batch["kc"], batch["etc"])
+    ]
+
+    return JSONResponse(
+        content={
+            "status": "success",
+            "ensemble": batch["ensemble"],
+            "model_predictions": batch["models"],
+            "results": results
+        }
+    )
+
+
+# ========= FORECAST HORIZON =========
+
+async def forecast_plan(calculator, das, crops, weather=None):
+    """ETc plan for every forecast day and field of one site from one (cached) forecast fetch."""
+    if weather is None:
+        weather = await calculator.get_forecast_data()
+    loop = asyncio.get_running_loop()
+    plan = await loop.run_in_executor(
+        None, plan_horizon, predictor_component.get(), weather, build_pred_input(weather), das, crops,
+        calculator.altitude
+    )
+    return weather, plan
+
+
+def plan_days(weather, plan, field):
+    """Per-day rows of one field's column of the plan."""
+    return [
+        {
+            "date": day.isoformat(),
+            "das": int(plan["das"][i, field]),
+            "min_temp": round(float(weather["min_temp"][i]), 2),
+            "max_temp": round(float(weather["max_temp"][i]), 2),
+            "humidity": round(float(weather["humidity"][i]), 2),
+            "wind": round(float(weather["wind"][i]), 2),
+            "sun_hours": round(float(weather["sun_hours"][i]), 2),
+            "radiation": round(float(weather["radiation"][i]), 2),
+            "predicted_eto": round(float(plan["predicted_eto"][i]), 4),
+            "calculated_eto": round(float(plan["calculated_eto"][i]), 4),
+            "kc": round(float(plan["kc"][i, field]), 3),
+            "predicted_etc": float(plan["predicted_etc"][i, field]),
+            "calculated_etc": float(plan["calculated_etc"][i, field]),
+            "threshold": float(plan["threshold"][i, field])
+        }
+        for i, day in enumerate(plan["dates"])
+    ]
+
+
+@app.get("/forecast")
+async def get_forecast_plan(das: int = Query(ge=0), crop: str = DEFAULT_CROP, site: str = DEFAULT_SITE):
+    """Daily ETc and irrigation target (mm) over the 5-day forecast for one field."""
+    if crop not in CROPS:
+        return JSONResponse(status_code=400, content={"status": "error", "detail": f"Unknown crop: {crop}"})
+    if site not in weather_service.sites:
+        return unknown_site(site)
+
+    weather, plan = await forecast_plan(weather_service.calculator(site), [das], crop)
+    return JSONResponse(
+        content={
+            "status": "success",
+            "crop": crop,
+            "site": site,
+            "total_threshold": float(plan["total"][0]),
+            "days": plan_days(weather, plan, 0)
+        }
+    )
+
+# ========= SITES =========
+
+@app.put("/sites/{site_id}")
+def put_site(site_id: str = PathParam(pattern=NAME_PATTERN), lat: float = Query(ge=-90, le=90), lon: float = Query(ge=-180, le=180),
+             altitude: float = DEFAULT_ALTITUDE):
+    """Register / update a weather site; its forecast is shared with every site in the same grid cell."""
+    try:
+        check_name("Site", site_id, SITE_BYTES)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "detail": str(e)})
+    calculator = register_site(site_id, lat, lon, altitude)
+    return JSONResponse(content={"site_id": site_id, "lat": lat, "lon": lon, "altitude": altitude, "cell": calculator.cell})
+
+
+@app.get("/sites")
+def get_sites():
+    return JSONResponse(
+        content={
+            site_id: {**site._asdict(), "cell": weather_service.calculator(site_id).cell}
+            for site_id, site in sorted(weather_service.sites.items())
+        }
+    )
+
+# ========= MULTI-DEVICE =========
+
+@app.put("/devices/{device_id}")
+def put_device(sowing_date: date, device_id: str = PathParam(pattern=NAME_PATTERN), crop: str = DEFAULT_CROP, site: str = DEFAULT_SITE):
+    """Register / update the sowing date, crop and weather site of the field a device irrigates."""
+    if crop not in CROPS:
+        return JSONResponse(status_code=400, content={"status": "error", "detail": f"Unknown crop: {crop}"})
+    if site not in weather_service.sites:
+        return unknown_site(site)
+    try:
+        check_registration(device_id, crop, site)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "detail": str(e)})
+    register_device(device_id, sowing_date, crop, site)
+    return JSONResponse(
+        content={"device_id": device_id, "sowing_date": sowing_date.isoformat(), "crop": crop, "site": site}
+    )
+
+
+@app.get("/devices")
+def get_devices():
+    today = start_of_today()
+    return JSONResponse(
+        content={
+            device_id: {
+                "sowing_date": device_sowing[device_id].isoformat() if device_id in device_sowing else None,
+                "crop": device_crop.get(device_id, DEFAULT_CROP),
+                "site": device_site.get(device_id, DEFAULT_SITE),
+                "today": telemetry.aggregate(device_id, today)
+            }
+            for device_id in sorted(set(telemetry.devices()) | set(device_sowing))
+        }
+    )
+
+
+def evaluate_devices(device_ids=None):
+    """
+    Motor rule for the given devices (default: all with a sowing date) in one
+    batched pass, using the per-site ETo cached by the control loop.
+    Devices whose site has no ETo yet are skipped.
+    Returns {device_id: decision dict}.
+    """
+    sites = control_state["sites"]
+    device_ids = sorted(device_sowing if device_ids is None else (d for d in device_ids if d in device_sowing))
+    device_ids = [d for d in device_ids if device_site.get(d, DEFAULT_SITE) in sites]
+    if not device_ids:
+        return {}
+    site_ids = [device_site.get(device_id, DEFAULT_SITE) for device_id in device_ids]
+
+    today = date.today()
+    das = [max((today - device_sowing[device_id]).days, 0) for device_id in device_ids]
+
+    midnight = start_of_today()
+    aggregates = [sensor_store.aggregate(device_id, midnight) for device_id in device_ids]
+    latest = [sensor_store.latest(device_id) for device_id in device_ids]
+    water_flow = [agg["delivered_volume"] for agg in aggregates]
+    soil_moisture = [entry[2] if entry else 0 for entry in latest]
+
+    fleet = decide(
+        np.array([sites[site]["predicted_eto"] for site in site_ids]),
+        np.array([sites[site]["calculated_eto"] for site in site_ids]),
+        das, water_flow, soil_moisture,
+        crops=[device_crop.get(device_id, DEFAULT_CROP) for device_id in device_ids],
+        previous=[motor_commands.state(device_id) for device_id in device_ids],
+        flow_band=MOTOR_FLOW_HYSTERESIS,
+        moisture_band=MOTOR_MOISTURE_HYSTERESIS,
+    )
+
+    return {
+        device_id: {
+            "das": das[i],
+            "crop": device_crop.get(device_id, DEFAULT_CROP),
+            "site": site_ids[i],
+            "water_flow": round(water_flow[i], 2),
+            "soil_moisture": soil_moisture[i],
+            "predicted_etc": float(fleet["predicted_etc"][i]),
+            "calculated_etc": float(fleet["calculated_etc"][i]),
+            "threshold": float(fleet["threshold"][i]),
+            "motor": bool(fleet["motor"][i])
+        }
+        for i, device_id in enumerate(device_ids)
+    }
+
+
+def reevaluate(device_ids=None, source="control"):
+    """Refresh decisions from cached ETo, log them and submit them to the motor publisher."""
+    decisions = evaluate_devices(device_ids)
+    published = 0
+    for device_id, decision in decisions.items():
+        control_state["devices"][device_id] = decision
+        decision_log.log({"source": source, "device_id": device_id, **decision})
+        published += motor_commands.submit(device_id, decision["motor"])
+        if shared["role"] == "ingest":
+            shared["state"].update_decision(device_id, decision)
+    return decisions, published
+
+
+async def refresh_eto():
+    """
+    Fetch (cached) weather for every site in use, at most one upstream call
+    per grid cell, and recompute ML + FAO ETo for all of them in one batch.
+    """
+    site_ids = sorted({DEFAULT_SITE} | {device_site.get(d, DEFAULT_SITE) for d in device_sowing})
+    await weather_service.prefetch(site_ids)
+    weather_rows = await asyncio.gather(
+        *(weather_service.calculator(site).get_weather_data() for site in site_ids),
+        return_exceptions=True,
+    )
+
+    fetched = []
+    for site, weather_data in zip(site_ids, weather_rows):
+        if isinstance(weather_data, Exception):
+            _LOGGER.warning("Weather for site %s unavailable: %s", site, weather_data)
+        else:
+            fetched.append((site, weather_data))
+    if not fetched:
+        raise weather_rows[0]
+
+    loop = asyncio.get_running_loop()
+    pred_eto, calc_eto = await loop.run_in_executor(
+        None, compute_eto_sites, predictor_component.get(),
+        [build_pred_input(weather_data) for _, weather_data in fetched],
+        [weather_data for _, weather_data in fetched],
+        [weather_service.calculator(site).altitude for site, _ in fetched],
+    )
+
+    sites = dict(control_state["sites"])
+    for i, (site, weather_data) in enumerate(fetched):
+        sites[site] = {
+            "weather": weather_data,
+            "predicted_eto": float(pred_eto[i]),
+            "calculated_eto": float(calc_eto[i]),
+        }
+    control_state.update(computed_at=time.time(), sites=sites, **sites.get(DEFAULT_SITE, {}))
+    if shared["role"] == "ingest":
+        shared["state"].put_blob("control", {k: v for k, v in control_state.items() if k != "devices"})
+
+
+async def run_control_loop():
+    while True:
+        try:
+            await refresh_eto()
+            decisions, published = reevaluate()
+            _LOGGER.info("Control loop: %d devices evaluated, %d motor commands queued", len(decisions), published)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _LOGGER.error("Control loop iteration failed: %s", e)
+        await asyncio.sleep(CONTROL_INTERVAL_SECONDS)
+
+
+@app.get("/startup")
+def get_startup():
+    """Per-component build status and time from the last startup."""
+    return JSONResponse(content={**startup_state, "components": startup_report(COMPONENTS)})
+
+
+@app.get("/motors")
+def get_motors():
+    """Motor command counters and the desired / acked state per motor."""
+    if is_reader():
+        return JSONResponse(content=shared["state"].get_blob("motors", {"stats": None, "motors": {}}))
+    return JSONResponse(content=motors_report())
+
+
+@app.get("/state")
+def get_state():
+    """Latest decisions computed by the control loop (no recomputation)."""
+    return JSONResponse(content=state_report())
+
+
+@app.get("/devices/forecast")
+async def get_devices_forecast():
+    """Forecast-horizon plan for every registered device: one forecast fetch per grid cell, one model call per site."""
+    device_ids = sorted(device_sowing)
+    if not device_ids:
+        return JSONResponse(content={"status": "success", "devices": {}})
+
+    by_site = {}
+    for device_id in device_ids:
+        by_site.setdefault(device_site.get(device_id, DEFAULT_SITE), []).append(device_id)
+    await weather_service.prefetch(list(by_site))
+
+    async def plan_site(site, site_devices):
+        calculator = weather_service.calculator(site)
+        # DAS on the first forecast day; fields sown later are planned from sowing
+        weather = await calculator.get_forecast_data()
+        das = [max((weather["dates"][0] - device_sowing[device_id]).days, 0) for device_id in site_devices]
+        crops = [device_crop.get(device_id, DEFAULT_CROP) for device_id in site_devices]
+        weather, plan = await forecast_plan(calculator, das, crops, weather)
+        return {
+            device_id: {
+                "crop": crops[i],
+                "site": site,
+                "total_threshold": float(plan["total"][i]),
+                "days": plan_days(weather, plan, i)
+            }
+            for i, device_id in enumerate(site_devices)
+        }
+
+    plans = await asyncio.gather(*(plan_site(site, site_devices) for site, site_devices in by_site.items()))
+    devices = {}
+    for plan in plans:
+        devices.update(plan)
+    return JSONResponse(content={"status": "success", "devices": dict(sorted(devices.items()))})
+
+
+@app.post("/devices/evaluate")
+async def post_evaluate_devices():
+    """Force an ETo refresh and re-evaluate every registered device now."""
+    if is_reader():
+        # the ingest worker owns the relays; its decisions come back through the table
+        try:
+            await request_evaluation()
+        except TimeoutError as e:
+            return JSONResponse(status_code=504, content={"status": "error", "detail": str(e)})
+        return JSONResponse(content={"status": "success", "published": None, "devices": state_report()["devices"]})
+    await refresh_eto()
+    decisions, published = reevaluate(source="evaluate")
+    return JSONResponse(content={"status": "success", "published": published, "devices": decisions})
+
+
+@app.get("/decisions")
+async def get_decisions(day: Optional[date] = None, device_id: Optional[str] = None, limit: int = Query(1000, ge=1)):
+    """Logged decisions of one UTC day (default today), oldest first, up to limit."""
+    day = day or datetime.now(timezone.utc).date()
+
+    def scan():
+        return list(islice(read_day(decision_log.directory, day, device_id), limit))
+
+    records = await asyncio.get_running_loop().run_in_executor(None, scan)
+    return JSONResponse(content={"day": day.isoformat(), "count": len(records), "records": records})
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    if workers > 1:
+        # workers re-import this module and inherit the environment
+        os.environ.setdefault("SHARED_STATE_PATH", default_path())
+        uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,248 @@
+"""
+Offline ETc backtest over the cleaned ETo history.
+
+Replays the history day by day for many (crop, sowing date) seasons and
+reports how the ML ETo and the FAO-56 formula compare with the recorded ETo,
+and how much water the motor rule would have delivered.
+
+ML ETo (one batched model call) and FAO-56 ETo (eto_engine) are computed once
+for the whole history; a season is then just a window of those arrays, so a
+block of seasons is simulated as (seasons x days) matrices. Blocks are spread
+over worker processes.
+
+Motor rule replay: each day the pump runs until the delivered depth exceeds
+min(ML ETc, FAO ETc), in steps of --pump-step mm (water delivered between two
+evaluations). Soil moisture is not part of the history, so the soil-moisture
+cut-off is not simulated. 1 mm over 1 m² is 1 L.
+
+    python backtest.py                              # maize, a few rainy-season sowing dates
+    python backtest.py --every 7 --crops maize,sorghum --out backtest.csv
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from crop_kc import CROPS, crop_kc, season_days
+from dataset_builder import CLEANED_CSV
+from eto_engine import DEFAULT_ALTITUDE, compute_eto_frame
+from ml_predit import CSV_COLUMNS, FEATURES, MaizeETCPredictor
+
+DEFAULT_SOWING_DATES = ["05-15", "06-01", "06-15", "07-01"]
+DEFAULT_PUMP_STEP_MM = 0.5
+DEFAULT_FIELD_AREA_M2 = 1.0
+SEASONS_PER_TASK = 64
+
+
+# ---------------------------------------------------
+# History
+# ---------------------------------------------------
+def load_history(source=None):
+    """
+    Daily history (FEATURES + recorded eto) on a continuous calendar index.
+    Duplicate dates are averaged; days without a record are NaN.
+    """
+    from eto_store import STORE_DIR, load_frame
+
+    source = source or (STORE_DIR if os.path.isdir(STORE_DIR) else CLEANED_CSV)
+    if os.path.isdir(source):
+        df = load_frame(["date"] + FEATURES + ["eto"], root=source)
+    else:
+        df = pd.read_csv(source).rename(columns=CSV_COLUMNS)
+
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    df = df.dropna(subset=["date"])
+    columns = FEATURES + ["eto"]
+    df[columns] = df[columns].apply(pd.to_numeric, errors="coerce")
+
+    daily = df.groupby("date")[columns].mean().sort_index()
+    calendar = pd.date_range(daily.index[0], daily.index[-1], freq="D")
+    return daily.reindex(calendar)
+
+
+def precompute_eto(history, predictor, altitude=DEFAULT_ALTITUDE):
+    """
+    {"dates", "eto", "eto_ml", "eto_fao"} float64 arrays over the whole
+    history; rows with missing inputs stay NaN.
+    """
+    complete = history[FEATURES].notna().all(axis=1).to_numpy()
+
+    eto_ml = np.full(len(history), np.nan)
+    X = np.ascontiguousarray(history.loc[complete, FEATURES].to_numpy(dtype=np.float32))
+    if len(X):
+        eto_ml[complete] = predictor._predict_eto(X)
+
+    return {
+        "dates": history.index.to_numpy(dtype="datetime64[D]"),
+        "eto": history["eto"].to_numpy(dtype=np.float64),
+        "eto_ml": eto_ml,
+        "eto_fao": compute_eto_frame(history, altitude),
+    }
+
+
+# ---------------------------------------------------
+# Seasons
+# ---------------------------------------------------
+def season_starts(dates, crop, sowing_dates=None, every=None):
+    """
+    Start indices of every season that fits inside the history: one per year
+    for each MM-DD in sowing_dates, or one every `every` days.
+    """
+    last_start = len(dates) - season_days(crop)
+    if last_start < 0:
+        return np.empty(0, dtype=np.int64)
+
+    if every:
+        return np.arange(0, last_start + 1, every, dtype=np.int64)
+
+    first = date.fromisoformat(str(dates[0]))
+    starts = []
+    for year in range(first.year, first.year + len(dates) // 365 + 2):
+        for month_day in sowing_dates or DEFAULT_SOWING_DATES:
+            month, day = (int(part) for part in month_day.split("-"))
+            index = (date(year, month, day) - first).days
+            if 0 <= index <= last_start:
+                starts.append(index)
+    return np.array(sorted(starts), dtype=np.int64)
+
+
+def simulate_seasons(arrays, crop, starts, pump_step_mm=DEFAULT_PUMP_STEP_MM, field_area_m2=DEFAULT_FIELD_AREA_M2):
+    """Per-season metrics for one crop and an array of start indices, as a dict of arrays."""
+    days = season_days(crop)
+    index = starts[:, None] + np.arange(days)[None, :]
+    kc = crop_kc(np.arange(days), crop)
+
+    eto = arrays["eto"][index]
+    eto_ml = arrays["eto_ml"][index]
+    eto_fao = arrays["eto_fao"][index]
+
+    valid = np.isfinite(eto) & np.isfinite(eto_ml) & np.isfinite(eto_fao)
+    eto = np.where(valid, eto, np.nan)
+    eto_ml = np.where(valid, eto_ml, np.nan)
+    eto_fao = np.where(valid, eto_fao, np.nan)
+
+    etc = eto * kc
+    etc_ml = eto_ml * kc
+    etc_fao = eto_fao * kc
+
+    threshold = np.minimum(etc_ml, etc_fao)
+    if pump_step_mm > 0:
+        delivered = np.ceil(threshold / pump_step_mm) * pump_step_mm
+    else:
+        delivered = threshold
+
+    valid_days = valid.sum(axis=1)
+    # seasons without a single valid day yield NaN metrics
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        demand_mm = np.nansum(etc, axis=1)
+        delivered_mm = np.nansum(delivered, axis=1)
+        return {
+            "crop": np.full(len(starts), crop, dtype=object),
+            "sowing_date": arrays["dates"][starts].astype(str),
+            "season_days": np.full(len(starts), days),
+            "valid_days": valid_days,
+            "eto_ml_mae": np.nanmean(np.abs(eto_ml - eto), axis=1),
+            "eto_ml_bias": np.nanmean(eto_ml - eto, axis=1),
+            "eto_fao_mae": np.nanmean(np.abs(eto_fao - eto), axis=1),
+            "eto_fao_bias": np.nanmean(eto_fao - eto, axis=1),
+            "etc_ml_mae": np.nanmean(np.abs(etc_ml - etc), axis=1),
+            "etc_fao_mae": np.nanmean(np.abs(etc_fao - etc), axis=1),
+            "demand_mm": demand_mm,
+            "delivered_mm": delivered_mm,
+            "excess_mm": np.nansum(np.maximum(delivered - etc, 0), axis=1),
+            "deficit_mm": np.nansum(np.maximum(etc - delivered, 0), axis=1),
+            "delivered_liters": delivered_mm * field_area_m2,
+        }
+
+
+# Worker processes receive the precomputed arrays once, not per task
+_WORKER_ARRAYS = None
+
+
+def _init_worker(arrays):
+    global _WORKER_ARRAYS
+    _WORKER_ARRAYS = arrays
+
+
+def _simulate_task(task):
+    crop, starts, pump_step_mm, field_area_m2 = task
+    return simulate_seasons(_WORKER_ARRAYS, crop, starts, pump_step_mm, field_area_m2)
+
+
+def run_backtest(arrays, crops=("maize",), sowing_dates=None, every=None,
+                 pump_step_mm=DEFAULT_PUMP_STEP_MM, field_area_m2=DEFAULT_FIELD_AREA_M2, workers=None):
+    """Simulate every (crop, season) and return one DataFrame row per season."""
+    tasks = []
+    for crop in crops:
+        starts = season_starts(arrays["dates"], crop, sowing_dates, every)
+        for i in range(0, len(starts), SEASONS_PER_TASK):
+            tasks.append((crop, starts[i:i + SEASONS_PER_TASK], pump_step_mm, field_area_m2))
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) if tasks else 1
+    if workers <= 1:
+        results = [simulate_seasons(arrays, *task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays,)) as pool:
+            results = list(pool.map(_simulate_task, tasks))
+
+    if not results:
+        return pd.DataFrame()
+    return pd.concat([pd.DataFrame(result) for result in results], ignore_index=True)
+
+
+def summarize(seasons):
+    """Mean per-season metrics per crop."""
+    columns = ["valid_days", "eto_ml_mae", "eto_fao_mae", "etc_ml_mae", "etc_fao_mae",
+               "demand_mm", "delivered_mm", "excess_mm", "deficit_mm"]
+    summary = seasons.groupby("crop")[columns].mean()
+    summary.insert(0, "seasons", seasons.groupby("crop").size())
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest ML vs FAO-56 ETc and the motor rule over the ETo history")
+    parser.add_argument("--source", default=None, help="Parquet store dir or cleaned CSV (default: store if present)")
+    parser.add_argument("--crops", default="maize", help=f"Comma-separated, from: {', '.join(CROPS)}")
+    parser.add_argument("--sowing", default=",".join(DEFAULT_SOWING_DATES), help="Comma-separated MM-DD sowing dates")
+    parser.add_argument("--every", type=int, default=None, help="Sow every N days instead of --sowing")
+    parser.add_argument("--models", default="lightgbm", help="Comma-separated ETo models to ensemble")
+    parser.add_argument("--pump-step", type=float, default=DEFAULT_PUMP_STEP_MM, help="mm delivered per evaluation")
+    parser.add_argument("--area", type=float, default=DEFAULT_FIELD_AREA_M2, help="Field area in m²")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="Write per-season results to this CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    history = load_history(args.source)
+    predictor = MaizeETCPredictor(models=[m.strip() for m in args.models.split(",") if m.strip()])
+    arrays = precompute_eto(history, predictor)
+    prepared = time.perf_counter()
+
+    seasons = run_backtest(
+        arrays,
+        crops=[c.strip() for c in args.crops.split(",") if c.strip()],
+        sowing_dates=[d.strip() for d in args.sowing.split(",") if d.strip()],
+        every=args.every,
+        pump_step_mm=args.pump_step,
+        field_area_m2=args.area,
+        workers=args.workers,
+    )
+    finished = time.perf_counter()
+
+    print(f"History: {len(history)} days ({arrays['dates'][0]} .. {arrays['dates'][-1]})")
+    print(f"Prepared ETo arrays in {(prepared - start) * 1000:.0f} ms")
+    print(f"Simulated {len(seasons)} seasons in {(finished - prepared) * 1000:.0f} ms")
+    if len(seasons):
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(summarize(seasons).round(3))
+
+    if args.out:
+        seasons.to_csv(args.out, index=False)
+        print(f"Per-season results written to {args.out}")
@@ -0,0 +1,136 @@
+"""
+Multi-device fan-out benchmark against a local MQTT broker.
+
+Simulates N sensor nodes publishing on irregation/<device_id>/pub, ingests
+them through a SensorStore exactly like api.on_message, then times
+api.evaluate_devices (the pass the control loop and every telemetry packet
+run) for all devices and compares it with a per-device loop. Needs a
+plain-TCP broker (e.g. `mosquitto -p 1883` or stub_mqtt_broker.py).
+
+    python benchmarks/bench_fanout.py --devices 1000 --rounds 5
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from irrigation import compute_eto_sites, motor_decisions        # noqa: E402
+from openweather import DEFAULT_SITE, WeatherETcCalculator       # noqa: E402
+from sensor_store import SensorStore                             # noqa: E402
+
+TOPIC_FILTER = "irregation/+/pub"
+WEATHER = {"min_temp": 21.0, "max_temp": 33.5, "humidity": 58.0, "wind": 2.4, "sun_hours": 8.1, "radiation": 19.6}
+
+
+def bench_ingestion(host, port, devices, rounds):
+    store = SensorStore()
+    expected = devices * rounds
+    done = threading.Event()
+    received = [0]
+
+    def on_message(client, userdata, msg):
+        payload = json.loads(msg.payload)
+        store.ingest(msg.topic.split("/")[1], payload["volume_l"] / 1000, payload["soil_moisture_pct"])
+        received[0] += 1
+        if received[0] >= expected:
+            done.set()
+
+    subscriber = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-fanout-sub")
+    subscriber.on_message = on_message
+    subscriber.connect(host, port)
+    subscriber.subscribe(TOPIC_FILTER, qos=0)
+    subscriber.loop_start()
+
+    publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-fanout-pub")
+    publisher.max_queued_messages_set(0)
+    publisher.connect(host, port)
+    publisher.loop_start()
+    time.sleep(0.5)
+
+    start = time.perf_counter()
+    for r in range(rounds):
+        for d in range(devices):
+            payload = json.dumps({"volume_l": 0.5 * r, "soil_moisture_pct": 10 + d % 10})
+            publisher.publish(f"irregation/node{d}/pub", payload, qos=0)
+    done.wait(timeout=120)
+    elapsed = time.perf_counter() - start
+
+    publisher.loop_stop()
+    subscriber.loop_stop()
+    publisher.disconnect()
+    subscriber.disconnect()
+
+    return store, {
+        "messages": received[0],
+        "seconds": elapsed,
+        "messages_per_sec": received[0] / elapsed if elapsed else None,
+    }
+
+
+def bench_decisions(store, devices):
+    import api
+
+    logging.getLogger().setLevel(logging.WARNING)
+    predictor = api.predictor_component.get()
+    calculator = WeatherETcCalculator()
+
+    device_ids = store.devices() or [f"node{d}" for d in range(devices)]
+    das = np.arange(len(device_ids)) % 130
+    today = date.today()
+    for device_id, days in zip(device_ids, das):
+        api.device_sowing[device_id] = date.fromordinal(today.toordinal() - int(days))
+    api.sensor_store = store
+
+    # ETo cached the way refresh_eto() leaves it
+    pred_eto, calc_eto = compute_eto_sites(predictor, [WEATHER], [WEATHER], [calculator.altitude])
+    api.control_state["sites"][DEFAULT_SITE] = {
+        "weather": WEATHER, "predicted_eto": float(pred_eto[0]), "calculated_eto": float(calc_eto[0]),
+    }
+
+    start = time.perf_counter()
+    decisions = api.evaluate_devices()
+    batched = time.perf_counter() - start
+    assert len(decisions) == len(device_ids), "evaluate_devices skipped devices"
+
+    midnight = api.start_of_today()
+    aggregates = [store.aggregate(device_id, midnight) for device_id in device_ids]
+    water_flow = [agg["delivered_volume"] for agg in aggregates]
+    latest = [store.latest(device_id) for device_id in device_ids]
+    soil_moisture = [entry[2] if entry else 0 for entry in latest]
+
+    start = time.perf_counter()
+    for i in range(len(device_ids)):
+        pred = predictor.predict_etc(WEATHER, int(das[i]))["etc"]
+        calc = calculator.calculate_etc(int(das[i]), WEATHER)["etc"]
+        motor_decisions(water_flow[i], soil_moisture[i], min(pred, calc))
+    looped = time.perf_counter() - start
+
+    return {"devices": len(device_ids), "batched_ms": batched * 1000, "per_device_loop_ms": looped * 1000}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MQTT multi-device fan-out benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--skip-broker", action="store_true", help="only benchmark the decision pass")
+    args = parser.parse_args()
+
+    results = {}
+    store = SensorStore()
+    if not args.skip_broker:
+        store, results["ingestion"] = bench_ingestion(args.host, args.port, args.devices, args.rounds)
+    results["decisions"] = bench_decisions(store, args.devices)
+
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,453 @@
+"""
+Benchmark suite for the prediction and API hot paths.
+
+Everything runs locally: OpenWeather is replaced by stub_openweather and the
+AWS IoT broker by stub_mqtt_broker, both on free localhost ports. Results are
+written as JSON (one file per commit by default) so runs can be compared:
+
+    python benchmarks/bench_suite.py                          # all benchmarks
+    python benchmarks/bench_suite.py --only predict,kc        # a subset
+    python benchmarks/bench_suite.py --compare benchmarks/results/<old>.json
+
+Benchmarks:
+  predict    predict_etc single-row latency, predict_etc_batch throughput
+  eto        FAO-56 compute_eto scalar loop vs eto_engine arrays
+  kc         crop_kc scalar / array / mixed-crop lookups
+  ingest     api.on_message handler rate (in process)
+  api        /awsData under concurrent load through uvicorn, plus MQTT
+             telemetry ingestion through the broker
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+BENCHMARKS = ["predict", "eto", "kc", "ingest", "api"]
+SEED = 42
+
+sys.path.insert(0, REPO_DIR)
+
+WEATHER = {"min_temp": 21.0, "max_temp": 33.5, "humidity": 58.0, "wind": 2.4, "sun_hours": 8.1, "radiation": 19.6}
+
+
+# ---------------------------------------------------
+# Helpers
+# ---------------------------------------------------
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def time_calls(fn, rounds, warmup=10):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return latency_stats(timings)
+
+
+def best_of(fn, repeat=5):
+    """Fastest wall time of `repeat` runs, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def random_weather(rng, n):
+    return {
+        "min_temp": rng.uniform(10, 28, n),
+        "max_temp": rng.uniform(28, 42, n),
+        "humidity": rng.uniform(10, 95, n),
+        "wind": rng.uniform(0.5, 6, n),
+        "sun_hours": rng.uniform(3, 12, n),
+        "radiation": rng.uniform(10, 30, n),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+# ---------------------------------------------------
+# Prediction
+# ---------------------------------------------------
+def bench_predict(rounds, batch_sizes):
+    from ml_predit import FEATURES, MaizeETCPredictor
+
+    predictor = MaizeETCPredictor()
+    predictor.warm_up()
+    rng = np.random.default_rng(SEED)
+
+    single = time_calls(lambda: predictor.predict_etc(WEATHER, 60), rounds)
+    row = np.array([[WEATHER[name] for name in FEATURES]], dtype=np.float32)
+    model_only = time_calls(lambda: predictor._predict_eto(row), rounds)
+
+    batches = {}
+    for size in batch_sizes:
+        weather = random_weather(rng, size)
+        rows = [{name: float(weather[name][i]) for name in FEATURES} for i in range(size)]
+        das = rng.integers(0, 130, size)
+        seconds = best_of(lambda: predictor.predict_etc_batch(rows, das))
+        batches[str(size)] = {"ms": seconds * 1000, "rows_per_sec": size / seconds}
+
+    return {
+        "models": list(predictor.models),
+        "predict_etc_single": single,
+        "predict_eto_single_model_only": model_only,
+        "predict_etc_batch": batches,
+    }
+
+
+# ---------------------------------------------------
+# FAO-56 ETo
+# ---------------------------------------------------
+def bench_eto(rows):
+    import eto_engine
+    from openweather import WeatherETcCalculator
+
+    calculator = WeatherETcCalculator()
+    weather = random_weather(np.random.default_rng(SEED), rows)
+    columns = [weather[name] for name in ["min_temp", "max_temp", "humidity", "wind", "sun_hours", "radiation"]]
+    scalar_rows = list(zip(*(c.tolist() for c in columns)))
+
+    scalar = best_of(lambda: [calculator.compute_eto(*r) for r in scalar_rows], repeat=3)
+    array = best_of(lambda: eto_engine.compute_eto(*columns))
+
+    return {
+        "rows": rows,
+        "scalar_ms": scalar * 1000,
+        "array_ms": array * 1000,
+        "speedup": scalar / array,
+    }
+
+
+# ---------------------------------------------------
+# Kc lookup
+# ---------------------------------------------------
+def bench_kc(rounds, fields):
+    from crop_kc import CROPS, crop_kc
+
+    rng = np.random.default_rng(SEED)
+    das = rng.integers(0, 140, fields)
+    crops = [CROPS[i] for i in rng.integers(0, len(CROPS), fields)]
+
+    array = best_of(lambda: crop_kc(das))
+    mixed = best_of(lambda: crop_kc(das, crops))
+    return {
+        "scalar": time_calls(lambda: crop_kc(60), rounds),
+        "fields": fields,
+        "array_ms": array * 1000,
+        "mixed_crops_ms": mixed * 1000,
+    }
+
+
+# ---------------------------------------------------
+# Telemetry handler (in process)
+# ---------------------------------------------------
+def bench_ingest(messages, devices):
+    import api
+
+    # The handler logs every packet; measure the handler, not log I/O
+    logging.getLogger().setLevel(logging.WARNING)
+
+    today = date.today()
+    for d in range(devices):
+        api.device_sowing[f"node{d}"] = date.fromordinal(today.toordinal() - 40)
+    # cached ETo in the shape refresh_eto() leaves it, so every packet runs the motor rule
+    from openweather import DEFAULT_SITE
+
+    site = {"weather": dict(WEATHER), "predicted_eto": 4.8, "calculated_eto": 3.9}
+    api.control_state.update(computed_at=time.time(), sites={DEFAULT_SITE: site}, **site)
+    api.control_state["devices"].clear()
+
+    payloads = [
+        (f"irregation/node{i % devices}/pub", json.dumps({"volume_l": i // devices * 0.5, "soil_moisture_pct": 12}).encode())
+        for i in range(messages)
+    ]
+
+    start = time.perf_counter()
+    for topic, payload in payloads:
+        api.on_message(topic, payload)
+    elapsed = time.perf_counter() - start
+    assert api.control_state["devices"], "no motor decision was made during ingestion"
+
+    return {
+        "messages": messages,
+        "devices": devices,
+        "seconds": elapsed,
+        "messages_per_sec": messages / elapsed,
+        "per_message_us": elapsed / messages * 1e6,
+    }
+
+
+# ---------------------------------------------------
+# /awsData end to end + MQTT ingestion
+# ---------------------------------------------------
+class ServerThread:
+    """uvicorn.Server on its own thread and event loop."""
+
+    def __init__(self, app, port):
+        import uvicorn
+
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+class BrokerThread:
+    def __init__(self):
+        from stub_mqtt_broker import StubBroker
+
+        self.broker = StubBroker()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.port = None
+
+    def __enter__(self):
+        self.thread.start()
+        self.port = asyncio.run_coroutine_threadsafe(self.broker.start(port=0), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.broker.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+async def load_test(url, requests, concurrency):
+    import httpx
+
+    timings, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.get(url)
+            timings.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": requests / elapsed,
+        "latency": latency_stats(timings),
+    }
+
+
+def mqtt_ingestion(api, port, messages, devices):
+    import paho.mqtt.client as mqtt
+
+    before = sum(api.sensor_store.aggregate(device_id)["samples"] for device_id in api.sensor_store.devices())
+
+    publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id="bench-suite-pub")
+    publisher.max_queued_messages_set(0)
+    publisher.connect("127.0.0.1", port)
+    publisher.loop_start()
+
+    start = time.perf_counter()
+    for i in range(messages):
+        payload = json.dumps({"volume_l": i // devices * 0.5, "soil_moisture_pct": 12})
+        publisher.publish(f"irregation/mqtt{i % devices}/pub", payload, qos=0)
+
+    received = 0
+    deadline = time.time() + 60
+    while received < messages and time.time() < deadline:
+        time.sleep(0.01)
+        received = sum(api.sensor_store.aggregate(d)["samples"] for d in api.sensor_store.devices()) - before
+    elapsed = time.perf_counter() - start
+
+    publisher.loop_stop()
+    publisher.disconnect()
+    return {
+        "messages": messages,
+        "received": received,
+        "seconds": elapsed,
+        "messages_per_sec": received / elapsed,
+    }
+
+
+def bench_api(requests, concurrency, weather_latency_ms, messages, devices):
+    import paho.mqtt.client as mqtt
+
+    import openweather
+    import stub_openweather
+    from mqtt_async import AsyncMqttClient
+
+    logging.getLogger().setLevel(logging.WARNING)
+    stub_openweather.LATENCY_SECONDS = weather_latency_ms / 1000
+
+    weather_port, api_port = free_port(), free_port()
+    openweather.OPENWEATHER_BASE_URL = f"http://127.0.0.1:{weather_port}"
+
+    with BrokerThread() as broker, ServerThread(stub_openweather.app, weather_port):
+        import api
+
+        # Same clients as production, but plain TCP to the stub broker
+        api.sensor_mqtt_component.factory = lambda: AsyncMqttClient(
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=api.SENSOR_CLIENT_ID),
+            "127.0.0.1", broker.port,
+            subscriptions=[(api.SENSOR_TOPIC, 1), (api.SENSOR_TOPIC_FILTER, 1)],
+            on_message=api.on_message, name="sensor",
+        )
+        api.motor_mqtt_component.factory = lambda: AsyncMqttClient(
+            mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=api.MOTOR_CLIENT_ID),
+            "127.0.0.1", broker.port, name="motor",
+        )
+
+        with ServerThread(api.app, api_port):
+            deadline = time.time() + 10
+            while not (api.mqtt_connected(api.sensor_mqtt_component) and api.mqtt_connected(api.motor_mqtt_component)):
+                if time.time() > deadline:
+                    raise RuntimeError("MQTT clients did not connect to the stub broker")
+                time.sleep(0.05)
+
+            url = f"http://127.0.0.1:{api_port}/awsData?das=60"
+            asyncio.run(load_test(url, 20, min(concurrency, 4)))          # warm-up
+            aws_data = asyncio.run(load_test(url, requests, concurrency))
+
+            ingestion = mqtt_ingestion(api, broker.port, messages, devices)
+            startup = api.startup_report(api.COMPONENTS)
+
+    return {
+        "weather_latency_ms": weather_latency_ms,
+        "startup": startup,
+        "aws_data": aws_data,
+        "mqtt_ingestion": ingestion,
+        "broker": {"received": broker.broker.received, "delivered": broker.broker.delivered},
+    }
+
+
+# ---------------------------------------------------
+# Comparison
+# ---------------------------------------------------
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new):
+    """Print every numeric metric present in both runs with its ratio new/old."""
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    print(f"{'metric':<60} {old['meta']['commit']:>12} {new['meta']['commit']:>12} {'ratio':>8}")
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[name], new_flat[name]
+        ratio = after / before if before else float("nan")
+        print(f"{name:<60} {before:>12.4g} {after:>12.4g} {ratio:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prediction / API hot-path benchmark suite")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--rounds", type=int, default=500, help="Calls per latency measurement")
+    parser.add_argument("--batch-sizes", default="1,100,1000,10000")
+    parser.add_argument("--eto-rows", type=int, default=10000)
+    parser.add_argument("--fields", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--weather-latency-ms", type=float, default=0.0)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--out", default=None, help="JSON output path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    commit = git_commit()
+    results = {}
+
+    if "predict" in selected:
+        results["predict"] = bench_predict(args.rounds, [int(s) for s in args.batch_sizes.split(",")])
+    if "eto" in selected:
+        results["eto"] = bench_eto(args.eto_rows)
+    if "kc" in selected:
+        results["kc"] = bench_kc(args.rounds, args.fields)
+    if "ingest" in selected:
+        results["ingest"] = bench_ingest(args.messages, args.devices)
+    if "api" in selected:
+        results["api"] = bench_api(args.requests, args.concurrency, args.weather_latency_ms, args.messages, args.devices)
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,63 @@
+"""
+Lazily constructed application components with startup timing.
+
+Heavy objects (model files, TLS MQTT clients) are wrapped in a LazyComponent
+so importing a module never touches the disk or the network; they are built
+on first use or explicitly by the app lifespan, which can build several in
+parallel and report how long each took.
+"""
+
+import threading
+import time
+
+
+class LazyComponent:
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.instance = None
+        self.seconds = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Build on first call (thread-safe) and return the instance; re-raises a failed build."""
+        if self.instance is not None:
+            return self.instance
+
+        with self._lock:
+            if self.instance is None:
+                if self.error is not None:
+                    raise self.error
+                start = time.perf_counter()
+                try:
+                    self.instance = self.factory()
+                except Exception as e:
+                    self.error = e
+                    raise
+                finally:
+                    self.seconds = time.perf_counter() - start
+        return self.instance
+
+    def get_or_none(self):
+        """Instance if it was built successfully, else None (never triggers a build)."""
+        return self.instance
+
+    @property
+    def status(self):
+        if self.instance is not None:
+            return "ready"
+        if self.error is not None:
+            return "failed"
+        return "pending"
+
+    def report(self):
+        return {
+            "status": self.status,
+            "ms": round(self.seconds * 1000, 2) if self.seconds is not None else None,
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+
+def startup_report(components):
+    return {component.name: component.report() for component in components}
@@ -0,0 +1,108 @@
+"""
+Crop coefficient (Kc) engine.
+
+Each crop is a table of growth stages (das_start, das_end, kc_start, kc_end)
+with Kc linearly interpolated inside a stage, plus the Kc used after the last
+stage. Tables are expanded once, at import, into a dense Kc-per-day array, so
+looking up Kc for one field or thousands is plain array indexing.
+
+Maize keeps the curve the service has always used (mid-season ends at DAS
+95). The other crops follow FAO-56 (Tables 11/12, West African / arid
+stage lengths): initial stage flat, development rising to Kc mid, mid-season
+flat, late season falling to Kc end.
+"""
+
+import numpy as np
+
+DEFAULT_CROP = "maize"
+
+
+def fao_stages(lengths, kc_ini, kc_mid, kc_end):
+    """Stage table from FAO-56 stage lengths (ini, dev, mid, late) and Kc values."""
+    ini, dev, mid, late = lengths
+    d1, d2, d3, d4 = ini, ini + dev, ini + dev + mid, ini + dev + mid + late
+    return [
+        (0, d1, kc_ini, kc_ini),
+        (d1, d2, kc_ini, kc_mid),
+        (d2, d3, kc_mid, kc_mid),
+        (d3, d4, kc_mid, kc_end),
+    ]
+
+
+# crop -> (stages, Kc after the last stage)
+CROP_STAGES = {
+    "maize": (
+        [
+            (0, 25, 0.30, 0.40),
+            (25, 55, 0.40, 0.80),
+            (55, 95, 1.15, 1.20),
+            (95, 120, 0.70, 0.35),
+        ],
+        0.35,
+    ),
+    "sorghum": (fao_stages((20, 35, 40, 30), 0.30, 1.00, 0.55), 0.55),
+    "millet": (fao_stages((15, 25, 40, 25), 0.30, 1.00, 0.30), 0.30),
+    "groundnut": (fao_stages((25, 35, 45, 25), 0.40, 1.15, 0.60), 0.60),
+}
+
+
+def build_table(stages, after_season):
+    """
+    Dense Kc per whole DAS: index d holds Kc on day d, the last entry holds
+    the after-season value. The last stage includes its end day.
+    """
+    season_end = stages[-1][1]
+    table = np.full(season_end + 2, after_season, dtype=np.float64)
+    for das_start, das_end, kc_start, kc_end in stages:
+        days = np.arange(das_start, das_end, dtype=np.float64)
+        table[das_start:das_end] = kc_start + (kc_end - kc_start) * ((days - das_start) / (das_end - das_start))
+    table[season_end] = stages[-1][3]
+    return table
+
+
+CROPS = list(CROP_STAGES)
+KC_TABLES = {crop: build_table(*spec) for crop, spec in CROP_STAGES.items()}
+
+# All crops padded to a common length with their after-season Kc, for mixed-crop lookups
+_SEASON_DAYS = max(len(table) for table in KC_TABLES.values())
+KC_MATRIX = np.vstack([
+    np.concatenate((table, np.full(_SEASON_DAYS - len(table), table[-1])))
+    for table in KC_TABLES.values()
+])
+CROP_INDEX = {crop: i for i, crop in enumerate(CROPS)}
+
+
+def _days(das, limit):
+    das = np.asarray(das)
+    if np.any(das < 0):
+        raise ValueError("DAS cannot be negative.")
+    return np.minimum(das.astype(np.int64), limit - 1)
+
+
+def crop_kc(das, crop=DEFAULT_CROP):
+    """
+    Kc for whole days after sowing. das may be a scalar (returns float) or
+    array-like; crop is one name for every field or one name per field.
+    """
+    names = [crop] if isinstance(crop, str) else crop
+    unknown = set(names) - set(CROP_INDEX)
+    if unknown:
+        raise ValueError(f"Unknown crop {', '.join(sorted(unknown))}; choose from {', '.join(CROPS)}")
+
+    if isinstance(crop, str):
+        table = KC_TABLES[crop]
+        kc = table[_days(das, len(table))]
+    else:
+        rows = np.array([CROP_INDEX[name] for name in crop], dtype=np.int64)
+        kc = KC_MATRIX[rows, _days(das, _SEASON_DAYS)]
+
+    return float(kc) if np.ndim(kc) == 0 else kc
+
+
+def maize_kc(das):
+    return crop_kc(das, "maize")
+
+
+def season_days(crop=DEFAULT_CROP):
+    """Days from sowing to the end of the last stage, inclusive."""
+    return CROP_STAGES[crop][0][-1][1] + 1
@@ -0,0 +1,198 @@
+"""
+Incremental cleaner for the OCR'd ETo tables (replaces dataset_preparation.ipynb).
+
+Streams final_eto_output_azure.csv one source PDF at a time and appends only
+rows from PDFs that are not yet in the cleaned store. Ingested sources and the
+committed size of the cleaned file are tracked in a sidecar manifest, so a run
+interrupted half way is rolled back to the last good state on the next run.
+
+    python dataset_builder.py                      # append new PDFs only
+    python dataset_builder.py --rebuild            # rewrite the cleaned store
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import re
+from datetime import date
+
+RAW_CSV = "final_eto_output_azure.csv"
+CLEANED_CSV = "final_eto_output_azure_cleaned.csv"
+
+# Column order in the raw OCR export: Day + 7 measurements, then source_file
+RAW_DAY_COLUMN = 0
+RAW_VALUE_COLUMNS = slice(1, 8)
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    "apirl": 4,   # typo in some 2009 file names
+}
+_MONTH_RE = re.compile(r"(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")", re.IGNORECASE)
+_YEAR_RE = re.compile(r"(\d{4})")
+
+
+def manifest_path_for(cleaned_csv):
+    return cleaned_csv + ".manifest.json"
+
+
+# ---------------------------------------------------
+# Source file name -> (year, month)
+# ---------------------------------------------------
+def parse_source(source):
+    """
+    Year and month encoded in a PDF name such as '1992 ETo April.pdf',
+    'ETo 1991-oct.pdf' or '2009 ETo  Apirl.pdf'. Returns None for names that
+    do not identify exactly one month (e.g. yearly 'Jan-Dec' summaries).
+    """
+    year = _YEAR_RE.search(source)
+    months = {MONTHS[m.lower()] for m in _MONTH_RE.findall(source)}
+    if year is None or len(months) != 1:
+        return None
+    return int(year.group(1)), months.pop()
+
+
+# ---------------------------------------------------
+# Row cleaning (same rules as the original notebook)
+# ---------------------------------------------------
+def to_number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return number
+
+
+def clean_rows(rows, year, month):
+    """Yield cleaned [values..., 'YYYY-MM-DD'] rows for one source PDF."""
+    for row in rows:
+        # Drop rows with any empty cell (OCR noise, page breaks)
+        if any(cell == "" for cell in row):
+            continue
+
+        day = to_number(row[RAW_DAY_COLUMN])
+        if math.isnan(day):
+            # Repeated header rows and non-numeric day labels
+            continue
+
+        try:
+            day_date = date(year, month, int(day))
+        except ValueError:
+            # e.g. 30 February
+            continue
+
+        values = [to_number(cell) for cell in row[RAW_VALUE_COLUMNS]]
+        yield ["" if math.isnan(v) else repr(v) for v in values] + [day_date.isoformat()]
+
+
+def iter_source_chunks(raw_csv):
+    """
+    Yield (header, source, rows) for each contiguous run of rows from the
+    same PDF. Only one chunk is held in memory at a time.
+    """
+    with open(raw_csv, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)                # 0,1,...,7,source_file
+        first = next(reader)        # first PDF's table header row
+        header = first[1:8] + ["date"]
+
+        rows = itertools.chain([first], reader)
+        for source, chunk in itertools.groupby(rows, key=lambda r: r[-1]):
+            yield header, source, list(chunk)
+
+
+# ---------------------------------------------------
+# Manifest
+# ---------------------------------------------------
+def load_manifest(cleaned_csv):
+    path = manifest_path_for(cleaned_csv)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(cleaned_csv, sources, size):
+    path = manifest_path_for(cleaned_csv)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sources": sorted(sources), "size": size}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------
+# Builder
+# ---------------------------------------------------
+def build(raw_csv=RAW_CSV, cleaned_csv=CLEANED_CSV, rebuild=False):
+    """
+    Append rows of newly ingested PDFs from `raw_csv` to `cleaned_csv`.
+    Without a manifest (or with rebuild=True) the cleaned store is rewritten.
+    Returns a summary dict.
+    """
+    manifest = None if rebuild else load_manifest(cleaned_csv)
+
+    if manifest is None:
+        done = set()
+        mode = "w"
+    else:
+        done = set(manifest["sources"])
+        mode = "a"
+        # Roll back a partially appended run
+        if os.path.exists(cleaned_csv) and os.path.getsize(cleaned_csv) > manifest["size"]:
+            with open(cleaned_csv, "r+b") as f:
+                f.truncate(manifest["size"])
+
+    added_sources = set()
+    skipped_sources = set()
+    rows_written = 0
+
+    with open(cleaned_csv, mode, newline="", encoding="utf-8") as out:
+        writer = csv.writer(out, lineterminator="\n")
+        header_written = mode == "a"
+
+        for header, source, chunk in iter_source_chunks(raw_csv):
+            if not source or source in done:
+                continue
+
+            if not header_written:
+                writer.writerow(header)
+                header_written = True
+
+            parsed = parse_source(source)
+            if parsed is None:
+                skipped_sources.add(source)
+                continue
+
+            for row in clean_rows(chunk, *parsed):
+                writer.writerow(row)
+                rows_written += 1
+            added_sources.add(source)
+
+    # Every source we looked at is recorded, including undatable ones
+    save_manifest(cleaned_csv, done | added_sources | skipped_sources, os.path.getsize(cleaned_csv))
+
+    return {
+        "mode": "rebuild" if mode == "w" else "append",
+        "new_sources": len(added_sources),
+        "skipped_sources": sorted(skipped_sources),
+        "rows_written": rows_written,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the cleaned ETo dataset incrementally")
+    parser.add_argument("--raw", default=RAW_CSV, help="raw OCR export from pdf_csv.py")
+    parser.add_argument("--out", default=CLEANED_CSV, help="cleaned dataset to append to")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the manifest and rewrite --out")
+    args = parser.parse_args()
+
+    summary = build(args.raw, args.out, rebuild=args.rebuild)
+
+    print(f"Mode            : {summary['mode']}")
+    print(f"New source PDFs : {summary['new_sources']}")
+    print(f"Rows written    : {summary['rows_written']}")
+    for source in summary["skipped_sources"]:
+        print(f"Skipped (no single month in name): {source}")
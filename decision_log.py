@@ -0,0 +1,231 @@
+"""
+Append-only motor decision / audit log.
+
+Request handlers call DecisionLog.log(), which only stamps the record and
+puts it on a bounded in-memory queue; a background thread drains the queue,
+serializes records as JSON lines and writes each batch with one write (and
+fsync). Nothing on the request path touches the disk. If the queue is full
+the record is dropped and counted rather than blocking the caller.
+
+Files are partitioned by UTC day of the record and rotated by size:
+
+    <dir>/decisions-2026-10-18.000.jsonl
+    <dir>/decisions-2026-10-18.001.jsonl.gz     (rotated, compress=True)
+
+so reading a day only opens that day's segments (read_day / load_day).
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from metrics import DECISION_LOG_FLUSH_SECONDS, DECISION_LOG_RECORDS
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024    # rotate a day's segment beyond this size
+DEFAULT_FLUSH_INTERVAL = 1.0            # seconds a record may wait before being written
+DEFAULT_BATCH_SIZE = 1024               # records per write
+DEFAULT_QUEUE_SIZE = 100_000            # records buffered before new ones are dropped
+
+_STOP = object()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def record_day(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).date()
+
+
+def segment_paths(directory, day):
+    """A day's segment files in write order (plain and compressed)."""
+    pattern = os.path.join(directory, f"decisions-{day.isoformat()}.*.jsonl*")
+    return sorted(glob.glob(pattern), key=_segment_index)
+
+
+def _segment_index(path):
+    return int(os.path.basename(path).split(".")[1])
+
+
+def _segment_path(directory, day, index):
+    return os.path.join(directory, f"decisions-{day.isoformat()}.{index:03d}.jsonl")
+
+
+class DecisionLog:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE, compress=False, fsync=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compress = compress
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+        self._day = None
+        self._index = 0
+        self.written = 0
+        self.dropped = 0
+
+    # ---------------------------------------------------
+    # Request path
+    # ---------------------------------------------------
+    def log(self, record):
+        """Queue one record (a JSON-serializable dict); never blocks."""
+        try:
+            self._queue.put_nowait((time.time(), record))
+        except queue.Full:
+            self.dropped += 1
+            DECISION_LOG_RECORDS.labels("dropped").inc()
+
+    # ---------------------------------------------------
+    # Writer thread
+    # ---------------------------------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="decision-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Write everything queued so far, then close the active segment."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    DECISION_LOG_RECORDS.labels("failed").inc(len(batch))
+                    _LOGGER.error("Decision log write of %d records failed: %s", len(batch), e)
+        self._close_segment()
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        # a batch may straddle midnight UTC: one write per day
+        by_day = {}
+        for ts, record in batch:
+            line = json.dumps({"ts": ts, **record}, separators=(",", ":"), default=_json_default)
+            by_day.setdefault(record_day(ts), []).append(line)
+
+        for day, lines in by_day.items():
+            self._open_segment(day)
+            self._file.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+        self.written += len(batch)
+        DECISION_LOG_RECORDS.labels("written").inc(len(batch))
+        DECISION_LOG_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    def _open_segment(self, day):
+        if self._file is not None and day == self._day:
+            return
+        self._close_segment()
+        # resume the day's last plain segment, if any (restart within a day)
+        existing = segment_paths(self.directory, day)
+        self._day = day
+        self._index = _segment_index(existing[-1]) if existing else 0
+        if existing and existing[-1].endswith(".gz"):
+            self._index += 1
+        self._file = open(_segment_path(self.directory, day, self._index), "ab")
+
+    def _rotate(self):
+        day, index = self._day, self._index
+        self._close_segment()
+        self._day, self._index = day, index + 1
+        self._file = open(_segment_path(self.directory, day, self._index), "ab")
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        # only finished segments are compressed; the active one stays appendable
+        if self.compress and (self._day != record_day(time.time()) or os.path.getsize(path) >= self.max_bytes):
+            compress_segment(path)
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+
+def compress_segment(path):
+    """Gzip a closed segment in place (path -> path.gz)."""
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+# ---------------------------------------------------
+# Reader
+# ---------------------------------------------------
+def _open_segment_file(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def read_day(directory, day, device_id=None):
+    """Yield a day's records in write order, optionally only one device's."""
+    needle = None if device_id is None else f'"device_id":{json.dumps(device_id)}'.encode("utf-8")
+    for path in segment_paths(directory, day):
+        with _open_segment_file(path) as f:
+            for line in f:
+                # cheap substring test before parsing
+                if needle is not None and needle not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue            # torn last line after a crash
+                if device_id is None or record.get("device_id") == device_id:
+                    yield record
+
+
+def load_day(directory, day, device_id=None):
+    """A day's records as one DataFrame."""
+    import pandas as pd
+
+    return pd.DataFrame(list(read_day(directory, day, device_id)))
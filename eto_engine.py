@@ -0,0 +1,114 @@
+"""
+Array-based FAO-56 Penman–Monteith ETo.
+
+Same formula and constants as WeatherETcCalculator.compute_eto, but every
+input may be a NumPy array or a pandas column, so a whole season or the
+full 30-year history is computed in one pass instead of a Python loop.
+"""
+
+import time
+
+import numpy as np
+
+DEFAULT_ALTITUDE = 545
+ALBEDO = 0.23
+SIGMA = 4.903e-9
+
+
+def saturation_vapor_pressure(T):
+    T = np.asarray(T, dtype=np.float64)
+    return 0.6108 * np.exp((17.27 * T) / (T + 237.3))
+
+
+def psychrometric_constant(altitude=DEFAULT_ALTITUDE):
+    pressure = 101.3 * ((293 - 0.0065 * np.asarray(altitude, dtype=np.float64)) / 293) ** 5.26
+    return 0.000665 * pressure
+
+
+def compute_eto(min_temp, max_temp, humidity, wind, sun_hours, radiation, altitude=DEFAULT_ALTITUDE):
+    """Reference ETo (mm/day) for broadcastable arrays of daily inputs."""
+    min_temp = np.asarray(min_temp, dtype=np.float64)
+    max_temp = np.asarray(max_temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    wind = np.asarray(wind, dtype=np.float64)
+    sun_hours = np.asarray(sun_hours, dtype=np.float64)
+    radiation = np.asarray(radiation, dtype=np.float64)
+
+    T = (min_temp + max_temp) / 2
+
+    es = (saturation_vapor_pressure(min_temp) + saturation_vapor_pressure(max_temp)) / 2
+    ea = (humidity / 100) * es
+    vpd = es - ea
+    delta = (4098 * es) / ((T + 237.3) ** 2)
+
+    gamma = psychrometric_constant(altitude)
+
+    Rns = (1 - ALBEDO) * radiation
+
+    Tmax_K = max_temp + 273.16
+    Tmin_K = min_temp + 273.16
+
+    Rnl = SIGMA * ((Tmax_K ** 4 + Tmin_K ** 4) / 2) * \
+          (0.34 - 0.14 * np.sqrt(ea)) * \
+          (1.35 - 0.35 * (sun_hours / 12))
+
+    Rn = Rns - Rnl
+    G = 0
+
+    return (
+        0.408 * delta * (Rn - G)
+        + gamma * (900 / (T + 273)) * wind * vpd
+    ) / (delta + gamma * (1 + 0.34 * wind))
+
+
+def compute_eto_frame(df, altitude=DEFAULT_ALTITUDE):
+    """ETo for a DataFrame with the model feature columns (min_temp ... radiation)."""
+    return compute_eto(
+        df["min_temp"].to_numpy(),
+        df["max_temp"].to_numpy(),
+        df["humidity"].to_numpy(),
+        df["wind"].to_numpy(),
+        df["sun_hours"].to_numpy(),
+        df["radiation"].to_numpy(),
+        altitude=altitude,
+    )
+
+
+def verify_against_scalar(df, altitude=DEFAULT_ALTITUDE, rtol=1e-9, atol=1e-9):
+    """
+    Compare compute_eto_frame with the scalar WeatherETcCalculator.compute_eto
+    row by row. Returns (max_abs_diff, all_close).
+    """
+    from openweather import WeatherETcCalculator
+
+    calculator = WeatherETcCalculator()
+    calculator.altitude = altitude
+
+    vectorized = compute_eto_frame(df, altitude)
+    scalar = np.array([
+        calculator.compute_eto(*row)
+        for row in df[["min_temp", "max_temp", "humidity", "wind", "sun_hours", "radiation"]]
+        .itertuples(index=False, name=None)
+    ])
+
+    max_diff = float(np.nanmax(np.abs(vectorized - scalar))) if len(scalar) else 0.0
+    return max_diff, bool(np.allclose(vectorized, scalar, rtol=rtol, atol=atol, equal_nan=True))
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from ml_predit import CSV_COLUMNS
+
+    history = pd.read_csv("final_eto_output_azure_cleaned.csv").rename(columns=CSV_COLUMNS).dropna()
+
+    start = time.perf_counter()
+    eto = compute_eto_frame(history)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    max_diff, ok = verify_against_scalar(history)
+
+    print(f"Rows: {len(history)}")
+    print(f"Vectorized ETo: {elapsed_ms:.2f} ms")
+    print(f"Max |vectorized - scalar|: {max_diff:.3e} (match: {ok})")
+    print(f"Mean |formula - recorded ETo|: {np.mean(np.abs(eto - history['eto'].to_numpy())):.3f} mm/day")
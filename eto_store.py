@@ -0,0 +1,127 @@
+"""
+Columnar Parquet store for the cleaned ETo history.
+
+Hive-partitioned by year/month (eto_store/year=1992/month=4/...parquet) with
+float32 feature columns and a real date32 column. Loaders project columns and
+push date ranges down to partition pruning + row-group statistics, so training
+runs and backtests read only the slices they need.
+
+    python eto_store.py                    # (re)build from the cleaned CSV
+"""
+
+import argparse
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from dataset_builder import CLEANED_CSV
+from ml_predit import CSV_COLUMNS, FEATURES
+
+STORE_DIR = "eto_store"
+
+SCHEMA = pa.schema(
+    [pa.field(name, pa.float32()) for name in FEATURES]
+    + [
+        pa.field("eto", pa.float32()),
+        pa.field("date", pa.date32()),
+        pa.field("year", pa.int16()),
+        pa.field("month", pa.int8()),
+    ]
+)
+PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive"
+)
+
+
+# ---------------------------------------------------
+# Write
+# ---------------------------------------------------
+def frame_to_table(df):
+    """Typed Arrow table from a cleaned-CSV DataFrame (original headers)."""
+    df = df.rename(columns=CSV_COLUMNS)
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.dropna(subset=["date"])
+
+    columns = {name: pd.to_numeric(df[name], errors="coerce").astype("float32") for name in FEATURES + ["eto"]}
+    columns["date"] = df["date"].dt.date
+    columns["year"] = df["date"].dt.year.astype("int16")
+    columns["month"] = df["date"].dt.month.astype("int8")
+
+    return pa.table(columns, schema=SCHEMA)
+
+
+def write_store(cleaned_csv=CLEANED_CSV, root=STORE_DIR):
+    """
+    Write `cleaned_csv` into the partitioned store. Partitions present in the
+    CSV are replaced; partitions not in it are left untouched, so appending a
+    month of new data only rewrites that month.
+    """
+    table = frame_to_table(pd.read_csv(cleaned_csv))
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        existing_data_behavior="delete_matching",
+    )
+    return table.num_rows
+
+
+# ---------------------------------------------------
+# Read
+# ---------------------------------------------------
+def _to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def date_filter(start=None, end=None):
+    """
+    Dataset expression for start <= date <= end (either bound optional).
+    Year bounds are added so whole partitions are pruned before any file is read.
+    """
+    start, end = _to_date(start), _to_date(end)
+    expr = None
+
+    def _and(a, b):
+        return b if a is None else a & b
+
+    if start is not None:
+        expr = _and(expr, pc.field("year") >= start.year)
+        expr = _and(expr, pc.field("date") >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        expr = _and(expr, pc.field("year") <= end.year)
+        expr = _and(expr, pc.field("date") <= pa.scalar(end, pa.date32()))
+    return expr
+
+
+def open_store(root=STORE_DIR):
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+
+def load_table(columns=None, start=None, end=None, root=STORE_DIR):
+    """Arrow table of `columns` (default: all) between `start` and `end`."""
+    return open_store(root).to_table(columns=columns, filter=date_filter(start, end))
+
+
+def load_frame(columns=None, start=None, end=None, root=STORE_DIR):
+    """
+    pandas view of load_table. Single-chunk float32 columns without nulls are
+    handed over without copying.
+    """
+    table = load_table(columns, start, end, root).combine_chunks()
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the partitioned Parquet ETo store")
+    parser.add_argument("--csv", default=CLEANED_CSV)
+    parser.add_argument("--root", default=STORE_DIR)
+    args = parser.parse_args()
+
+    rows = write_store(args.csv, args.root)
+    print(f"Wrote {rows} rows to {args.root}/")
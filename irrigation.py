@@ -0,0 +1,137 @@
+"""
+Motor decision rule, vectorized over any number of devices.
+
+A device's pump stays ON until the water delivered today exceeds
+min(ML ETc, FAO-56 ETc) for its field, or the soil is already wet.
+"""
+
+import numpy as np
+
+from crop_kc import DEFAULT_CROP, crop_kc
+from eto_engine import DEFAULT_ALTITUDE, compute_eto
+from metrics import FAO_COMPUTE_SECONDS
+from ml_predit import FEATURES
+
+SOIL_MOISTURE_LIMIT = 15    # % above which the pump is always switched off
+
+
+def motor_decisions(water_flow, soil_moisture, threshold):
+    """Boolean motor state per device (True = ON)."""
+    water_flow = np.asarray(water_flow, dtype=np.float64)
+    soil_moisture = np.asarray(soil_moisture, dtype=np.float64)
+    threshold = np.asarray(threshold, dtype=np.float64)
+    return ~((water_flow > threshold) | (soil_moisture > SOIL_MOISTURE_LIMIT))
+
+
+def motor_decisions_hysteresis(water_flow, soil_moisture, threshold, previous=None, flow_band=0.0, moisture_band=0.0):
+    """
+    motor_decisions with a dead band around both limits. A running pump
+    switches off on the plain rule; a stopped one only restarts once water
+    flow is flow_band below the threshold and soil moisture moisture_band
+    below SOIL_MOISTURE_LIMIT. previous holds the current state per device
+    (None = unknown, which falls back to the plain rule).
+    """
+    water_flow = np.asarray(water_flow, dtype=np.float64)
+    soil_moisture = np.asarray(soil_moisture, dtype=np.float64)
+    threshold = np.asarray(threshold, dtype=np.float64)
+
+    plain = motor_decisions(water_flow, soil_moisture, threshold)
+    if previous is None:
+        return plain
+
+    # 1.0 = on, 0.0 = off, nan = unknown
+    previous = np.array([np.nan if p is None else float(p) for p in np.atleast_1d(previous)])
+    restart = (water_flow < threshold - flow_band) & (soil_moisture < SOIL_MOISTURE_LIMIT - moisture_band)
+    return np.where(previous == 0.0, restart, plain)
+
+
+def compute_eto_sites(predictor, pred_inputs, weather_rows, altitudes):
+    """(ML ETo, FAO-56 ETo) arrays for several sites: one model call and one array FAO-56 pass."""
+    X = np.array([[pred_input[name] for name in FEATURES] for pred_input in pred_inputs], dtype=np.float32)
+    pred_eto = predictor._predict_eto(X)
+    columns = {name: [weather[name] for weather in weather_rows] for name in FEATURES}
+    with FAO_COMPUTE_SECONDS.time():
+        calc_eto = compute_eto(
+            columns["min_temp"],
+            columns["max_temp"],
+            columns["humidity"],
+            columns["wind"],
+            columns["sun_hours"],
+            columns["radiation"],
+            altitude=np.asarray(altitudes, dtype=np.float64),
+        )
+    return pred_eto, calc_eto
+
+
+def decide(pred_eto, calc_eto, das, water_flow, soil_moisture, crops=DEFAULT_CROP,
+           previous=None, flow_band=0.0, moisture_band=0.0):
+    """
+    Motor rule for N devices from already computed ETo values (one value for
+    all devices or one per device). Kc is one table lookup, so ETc for every
+    field is a single array multiply. crops: one crop for all devices or one per device;
+    previous / *_band enable hysteresis (see motor_decisions_hysteresis).
+    Returns a dict of N-length arrays.
+    """
+    kc = crop_kc(np.asarray(das), crops)
+
+    pred_etc = pred_eto * kc
+    calc_etc = calc_eto * kc
+
+    threshold = np.minimum(pred_etc, calc_etc)
+    motor = motor_decisions_hysteresis(water_flow, soil_moisture, threshold, previous, flow_band, moisture_band)
+
+    return {
+        "predicted_etc": pred_etc,
+        "calculated_etc": calc_etc,
+        "threshold": threshold,
+        "motor": motor,
+    }
+
+
+def plan_horizon(predictor, weather, pred_input, das, crops=DEFAULT_CROP, altitude=DEFAULT_ALTITUDE):
+    """
+    ETc plan for D forecast days x F fields in one pass.
+
+    weather / pred_input hold D-length arrays (see forecast_weather and
+    build_pred_input); das is each field's DAS on the first forecast day.
+    ML ETo is one model call over the D rows and FAO-56 ETo one array
+    expression; Kc is one lookup over the (D, F) DAS grid, so ETc and the
+    irrigation target min(ML ETc, FAO ETc) are (D, F) array products.
+    """
+    offsets = np.array([(day - weather["dates"][0]).days for day in weather["dates"]], dtype=np.int64)
+    das = np.atleast_1d(np.asarray(das, dtype=np.int64))
+    das_grid = offsets[:, None] + das[None, :]
+
+    X = np.column_stack([np.asarray(pred_input[name], dtype=np.float32) for name in FEATURES])
+    pred_eto = predictor._predict_eto(X)
+    with FAO_COMPUTE_SECONDS.time():
+        calc_eto = compute_eto(
+            weather["min_temp"],
+            weather["max_temp"],
+            weather["humidity"],
+            weather["wind"],
+            weather["sun_hours"],
+            weather["radiation"],
+            altitude=altitude,
+        )
+
+    if isinstance(crops, str):
+        kc = crop_kc(das_grid, crops)
+    else:
+        kc = crop_kc(das_grid.ravel(), np.tile(np.asarray(crops, dtype=object), len(offsets))).reshape(das_grid.shape)
+
+    pred_etc = pred_eto[:, None] * kc
+    calc_etc = calc_eto[:, None] * kc
+    threshold = np.minimum(pred_etc, calc_etc)
+
+    return {
+        "dates": weather["dates"],
+        "das": das_grid,
+        "predicted_eto": pred_eto,
+        "calculated_eto": calc_eto,
+        "kc": kc,
+        "predicted_etc": pred_etc,
+        "calculated_etc": calc_etc,
+        "threshold": threshold,
+        "total": threshold.sum(axis=0),
+    }
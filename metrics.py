@@ -0,0 +1,271 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms (optionally labelled) are registered in a
+module-level registry and rendered by api.py at GET /metrics. Updating a
+metric is a lock-protected add; all formatting happens at scrape time.
+State owned elsewhere (MQTT connection, queue drops, motor command counters)
+is exported through set_function callbacks evaluated on scrape.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; spans sub-millisecond model calls to multi-second upstream fetches
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------
+# Children (one per label combination)
+# ---------------------------------------------------
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def set_function(self, fn):
+        """Read the value from fn() at scrape time instead of storing it."""
+        self._function = fn
+
+    def get(self):
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+
+class _GaugeValue(_Value):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._upper_bounds = buckets
+        self._counts = [0] * (len(buckets) + 1)     # last slot: +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+# ---------------------------------------------------
+# Metric families
+# ---------------------------------------------------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+        if not self.labelnames:
+            self.labels()       # unlabelled metrics are exported from the start
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        for key, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set_function(self, fn):
+        self._unlabelled().set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def render(self):
+        lines = self._header()
+        for key, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for upper, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {"le": _format_value(float(upper))})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render():
+    return REGISTRY.render()
+
+
+# ---------------------------------------------------
+# Hot-path metrics shared by the service modules
+# ---------------------------------------------------
+WEATHER_FETCH_SECONDS = Histogram(
+    "weather_fetch_seconds", "Time to get today's aggregated forecast", ["source"])
+WEATHER_FETCH_ERRORS = Counter(
+    "weather_fetch_errors_total", "Failed OpenWeather forecast requests")
+MODEL_PREDICT_SECONDS = Histogram(
+    "eto_model_predict_seconds", "ETo model inference time per call", ["model"])
+MODEL_PREDICT_ROWS = Counter(
+    "eto_model_predict_rows_total", "Rows scored by each ETo model", ["model"])
+FAO_COMPUTE_SECONDS = Histogram(
+    "fao_eto_compute_seconds", "FAO-56 Penman-Monteith ETo computation time")
+MQTT_PUBLISH_SECONDS = Histogram(
+    "mqtt_publish_seconds", "Time from queueing a message to handing it to the MQTT client", ["client"])
+MQTT_PUBLISHED = Counter(
+    "mqtt_published_total", "Messages handed to the MQTT client", ["client"])
+MQTT_RECEIVED = Counter(
+    "mqtt_received_total", "Messages received from the broker", ["client"])
+MQTT_CONNECTED = Gauge(
+    "mqtt_connected", "1 when the MQTT client is connected", ["client"])
+MQTT_DROPPED = Counter(
+    "mqtt_dropped_total", "Messages dropped because a queue was full or the client rejected them", ["client", "direction"])
+SENSOR_INGEST_SECONDS = Histogram(
+    "sensor_ingest_seconds", "Telemetry handler time per message, including re-evaluation")
+SENSOR_MESSAGES = Counter(
+    "sensor_messages_total", "Telemetry messages by outcome", ["result"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "HTTP request handling time", ["method", "path", "status"])
+MOTOR_COMMANDS = Counter(
+    "motor_commands_total", "Motor command publisher decisions by outcome", ["outcome"])
+MOTOR_COMMANDS_PENDING = Gauge(
+    "motor_commands_pending", "Motors with a command not yet sent or acknowledged")
+CONTROL_LOOP_LAST_RUN = Gauge(
+    "control_loop_last_run_timestamp_seconds", "When the control loop last refreshed ETo")
+DEVICES_REGISTERED = Gauge(
+    "devices_registered", "Devices with a sowing date")
+DECISION_LOG_RECORDS = Counter(
+    "decision_log_records_total", "Decision log records by outcome", ["result"])
+DECISION_LOG_FLUSH_SECONDS = Histogram(
+    "decision_log_flush_seconds", "Time to write (and fsync) one decision log batch")
@@ -1,44 +1,234 @@
-import joblib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
+from crop_kc import DEFAULT_CROP, crop_kc, maize_kc
+from metrics import MODEL_PREDICT_ROWS, MODEL_PREDICT_SECONDS
+
+_LOGGER = logging.getLogger(__name__)
+
+# joblib / lightgbm (which pulls in scikit-learn) are imported where a model is
+# actually loaded, so importing this module for FEATURES or the Kc helpers stays cheap.
+
+# sklearn-wrapper pickle and LightGBM's native text dump of the same model
+LGBM_PICKLE = "eto_lightgbm_model.pkl"
+LGBM_NATIVE = "eto_lightgbm_model.txt"
+
+# Feature order the ETo models were trained on.
+FEATURES = ["min_temp", "max_temp", "humidity", "wind", "sun_hours", "radiation"]
+
+# OCR'd headers of the cleaned dataset -> model names
+CSV_COLUMNS = {
+    "Min Temp o 0": "min_temp",
+    "Max Temp 0": "max_temp",
+    "Humidity ojo": "humidity",
+    "Wind m/s\n:selected:": "wind",
+    "Sun hours": "sun_hours",
+    "Rad MJ/m2 / day": "radiation",
+    "ETo mm/ day": "eto",
+    "date": "date"
+}
+
+
+def default_model_path():
+    """Prefer the native LightGBM dump when it is at least as new as the pickle."""
+    if not os.path.exists(LGBM_NATIVE):
+        return LGBM_PICKLE
+    if os.path.exists(LGBM_PICKLE) and os.path.getmtime(LGBM_NATIVE) < os.path.getmtime(LGBM_PICKLE):
+        _LOGGER.warning("%s is older than %s; loading the pickle", LGBM_NATIVE, LGBM_PICKLE)
+        return LGBM_PICKLE
+    return LGBM_NATIVE
+
+
+def export_native(pickle_path=LGBM_PICKLE, native_path=LGBM_NATIVE):
+    """Write the Booster inside a pickled LGBMRegressor in LightGBM's text format."""
+    import joblib
+
+    model = joblib.load(pickle_path)
+    booster = getattr(model, "booster_", None) or model._Booster
+    booster.save_model(native_path)
+    return native_path
+
+
+# Registry of the ETo regressors shipped with the repo
+MODEL_FILES = {
+    "lightgbm": LGBM_PICKLE,
+    "xgboost": "eto_xgboost_model.pkl",
+    "gradient_boosting": "eto_gradient_boosting_model.pkl",
+}
+ENSEMBLE_METHODS = ("mean", "median", "weighted")
+
+
+def parse_weights(spec):
+    """"lightgbm=2,xgboost=1" -> {"lightgbm": 2.0, "xgboost": 1.0} (empty spec -> {})."""
+    weights = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected model=weight, got {item.strip()!r}")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+class EtoModel:
+    """One ETo regressor, loaded on demand, predicting through its fastest entry point."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.model = None
+        self.booster = None
+        self.load_seconds = None
+
+    def load(self):
+        if self.model is not None:
+            return self
+
+        start = time.perf_counter()
+        if self.path.endswith(".pkl"):
+            import joblib
+
+            self.model = joblib.load(self.path)
+            if self.name == "lightgbm":
+                self.booster = getattr(self.model, "booster_", None) or getattr(self.model, "_Booster", None)
+        else:
+            import lightgbm as lgb
+
+            self.booster = lgb.Booster(model_file=self.path)
+            self.model = self.booster
+        self.load_seconds = time.perf_counter() - start
+
+        _LOGGER.info("%s model loaded from %s in %.1f ms", self.name, self.path, self.load_seconds * 1000)
+        return self
+
+    def predict(self, input_arr: np.ndarray) -> np.ndarray:
+        self.load()
+
+        # Going straight to the LightGBM Booster skips the sklearn wrapper's
+        # input validation, which dominates single-row latency.
+        if self.booster is not None:
+            return np.asarray(self.booster.predict(input_arr), dtype=np.float64)
+        return np.asarray(self.model.predict(input_arr), dtype=np.float64)
+
 
 class MaizeETCPredictor:
-    def __init__(self):
+    def __init__(self, model_path=None, lazy=False, models=("lightgbm",), ensemble="mean", weights=None):
+
+        """
+        ETo model registry + maize Kc.
+        models: any subset of MODEL_FILES; predictions from several models
+                are combined with `ensemble` (mean / median / weighted).
+        weights: {model: weight} for "weighted"; unlisted models weigh 1.
+        model_path: override for the LightGBM file (pickle or native .txt).
+        lazy: defer reading model files until load() or the first prediction.
+        """
+
+        unknown = set(models) - set(MODEL_FILES)
+        if unknown or not models:
+            raise ValueError(f"Unknown or empty model selection: {sorted(unknown) or models}")
+        if ensemble not in ENSEMBLE_METHODS:
+            raise ValueError(f"ensemble must be one of {ENSEMBLE_METHODS}")
+        weights = weights or {}
+        if set(weights) - set(models):
+            raise ValueError(f"Weights for models not selected: {sorted(set(weights) - set(models))}")
+        if any(weight < 0 for weight in weights.values()) or not sum(weights.get(name, 1.0) for name in models) > 0:
+            raise ValueError("Ensemble weights must be non-negative with a positive total")
 
-        """Load trained ETo model."""
+        paths = dict(MODEL_FILES, lightgbm=model_path or default_model_path())
+        self.models = {name: EtoModel(name, paths[name]) for name in models}
+        self.ensemble = ensemble
+        self.weights = weights
 
-        self.lgbm_model = joblib.load("eto_lightgbm_model.pkl")
-        print("model loaded successfully!")
+        # Models run concurrently only when there is more than one
+        self._executor = ThreadPoolExecutor(max_workers=len(self.models)) if len(self.models) > 1 else None
+
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+        if not lazy:
+            self.load()
+
+    def load(self):
+        if self.load_seconds is not None:
+            return self
+
+        start = time.perf_counter()
+        for model in self.models.values():
+            model.load()
+        self.load_seconds = time.perf_counter() - start
+        return self
+
+    def warm_up(self):
+        """One throwaway prediction so the first request does not pay for lazy init."""
+        self.load()
+        start = time.perf_counter()
+        self._predict_eto(np.zeros((1, len(FEATURES)), dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - start
+        return self.warmup_seconds
+
+    # ---------------------------------------------
+    # Kc from the shared crop table (crop_kc)
+    # ---------------------------------------------
+    get_maize_kc = staticmethod(maize_kc)
 
     # ---------------------------------------------
-    # Kc Calculation Based on DAS
+    # ETo from every registered model + ensemble
     # ---------------------------------------------
     @staticmethod
-    def get_maize_kc(das: float) -> float:
-        """Return Kc for maize based on days after sowing (DAS)."""
-
-        if das < 0:
-            raise ValueError("DAS cannot be negative.")
-
-        if 0 <= das < 25:
-            kc_start, kc_end = 0.30, 0.40
-            das_start, das_end = 0, 25
-        elif 25 <= das < 55:
-            kc_start, kc_end = 0.40, 0.80
-            das_start, das_end = 25, 55
-        elif 55 <= das < 95:
-            kc_start, kc_end = 1.15, 1.20
-            das_start, das_end = 55, 90
-        elif 95 <= das <= 120:
-            kc_start, kc_end = 0.70, 0.35
-            das_start, das_end = 95, 120
-        else:
-            return 0.35  # after harvest
+    def _timed_predict(model, input_arr):
+        start = time.perf_counter()
+        eto = model.predict(input_arr)
+        seconds = time.perf_counter() - start
+        MODEL_PREDICT_SECONDS.labels(model.name).observe(seconds)
+        MODEL_PREDICT_ROWS.labels(model.name).inc(len(input_arr))
+        return eto, seconds
+
+    def predict_eto_models(self, input_arr: np.ndarray) -> dict:
+        """{name: (eto array, seconds)} for every model, run concurrently on the same matrix."""
+        if self._executor is None:
+            return {name: self._timed_predict(model, input_arr) for name, model in self.models.items()}
+
+        futures = {
+            name: self._executor.submit(self._timed_predict, model, input_arr)
+            for name, model in self.models.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
 
-        # Linear interpolation
-        kc = kc_start + (kc_end - kc_start) * ((das - das_start) / (das_end - das_start))
-        return kc
+    def combine(self, predictions: dict) -> np.ndarray:
+        """Ensemble per-model ETo arrays with the configured method."""
+        names = list(predictions)
+        stacked = np.vstack([predictions[name][0] for name in names])
+
+        if len(names) == 1:
+            return stacked[0]
+        if self.ensemble == "median":
+            return np.median(stacked, axis=0)
+        if self.ensemble == "weighted":
+            weights = np.array([self.weights.get(name, 1.0) for name in names], dtype=np.float64)
+            return weights @ stacked / weights.sum()
+        return stacked.mean(axis=0)
+
+    @staticmethod
+    def model_report(predictions: dict, kc=None) -> dict:
+        """Per-model ETo (and ETc) with inference time, for API responses."""
+        report = {}
+        for name, (eto, seconds) in predictions.items():
+            entry = {"inference_ms": round(seconds * 1000, 3)}
+            if len(eto) == 1:
+                entry["eto"] = float(eto[0])
+                if kc is not None:
+                    entry["etc"] = float(eto[0] * kc)
+            report[name] = entry
+        return report
 
+    def _predict_eto(self, input_arr: np.ndarray) -> np.ndarray:
+        """Ensembled ETo for an (N, 6) matrix, one value per row."""
+        return self.combine(self.predict_eto_models(input_arr))
 
     # ---------------------------------------------
     # Predict ETc (ETc = Kc × ETo)
@@ -46,36 +236,23 @@ class MaizeETCPredictor:
     def predict_etc(self, weather_dict, das) -> dict:
         """
         Predict ETc using:
-        - LightGBM ML ETo prediction
+        - ML ETo prediction (ensembled over the registered models)
         - Maize Kc based on DAS
         """
-        print("MODEL BOOSTER:", self.lgbm_model._Booster)
-
         # Convert weather dict to 2D numpy array
         input_data = np.array([list(weather_dict.values())])
 
-        print("Input data for prediction:", input_data)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Predicting with %s on %s", ", ".join(self.models), input_data)
 
-        # Predict ETo using LightGBM
-        print(self.lgbm_model)
         # ensure numeric dtype
         try:
             input_arr = input_data.astype(np.float32)
         except Exception:
             input_arr = input_data
 
-        try:
-            eto_pred = self.lgbm_model.predict(input_arr)[0]
-        except Exception as e:
-            # Some lightgbm / sklearn version mismatches cause the
-            # sklearn wrapper predict to fail (private validation helper
-            # becomes None). Fall back to the underlying Booster.
-            print("sklearn wrapper predict failed, falling back to Booster.predict:", e)
-            try:
-                eto_pred = float(self.lgbm_model._Booster.predict(input_arr)[0])
-            except Exception as e2:
-                print("Booster.predict also failed:", e2)
-                raise
+        predictions = self.predict_eto_models(input_arr)
+        eto_pred = self.combine(predictions)[0]
 
         # Compute Kc
         kc = self.get_maize_kc(das)
@@ -84,7 +261,59 @@ class MaizeETCPredictor:
         etc_value = eto_pred * kc
 
         return {
-            "etc": float(etc_value)
+            "etc": float(etc_value),
+            "eto": float(eto_pred),
+            "ensemble": self.ensemble,
+            "models": self.model_report(predictions, kc)
         }
 
+    # ---------------------------------------------
+    # Batch ETc for many fields in one predict call
+    # ---------------------------------------------
+    def predict_etc_batch(self, weather_rows, das_values, crops=DEFAULT_CROP) -> dict:
+        """
+        Predict ETc for N (weather, das) records with a single model call.
+        weather_rows: list of dicts keyed by FEATURES
+        das_values: sequence of N days-after-sowing values
+        crops: one crop name for every record, or one per record
+        """
+        if len(weather_rows) != len(das_values):
+            raise ValueError("weather_rows and das_values must have the same length.")
+
+        input_arr = np.array(
+            [[row[name] for name in FEATURES] for row in weather_rows],
+            dtype=np.float32,
+        ).reshape(-1, len(FEATURES))
+
+        predictions = self.predict_eto_models(input_arr)
+        eto_pred = self.combine(predictions)
+        kc = crop_kc(np.asarray(das_values), crops)
+
+        return {
+            "eto": eto_pred,
+            "kc": kc,
+            "etc": eto_pred * kc,
+            "ensemble": self.ensemble,
+            "models": self.model_report(predictions)
+        }
+
+
+if __name__ == "__main__":
+    # Export the native model and compare cold start / per-row latency
+    export_native()
+    sample = {"min_temp": 22.5, "max_temp": 31.0, "humidity": 75, "wind": 2.8, "sun_hours": 11.5, "radiation": 27.9}
+
+    for path in (LGBM_PICKLE, LGBM_NATIVE):
+        predictor = MaizeETCPredictor(path)
+        predictor.warm_up()
+
+        row = np.array([[sample[name] for name in FEATURES]], dtype=np.float32)
+        timings = []
+        for _ in range(500):
+            start = time.perf_counter()
+            predictor._predict_eto(row)
+            timings.append(time.perf_counter() - start)
 
+        print(f"{path}: load={predictor.load_seconds * 1000:.1f} ms "
+              f"warm-up={predictor.warmup_seconds * 1000:.2f} ms "
+              f"predict p50={np.percentile(timings, 50) * 1000:.3f} ms")
@@ -0,0 +1,236 @@
+"""
+Deduplicated, coalesced motor command publishing.
+
+Decisions are submitted as often as they are computed; the publisher keeps
+the desired and last acknowledged state per motor and only sends a command
+when they differ:
+  - repeated decisions for the state already acked (or in flight) are suppressed
+  - bursts of submissions within one coalescing window collapse to one publish
+    of the latest state
+  - a motor that changed state less than min_dwell seconds ago is held
+  - a command not acked within ack_timeout is sent again
+  - a command that cannot be queued at all is dropped until the next decision
+  - the acked state is re-published once it is older than refresh_interval,
+    or on refresh() (e.g. when a silent device reports again)
+
+"Acked" means the broker acknowledged the publish (PUBACK at QoS 1), not
+that the relay received or applied it. A relay that rebooted or was offline
+gets the current state again through the periodic / explicit refresh.
+"""
+
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+COALESCE_SECONDS = 0.5
+MIN_DWELL_SECONDS = 30
+ACK_TIMEOUT_SECONDS = 30
+RECHECK_SECONDS = 1             # flush cadence while commands are held or awaiting acks
+REFRESH_SECONDS = 600           # re-publish an unchanged acked state this often (0: never)
+
+
+class MotorState:
+    __slots__ = ("desired", "acked", "inflight", "inflight_since", "changed_at", "acked_at")
+
+    def __init__(self):
+        self.desired = None         # latest decision
+        self.acked = None           # last state the broker acknowledged (PUBACK)
+        self.inflight = None        # state sent but not yet acked
+        self.inflight_since = None
+        self.changed_at = None      # when `acked` last changed
+        self.acked_at = None        # when the broker last acknowledged a command
+
+    def as_dict(self):
+        return {
+            "desired": self.desired,
+            "acked": self.acked,
+            "inflight": self.inflight,
+            "changed_at": self.changed_at,
+        }
+
+
+class MotorCommandPublisher:
+    def __init__(self, send, coalesce_seconds=COALESCE_SECONDS, min_dwell=MIN_DWELL_SECONDS,
+                 ack_timeout=ACK_TIMEOUT_SECONDS, refresh_interval=REFRESH_SECONDS):
+        """
+        send(device_id, state, on_ack) -> bool queues one command and calls
+        on_ack() once the broker acknowledges it; False means it could not be queued.
+        """
+        self.send = send
+        self.coalesce_seconds = coalesce_seconds
+        self.min_dwell = min_dwell
+        self.ack_timeout = ack_timeout
+        self.refresh_interval = refresh_interval
+
+        self.motors = {}
+        self._dirty = set()
+        self._held = set()
+        self._refresh = set()       # acked state to be re-published as is
+        self._wakeup = None
+        self._task = None
+
+        self.submitted = 0
+        self.sent = 0
+        self.suppressed = 0
+        self.coalesced = 0
+        self.held = 0
+        self.acked = 0
+        self.retried = 0
+        self.failed = 0
+        self.refreshed = 0
+
+    # ---------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_task(), name="motor-commands")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.flush()
+
+    # ---------------------------------------------------
+    # Decisions
+    # ---------------------------------------------------
+    def state(self, device_id):
+        """Current motor state for hysteresis: desired, else acked, else None."""
+        motor = self.motors.get(device_id)
+        if motor is None:
+            return None
+        return motor.desired if motor.desired is not None else motor.acked
+
+    def submit(self, device_id, state):
+        """Record a decision; the command (if any) goes out on the next flush."""
+        state = bool(state)
+        motor = self.motors.get(device_id)
+        if motor is None:
+            motor = self.motors[device_id] = MotorState()
+
+        self.submitted += 1
+        pending = device_id in self._dirty
+        if pending and state == motor.desired:
+            self.suppressed += 1
+            return False
+        if pending:
+            self.coalesced += 1     # replaces a decision that was not sent yet
+        elif state == (motor.inflight if motor.inflight is not None else motor.acked):
+            motor.desired = state
+            if motor.inflight is not None or not self._refresh_due(motor, time.time()):
+                self.suppressed += 1
+                return False
+            self._refresh.add(device_id)
+
+        motor.desired = state
+        self._dirty.add(device_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def refresh(self, device_id):
+        """Re-publish a motor's acked state on the next flush (e.g. the relay may have rebooted)."""
+        motor = self.motors.get(device_id)
+        if motor is None or motor.acked is None or motor.inflight is not None or device_id in self._dirty:
+            return False
+        motor.desired = motor.acked
+        self._refresh.add(device_id)
+        self._dirty.add(device_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def _refresh_due(self, motor, now):
+        return bool(self.refresh_interval) and motor.acked_at is not None and now - motor.acked_at >= self.refresh_interval
+
+    # ---------------------------------------------------
+    # Publishing
+    # ---------------------------------------------------
+    def flush(self, now=None):
+        """Send every pending command that is due. Returns the number sent."""
+        now = time.time() if now is None else now
+        sent = 0
+        for device_id in list(self._dirty):
+            motor = self.motors[device_id]
+
+            if motor.inflight is not None and now - motor.inflight_since > self.ack_timeout:
+                _LOGGER.warning("Motor command for %s not acked after %d s, resending", device_id, self.ack_timeout)
+                motor.inflight = None
+                self.retried += 1
+
+            refresh = device_id in self._refresh and motor.desired == motor.acked
+            if motor.desired == motor.acked and motor.inflight is None and not refresh:
+                self._dirty.discard(device_id)
+                self._held.discard(device_id)
+                self._refresh.discard(device_id)
+                continue
+            if motor.desired == motor.inflight:
+                continue            # waiting for the ack
+            # a refresh does not switch the relay, so it is never held
+            if not refresh and motor.changed_at is not None and now - motor.changed_at < self.min_dwell:
+                if device_id not in self._held:
+                    self._held.add(device_id)
+                    self.held += 1
+                continue            # retried on a later flush
+
+            self._held.discard(device_id)
+            self._refresh.discard(device_id)
+            if self.send(device_id, motor.desired, self._ack_callback(device_id, motor.desired)):
+                motor.inflight = motor.desired
+                motor.inflight_since = now
+                self.sent += 1
+                self.refreshed += refresh
+                sent += 1
+            else:
+                self._dirty.discard(device_id)
+                self.failed += 1
+        return sent
+
+    def _ack_callback(self, device_id, state):
+        def on_ack():
+            motor = self.motors[device_id]
+            self.acked += 1
+            if motor.acked != state:
+                motor.changed_at = time.time()
+            motor.acked = state
+            motor.acked_at = time.time()
+            if motor.inflight == state:
+                motor.inflight = None
+            if motor.desired != state:
+                self._dirty.add(device_id)
+            elif motor.inflight is None:
+                self._dirty.discard(device_id)
+        return on_ack
+
+    async def _flush_task(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            # let a burst of decisions settle before publishing
+            await asyncio.sleep(self.coalesce_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                _LOGGER.error("Motor command flush failed: %s", e)
+            if self._dirty:
+                # held / in-flight commands: look again later
+                loop.call_later(RECHECK_SECONDS, self._wakeup.set)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "suppressed": self.suppressed,
+            "coalesced": self.coalesced,
+            "held": self.held,
+            "acked": self.acked,
+            "retried": self.retried,
+            "failed": self.failed,
+            "refreshed": self.refreshed,
+            "pending": len(self._dirty),
+        }
@@ -0,0 +1,253 @@
+"""
+asyncio integration for paho-mqtt clients.
+
+The paho socket is driven by the running event loop (add_reader/add_writer,
+paho's external-loop hooks) instead of loop_start() plus a reconnect thread:
+  - reconnects are triggered by on_disconnect, with exponential backoff
+  - outgoing messages go through a bounded queue (oldest dropped when full),
+    with an optional callback once the broker acknowledges them; a message
+    the client rejects (e.g. an invalid topic) is dropped and logged
+  - incoming messages are queued and dispatched by a separate task, so a slow
+    handler never stalls socket reads or keepalives
+"""
+
+import asyncio
+import logging
+import time
+
+import paho.mqtt.client as mqtt
+
+from metrics import MQTT_DROPPED, MQTT_PUBLISH_SECONDS, MQTT_PUBLISHED, MQTT_RECEIVED
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_BACKOFF = 30                # seconds between reconnect attempts, at most
+PUBLISH_QUEUE_SIZE = 1000
+MESSAGE_QUEUE_SIZE = 10000
+MISC_INTERVAL = 1               # paho loop_misc cadence (keepalive / retries)
+
+
+class AsyncMqttClient:
+    def __init__(self, client, host, port, keepalive=60, subscriptions=(), on_message=None,
+                 name="mqtt", publish_queue_size=PUBLISH_QUEUE_SIZE, message_queue_size=MESSAGE_QUEUE_SIZE):
+        """
+        client: configured paho Client (callback API v2, TLS already set).
+        subscriptions: [(topic, qos)] (re)subscribed on every connect.
+        on_message: sync handler(topic, payload_bytes), run off the network path.
+        """
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.subscriptions = list(subscriptions)
+        self.handler = on_message
+        self.name = name
+
+        self.publish_queue_size = publish_queue_size
+        self.message_queue_size = message_queue_size
+        self.dropped_publishes = 0
+        self.dropped_messages = 0
+
+        self._loop = None
+        self._tasks = []
+        self._connected = None
+        self._disconnected = None
+        self._publish_queue = None
+        self._message_queue = None
+        self._pending_acks = {}     # mid -> callback
+        self._attempt = 0           # connects since the last accepted CONNACK
+
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.on_publish = self._on_publish
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    # ---------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._connected = asyncio.Event()
+        self._disconnected = asyncio.Event()
+        self._disconnected.set()
+        self._publish_queue = asyncio.Queue(maxsize=self.publish_queue_size)
+        self._message_queue = asyncio.Queue(maxsize=self.message_queue_size)
+
+        self._tasks = [
+            asyncio.create_task(self._connection_task(), name=f"{self.name}-connect"),
+            asyncio.create_task(self._misc_task(), name=f"{self.name}-misc"),
+            asyncio.create_task(self._publish_task(), name=f"{self.name}-publish"),
+            asyncio.create_task(self._dispatch_task(), name=f"{self.name}-dispatch"),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.client.is_connected():
+            self.client.disconnect()
+
+    def is_connected(self):
+        return self.client.is_connected()
+
+    # ---------------------------------------------------
+    # Publishing
+    # ---------------------------------------------------
+    def publish_nowait(self, topic, payload, qos=1, on_ack=None):
+        """
+        Queue a message; when the queue is full the oldest entry is dropped.
+        on_ack() runs on the event loop once the broker has acknowledged it
+        (PUBACK for QoS 1); it never runs for dropped or lost messages.
+        """
+        if self._publish_queue is None:
+            return False
+        if self._publish_queue.full():
+            self._publish_queue.get_nowait()
+            self._drop_publish()
+        self._publish_queue.put_nowait((topic, payload, qos, on_ack, time.perf_counter()))
+        return True
+
+    def _drop_publish(self):
+        self.dropped_publishes += 1
+        MQTT_DROPPED.labels(self.name, "publish").inc()
+
+    async def _publish_task(self):
+        while True:
+            topic, payload, qos, on_ack, queued_at = await self._publish_queue.get()
+            await self._connected.wait()
+            try:
+                result = self.client.publish(topic, payload, qos=qos)
+            except Exception as e:
+                # e.g. a topic with wildcards; one bad message must not stop the task
+                _LOGGER.error("[%s] Publish to %r rejected: %s", self.name, topic, e)
+                self._drop_publish()
+                continue
+            MQTT_PUBLISH_SECONDS.labels(self.name).observe(time.perf_counter() - queued_at)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                _LOGGER.warning("[%s] Publish to %s failed: %s", self.name, topic, mqtt.error_string(result.rc))
+                self._drop_publish()
+                continue
+            MQTT_PUBLISHED.labels(self.name).inc()
+            _LOGGER.info("[%s] Published to %s: %s", self.name, topic, payload)
+            if on_ack is not None:
+                if result.is_published():
+                    on_ack()
+                else:
+                    self._pending_acks[result.mid] = on_ack
+
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        callback = self._pending_acks.pop(mid, None)
+        if callback is not None:
+            self._in_loop(callback)
+
+    # ---------------------------------------------------
+    # Connection management (event driven)
+    # ---------------------------------------------------
+    async def _connection_task(self):
+        while True:
+            await self._disconnected.wait()
+            # the backoff is only reset by an accepted CONNACK (_on_connect), so a
+            # broker that refuses the session or drops it is not retried in a tight loop
+            if self._attempt:
+                await asyncio.sleep(self._backoff_seconds())
+            self._attempt += 1
+            try:
+                _LOGGER.info("[%s] Attempting connect (attempt=%d)", self.name, self._attempt)
+                self._disconnected.clear()
+                # connect() does DNS + TCP + TLS handshake, keep it off the loop
+                await self._loop.run_in_executor(None, self.client.connect, self.host, self.port, self.keepalive)
+            except Exception as e:
+                self._disconnected.set()
+                _LOGGER.warning(
+                    "[%s] Connect failed: %s; retrying in %d s", self.name, e, self._backoff_seconds()
+                )
+
+    def _backoff_seconds(self):
+        exponent = self._attempt - 1
+        return min(1 << exponent if exponent < 6 else MAX_BACKOFF, MAX_BACKOFF)
+
+    async def _misc_task(self):
+        while True:
+            await asyncio.sleep(MISC_INTERVAL)
+            if self.client.socket() is not None:
+                self.client.loop_misc()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code == 0:
+            _LOGGER.info("[%s] Connected (rc=%s)", self.name, reason_code)
+            self._attempt = 0
+            if self.subscriptions:
+                client.subscribe(self.subscriptions)
+                _LOGGER.info("[%s] Subscribed to %s", self.name, ", ".join(t for t, _ in self.subscriptions))
+            self._loop.call_soon_threadsafe(self._connected.set)
+        else:
+            _LOGGER.error("[%s] Connection failed with rc=%s", self.name, reason_code)
+
+    def _on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
+        _LOGGER.warning("[%s] Disconnected (rc=%s)", self.name, reason_code)
+        self._loop.call_soon_threadsafe(self._connected.clear)
+        self._loop.call_soon_threadsafe(self._disconnected.set)
+        # acks are not tracked across reconnects; callers retry on their own timeout
+        self._pending_acks.clear()
+
+    # ---------------------------------------------------
+    # Incoming messages
+    # ---------------------------------------------------
+    def _on_message(self, client, userdata, msg):
+        MQTT_RECEIVED.labels(self.name).inc()
+        if self._message_queue.full():
+            self.dropped_messages += 1
+            MQTT_DROPPED.labels(self.name, "receive").inc()
+            return
+        self._message_queue.put_nowait((msg.topic, msg.payload))
+
+    async def _dispatch_task(self):
+        while True:
+            topic, payload = await self._message_queue.get()
+            if self.handler is None:
+                continue
+            try:
+                self.handler(topic, payload)
+            except Exception as e:
+                _LOGGER.error("[%s] Message handler failed for %s: %s", self.name, topic, e)
+
+    # ---------------------------------------------------
+    # Socket hooks (may fire from the connect executor thread)
+    # ---------------------------------------------------
+    def _in_loop(self, fn, *args):
+        """Run fn now when on the loop thread, otherwise schedule it there."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            fn(*args)
+        else:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    # File descriptors are captured while the socket is still open; paho
+    # closes it right after on_socket_close returns.
+    def _on_socket_open(self, client, userdata, sock):
+        self._in_loop(self._loop.add_reader, sock.fileno(), self._read, client, sock)
+
+    def _read(self, client, sock):
+        client.loop_read()
+        # TLS records already decrypted into the SSL buffer do not make the fd
+        # readable again; drain them like paho's own loop does
+        pending = getattr(sock, "pending", None)
+        while pending is not None and client.socket() is sock and pending():
+            client.loop_read()
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._in_loop(self._loop.remove_reader, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._in_loop(self._loop.add_writer, sock.fileno(), client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._in_loop(self._loop.remove_writer, sock.fileno())
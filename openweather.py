@@ -1,75 +1,275 @@
+import asyncio
+import os
 import requests
+import httpx
 import json
 from datetime import datetime
 import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+import numpy as np
+
+from crop_kc import maize_kc
+from metrics import FAO_COMPUTE_SECONDS, WEATHER_FETCH_ERRORS, WEATHER_FETCH_SECONDS
+from solar import estimate_radiation
+
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "36d15ab85147a133c827677a60d9ce4b")
+HTTP_TIMEOUT = 10             # seconds, total per upstream call
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_MAX_CONNECTIONS = 20
+
+FORECAST_CACHE_TTL = 600      # seconds an aggregated forecast stays fresh
+FORECAST_CACHE_SIZE = 1024    # max (cell lat, cell lon, date) entries kept
+
+# Fields are snapped to a grid cell of this many degrees (0.1° ≈ 11 km) and
+# share that cell's forecast; 0 disables snapping.
+WEATHER_GRID_STEP = float(os.getenv("WEATHER_GRID_STEP", "0.1"))
+WEATHER_FETCH_CONCURRENCY = 8  # upstream calls in flight during a prefetch
+
+# Default site (the original single field)
+DEFAULT_SITE = "default"
+DEFAULT_LAT = 13.936811
+DEFAULT_LON = 7.270029
+DEFAULT_ALTITUDE = 545
+
+Site = namedtuple("Site", ["lat", "lon", "altitude"])
+
+
+def snap_to_grid(lat, lon, step=WEATHER_GRID_STEP):
+    """Centre of the grid cell containing (lat, lon)."""
+    if step <= 0:
+        return round(lat, 6), round(lon, 6)
+    return round(round(lat / step) * step, 6), round(round(lon / step) * step, 6)
+
+
+class ForecastCache:
+    """
+    TTL + LRU cache of aggregated daily forecasts keyed by (cell lat, cell
+    lon, UTC date of the fetch). A value holds every day of the 5-day forecast.
+    """
+
+    def __init__(self, ttl=FORECAST_CACHE_TTL, max_entries=FORECAST_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """
+    Concurrent calls for the same key share one execution: the first caller
+    runs fn, the others block on its result (or exception).
+    """
 
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """(result, shared) where shared is True if another caller did the work."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent awaiters of a key share one task."""
 
-class WeatherETcCalculator:
     def __init__(self):
-        self.api_key = "36d15ab85147a133c827677a60d9ce4b"
-        self.lat = 13.936811
-        self.lon = 7.270029
-        self.altitude = 545
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # a cancelled waiter must not cancel the fetch the others are waiting on
+        return await asyncio.shield(task), shared
+
+
+# Shared by every calculator in the process so the ML and FAO paths
+# reuse one upstream call per grid cell and day.
+forecast_cache = ForecastCache()
+_fetches = SingleFlight()
+_async_fetches = AsyncSingleFlight()
+
+# Keep-alive pools shared by all calculators (sync and async).
+_http_session = requests.Session()
+_async_client = None
+
+
+def get_async_client():
+    """Return the process-wide pooled httpx.AsyncClient, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            ),
+        )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+class WeatherETcCalculator:
+    def __init__(self, cache=None, lat=DEFAULT_LAT, lon=DEFAULT_LON, altitude=DEFAULT_ALTITUDE,
+                 api_key=None, grid_step=WEATHER_GRID_STEP):
+        self.api_key = api_key or OPENWEATHER_API_KEY
+        self.lat = lat
+        self.lon = lon
+        self.altitude = altitude
+        # the forecast is fetched (and cached) for the grid cell; radiation and
+        # FAO-56 still use the field's own latitude and altitude
+        self.cell = snap_to_grid(lat, lon, grid_step)
+        self.cache = cache if cache is not None else forecast_cache
 
     # ---------------------------------------------------
-    # 1. Fetch today's weather data
+    # 1. Fetch the forecast, aggregated per day
     # ---------------------------------------------------
-    def fetch_today_weather(self):
-        url = f"https://api.openweathermap.org/data/2.5/forecast?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units=metric"
-
-        response = requests.get(url)
-        data = response.json()
+    def fetch_forecast_days(self, today=None):
+        """
+        {date: (min_temp, max_temp, humidity, wind, clouds)} for every UTC day
+        of the 5-day forecast of this site's grid cell, from one (cached)
+        upstream call shared by concurrent callers.
+        """
+        start = time.perf_counter()
+        today = today or datetime.utcnow().date()
+        key = (*self.cell, today)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            WEATHER_FETCH_SECONDS.labels("cache").observe(time.perf_counter() - start)
+            return cached
+
+        days, shared = _fetches.do(key, lambda: self._fetch_upstream(key))
+        WEATHER_FETCH_SECONDS.labels("coalesced" if shared else "upstream").observe(time.perf_counter() - start)
+        return days
+
+    def _fetch_upstream(self, key):
+        try:
+            response = _http_session.get(self.forecast_url(), timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT))
+            # 401 / 429 / 5xx bodies must not be aggregated (or cached) as a forecast
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            WEATHER_FETCH_ERRORS.inc()
+            raise
+
+        days = self.aggregate_days(data)
+        self.cache.put(key, days)
+        return days
 
+    def fetch_today_weather(self):
         today = datetime.utcnow().date()
+        return self.pick_day(self.fetch_forecast_days(today), today)
 
-        temps_min, temps_max = [], []
-        humidities, winds, clouds = [], [], []
+    def forecast_url(self):
+        lat, lon = self.cell
+        return f"{OPENWEATHER_BASE_URL}/data/2.5/forecast?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
 
+    @staticmethod
+    def aggregate_days(data):
+        """
+        Collapse the 3-hourly forecast entries into daily values, grouping by
+        UTC date in a single pass. The first and last day may be partial.
+        """
+        groups = {}
         for entry in data["list"]:
-            dt = datetime.utcfromtimestamp(entry["dt"]).date()
-            if dt == today:
-                temps_min.append(entry["main"]["temp_min"])
-                temps_max.append(entry["main"]["temp_max"])
-                humidities.append(entry["main"]["humidity"])
-                winds.append(entry["wind"]["speed"])
-                clouds.append(entry["clouds"]["all"])
-
-        if not temps_min:
-            raise ValueError("No weather data for today.")
+            day = datetime.utcfromtimestamp(entry["dt"]).date()
+            group = groups.get(day)
+            if group is None:
+                group = groups[day] = ([], [], [], [], [])
+            temps_min, temps_max, humidities, winds, clouds = group
+            temps_min.append(entry["main"]["temp_min"])
+            temps_max.append(entry["main"]["temp_max"])
+            humidities.append(entry["main"]["humidity"])
+            winds.append(entry["wind"]["speed"])
+            clouds.append(entry["clouds"]["all"])
 
-        # Aggregate values
-        min_temp = min(temps_min)
-        max_temp = max(temps_max)
-        humidity = sum(humidities) / len(humidities)
-        wind = sum(winds) / len(winds)
-        avg_clouds = sum(clouds) / len(clouds)
+        return {
+            day: (
+                min(temps_min),
+                max(temps_max),
+                sum(humidities) / len(humidities),
+                sum(winds) / len(winds),
+                sum(clouds) / len(clouds),
+            )
+            for day, (temps_min, temps_max, humidities, winds, clouds) in sorted(groups.items())
+        }
 
-        return min_temp, max_temp, humidity, wind, avg_clouds
+    @staticmethod
+    def pick_day(days, day):
+        if day not in days:
+            raise ValueError("No weather data for today.")
+        return days[day]
 
     # ---------------------------------------------------
     # 2. Compute radiation, sun hours
     # ---------------------------------------------------
-    def compute_radiation(self, clouds):
-        # sun hours estimate
-        sun_hours = 12 * (1 - clouds / 100)
-
-        # solar radiation (FAO clear-sky)
-        phi = math.radians(self.lat)
-        day_of_year = datetime.utcnow().timetuple().tm_yday
-
-        dr = 1 + 0.033 * math.cos(2 * math.pi * day_of_year / 365)
-        delta = 0.409 * math.sin(2 * math.pi * day_of_year / 365 - 1.39)
-        ws = math.acos(-math.tan(phi) * math.tan(delta))
-
-        Ra = (24 * 60 / math.pi) * 0.0820 * dr * (
-            ws * math.sin(phi) * math.sin(delta)
-            + math.cos(phi) * math.cos(delta) * math.sin(ws)
-        )
-
-        radiation = (0.25 + 0.50 * (1 - clouds / 100)) * Ra
-
-        return sun_hours, radiation
-
+    def compute_radiation(self, clouds, day_of_year=None):
+        """Sun hours and solar radiation for this site (Ra from the cached per-latitude table, see solar)."""
+        if day_of_year is None:
+            day_of_year = datetime.utcnow().timetuple().tm_yday
+        return estimate_radiation(self.lat, clouds, day_of_year)
 
     def get_weather_data(self):
         min_temp, max_temp, humidity, wind, clouds = self.fetch_today_weather()
@@ -83,6 +283,29 @@ class WeatherETcCalculator:
             "radiation": radiation
         }
 
+    def forecast_weather(self, days):
+        """
+        Model inputs for every forecast day as arrays (same keys as
+        get_weather_data, plus "dates"); radiation uses each day's own
+        day of year.
+        """
+        dates = list(days)
+        min_temp, max_temp, humidity, wind, clouds = (np.array(column, dtype=np.float64) for column in zip(*days.values()))
+        day_of_year = np.array([day.timetuple().tm_yday for day in dates])
+        sun_hours, radiation = self.compute_radiation(clouds, day_of_year)
+        return {
+            "dates": dates,
+            "min_temp": min_temp,
+            "max_temp": max_temp,
+            "humidity": humidity,
+            "wind": wind,
+            "sun_hours": sun_hours,
+            "radiation": radiation
+        }
+
+    def get_forecast_data(self):
+        return self.forecast_weather(self.fetch_forecast_days())
+
     # ---------------------------------------------------
     # 3. FAO-56 Penman–Monteith ETo
     # ---------------------------------------------------
@@ -125,37 +348,26 @@ class WeatherETcCalculator:
         return ETo
 
     # ---------------------------------------------------
-    # 4. Maize Kc from DAS
+    # 4. Maize Kc from DAS (shared crop table, see crop_kc)
     # ---------------------------------------------------
-    @staticmethod
-    def get_maize_kc(das):
-        if das < 0:
-            return 0.3
-
-        if 0 <= das < 25:
-            kc_start, kc_end = 0.30, 0.40
-            d0, d1 = 0, 25
-        elif 25 <= das < 55:
-            kc_start, kc_end = 0.40, 0.80
-            d0, d1 = 25, 55
-        elif 55 <= das < 95:
-            kc_start, kc_end = 1.15, 1.20
-            d0, d1 = 55, 95
-        elif 95 <= das <= 120:
-            kc_start, kc_end = 0.70, 0.35
-            d0, d1 = 95, 120
-        else:
-            return 0.35
-
-        return kc_start + (kc_end - kc_start) * ((das - d0) / (d1 - d0))
+    get_maize_kc = staticmethod(maize_kc)
 
     # ---------------------------------------------------
     # 5. Main function: compute today’s ETc
     # ---------------------------------------------------
-    def calculate_etc(self, das):
-        min_temp, max_temp, humidity, wind, clouds = self.fetch_today_weather()
-        sun_hours, radiation = self.compute_radiation(clouds)
-        eto = self.compute_eto(min_temp, max_temp, humidity, wind, sun_hours, radiation)
+    def calculate_etc(self, das, weather_data=None):
+        if weather_data is None:
+            weather_data = self.get_weather_data()
+
+        min_temp = weather_data["min_temp"]
+        max_temp = weather_data["max_temp"]
+        humidity = weather_data["humidity"]
+        wind = weather_data["wind"]
+        sun_hours = weather_data["sun_hours"]
+        radiation = weather_data["radiation"]
+
+        with FAO_COMPUTE_SECONDS.time():
+            eto = self.compute_eto(min_temp, max_temp, humidity, wind, sun_hours, radiation)
         kc = self.get_maize_kc(das)
         etc = eto * kc
 
@@ -171,3 +383,126 @@ class WeatherETcCalculator:
             "etc": round(etc, 4)
         }
 
+
+class AsyncWeatherETcCalculator(WeatherETcCalculator):
+    """
+    Async variant of WeatherETcCalculator.
+    Fetches through the shared pooled httpx client and the same forecast
+    cache, so it never holds a threadpool worker while waiting on upstream.
+    """
+
+    def __init__(self, cache=None, client=None, **site):
+        super().__init__(cache, **site)
+        self.client = client
+
+    async def fetch_forecast_days(self, today=None):
+        start = time.perf_counter()
+        today = today or datetime.utcnow().date()
+        key = (*self.cell, today)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            WEATHER_FETCH_SECONDS.labels("cache").observe(time.perf_counter() - start)
+            return cached
+
+        days, shared = await _async_fetches.do(key, lambda: self._fetch_upstream(key))
+        WEATHER_FETCH_SECONDS.labels("coalesced" if shared else "upstream").observe(time.perf_counter() - start)
+        return days
+
+    async def _fetch_upstream(self, key):
+        client = self.client or get_async_client()
+        try:
+            response = await client.get(self.forecast_url())
+            # 401 / 429 / 5xx bodies must not be aggregated (or cached) as a forecast
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            WEATHER_FETCH_ERRORS.inc()
+            raise
+
+        days = self.aggregate_days(data)
+        self.cache.put(key, days)
+        return days
+
+    async def fetch_today_weather(self):
+        today = datetime.utcnow().date()
+        return self.pick_day(await self.fetch_forecast_days(today), today)
+
+    async def get_weather_data(self):
+        min_temp, max_temp, humidity, wind, clouds = await self.fetch_today_weather()
+        sun_hours, radiation = self.compute_radiation(clouds)
+        return {
+            "min_temp": min_temp,
+            "max_temp": max_temp,
+            "humidity": humidity,
+            "wind": wind,
+            "sun_hours": sun_hours,
+            "radiation": radiation
+        }
+
+    async def get_forecast_data(self):
+        return self.forecast_weather(await self.fetch_forecast_days())
+
+    async def calculate_etc(self, das, weather_data=None):
+        if weather_data is None:
+            weather_data = await self.get_weather_data()
+        return super().calculate_etc(das, weather_data)
+
+
+class WeatherService:
+    """
+    Per-site async calculators sharing one forecast cache. Sites in the same
+    grid cell share a forecast, so upstream calls scale with distinct cells,
+    not with fields or requests.
+
+    Sites come from add_site or a JSON file {"site_id": {"lat", "lon", "altitude"}}.
+    """
+
+    def __init__(self, cache=None, client=None, grid_step=WEATHER_GRID_STEP, concurrency=WEATHER_FETCH_CONCURRENCY):
+        self.cache = cache if cache is not None else forecast_cache
+        self.client = client
+        self.grid_step = grid_step
+        self.concurrency = concurrency
+        self.sites = {}
+        self.calculators = {}
+
+    def add_site(self, site_id, lat, lon, altitude=DEFAULT_ALTITUDE):
+        self.sites[site_id] = Site(lat, lon, altitude)
+        self.calculators[site_id] = AsyncWeatherETcCalculator(
+            self.cache, self.client, lat=lat, lon=lon, altitude=altitude, grid_step=self.grid_step
+        )
+        return self.calculators[site_id]
+
+    def load_sites(self, path):
+        with open(path) as f:
+            for site_id, site in json.load(f).items():
+                self.add_site(site_id, site["lat"], site["lon"], site.get("altitude", DEFAULT_ALTITUDE))
+
+    def calculator(self, site_id=DEFAULT_SITE):
+        return self.calculators[site_id]
+
+    def cells(self, site_ids=None):
+        """{grid cell: [site_id, ...]}"""
+        cells = {}
+        for site_id in self.calculators if site_ids is None else site_ids:
+            cells.setdefault(self.calculators[site_id].cell, []).append(site_id)
+        return cells
+
+    async def prefetch(self, site_ids=None):
+        """
+        Warm the cache for every distinct cell of site_ids (default: all),
+        at most `concurrency` upstream calls at a time.
+        Returns {cell: exception} for the cells that failed.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(calculator):
+            async with semaphore:
+                await calculator.fetch_forecast_days()
+
+        cells = self.cells(site_ids)
+        results = await asyncio.gather(
+            *(fetch(self.calculators[sites[0]]) for sites in cells.values()),
+            return_exceptions=True,
+        )
+        return {cell: result for cell, result in zip(cells, results) if isinstance(result, Exception)}
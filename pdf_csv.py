@@ -108,6 +108,10 @@
 
 
 import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import fitz
 import pandas as pd
 from dotenv import load_dotenv
@@ -123,6 +127,10 @@ AZURE_DIR = "rake_weighment_documents"
 FORM_RECOGNIZER_ENDPOINT = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
 FORM_RECOGNIZER_KEY = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
 
+MAX_OCR_WORKERS = 4                      # concurrent Azure layout requests
+OCR_CACHE_DIR = ".ocr_cache"             # extracted tables keyed by PDF sha256
+OCR_MANIFEST = "ocr_manifest.json"       # per-file progress, survives crashes
+
 
 # ---------- COUNT PDF PAGES ----------
 def count_pdf_pages(pdf_path):
@@ -163,42 +171,140 @@ def extract_table_azure(pdf_path, client):
     return tables
 
 
-# ---------- PROCESS FOLDER ----------
-def process_folder_azure(input_folder, output_csv):
+# ---------- CONTENT HASH ----------
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    client = DocumentAnalysisClient(
-        endpoint=FORM_RECOGNIZER_ENDPOINT,
-        credential=AzureKeyCredential(FORM_RECOGNIZER_KEY)
-    )
 
-    all_dataframes = []
-    total_pages = 0
+# ---------- RESUMABLE MANIFEST ----------
+class OcrManifest:
+    """
+    {filename: {"sha256", "pages", "rows", "status"}} persisted after every
+    file, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_done(self, filename, sha256):
+        entry = self.entries.get(filename)
+        return bool(entry) and entry["status"] == "done" and entry["sha256"] == sha256
+
+    def record(self, filename, **fields):
+        with self._lock:
+            self.entries[filename] = fields
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+# ---------- CACHED EXTRACTION ----------
+def cache_path_for(cache_dir, sha256):
+    return os.path.join(cache_dir, f"{sha256}.pkl")
+
+
+def extract_pdf_cached(pdf_path, client, cache_dir, sha256=None):
+    """
+    Return (merged_df, sent_to_azure). Tables for a PDF whose content hash is
+    already cached are read from disk instead of being OCR'd again.
+    """
+    sha256 = sha256 or file_sha256(pdf_path)
+    cached = cache_path_for(cache_dir, sha256)
+
+    if os.path.exists(cached):
+        return pd.read_pickle(cached), False
+
+    tables = extract_table_azure(pdf_path, client)
+    pdf_df = pd.concat(tables, ignore_index=True)
 
-    pdf_files = [f for f in os.listdir(input_folder) if f.lower().endswith(".pdf")]
+    tmp_path = cached + ".tmp"
+    pdf_df.to_pickle(tmp_path)
+    os.replace(tmp_path, cached)
+
+    return pdf_df, True
+
+
+# ---------- PROCESS FOLDER ----------
+def process_folder_azure(input_folder, output_csv, client=None,
+                         max_workers=MAX_OCR_WORKERS,
+                         cache_dir=OCR_CACHE_DIR,
+                         manifest_path=OCR_MANIFEST):
+    """
+    OCR every PDF in `input_folder` with a bounded worker pool and write the
+    combined tables to `output_csv`. Only PDFs whose content hash is not in
+    `cache_dir` are sent to Azure; `client` can be any object exposing
+    begin_analyze_document (e.g. a local fake).
+    """
+    if client is None:
+        client = DocumentAnalysisClient(
+            endpoint=FORM_RECOGNIZER_ENDPOINT,
+            credential=AzureKeyCredential(FORM_RECOGNIZER_KEY)
+        )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = OcrManifest(manifest_path)
+
+    pdf_files = sorted(f for f in os.listdir(input_folder) if f.lower().endswith(".pdf"))
     print(f"📁 Found {len(pdf_files)} PDF files")
 
-    for idx, filename in enumerate(pdf_files, 1):
+    def process_one(filename):
         pdf_path = os.path.join(input_folder, filename)
-        print(f"\n🔄 Processing {idx}/{len(pdf_files)} → {filename}")
-
+        sha256 = file_sha256(pdf_path)
         pages = count_pdf_pages(pdf_path)
-        total_pages += pages
+
+        if manifest.is_done(filename, sha256) and os.path.exists(cache_path_for(cache_dir, sha256)):
+            return pd.read_pickle(cache_path_for(cache_dir, sha256)), pages, False
 
         try:
-            tables = extract_table_azure(pdf_path, client)
+            pdf_df, sent = extract_pdf_cached(pdf_path, client, cache_dir, sha256)
+        except Exception:
+            manifest.record(filename, sha256=sha256, pages=pages, rows=0, status="failed")
+            raise
+        manifest.record(filename, sha256=sha256, pages=pages, rows=len(pdf_df), status="done")
+        return pdf_df, pages, sent
+
+    results = {}
+    billed_pages = 0
+    cached_files = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(process_one, filename): filename for filename in pdf_files}
+
+        for idx, future in enumerate(as_completed(futures), 1):
+            filename = futures[future]
+            try:
+                pdf_df, pages, sent = future.result()
+            except Exception as e:
+                print(f"   ❌ [{idx}/{len(pdf_files)}] {filename} failed: {e}")
+                continue
+
+            if sent:
+                billed_pages += pages
+            else:
+                cached_files += 1
+
+            results[filename] = pdf_df
+            origin = "OCR" if sent else "cache"
+            print(f"   ✅ [{idx}/{len(pdf_files)}] {filename}: {len(pdf_df)} rows ({origin})")
 
-            # Merge tables in this PDF
-            pdf_df = pd.concat(tables, ignore_index=True)
+    # ---------- COMBINE ALL ----------
+    all_dataframes = []
+    for filename in pdf_files:
+        if filename in results:
+            pdf_df = results[filename].copy()
             pdf_df["source_file"] = filename
-
             all_dataframes.append(pdf_df)
 
-            print(f"   ✅ Extracted {len(pdf_df)} rows")
-
-        except Exception as e:
-            print(f"   ❌ Failed: {e}")
-
-    # ---------- COMBINE ALL ----------
     if all_dataframes:
         final_df = pd.concat(all_dataframes, ignore_index=True)
         final_df.to_csv(output_csv, index=False)
@@ -209,12 +315,13 @@ def process_folder_azure(input_folder, output_csv):
 
     # ---------- COST ----------
     cost_per_page_usd = 0.01   # Azure Layout cost
-    total_cost_usd = total_pages * cost_per_page_usd
+    total_cost_usd = billed_pages * cost_per_page_usd
     total_cost_inr = total_cost_usd * 86
 
     print("\n--------------------------------------------------")
-    print(f"📄 Total PDFs processed : {len(pdf_files)}")
-    print(f"📄 Total pages scanned  : {total_pages}")
+    print(f"📄 Total PDFs processed : {len(results)}/{len(pdf_files)}")
+    print(f"📄 Served from cache    : {cached_files}")
+    print(f"📄 Pages sent to Azure  : {billed_pages}")
     print(f"💰 Azure OCR Cost (USD): ${total_cost_usd:.4f}")
     print(f"💰 Azure OCR Cost (INR): ₹{total_cost_inr:.2f}")
     print("--------------------------------------------------")
@@ -222,7 +329,8 @@ def process_folder_azure(input_folder, output_csv):
 
 # ---------- RUN SCRIPT ----------
 
-input_folder = r"DATA"       # folder with 400+ PDFs
-output_csv = r"final_eto_output_azure.csv"
+if __name__ == "__main__":
+    input_folder = r"DATA"       # folder with 400+ PDFs
+    output_csv = r"final_eto_output_azure.csv"
 
-process_folder_azure(input_folder, output_csv)
+    process_folder_azure(input_folder, output_csv)
@@ -0,0 +1,218 @@
+"""
+In-process time-series store for MQTT sensor telemetry.
+
+Each device gets a ring buffer of compact NumPy columns (float64 timestamps,
+float32 water flow / soil moisture). Buffers start small and double as
+samples arrive, up to the capacity needed for the retention window at the
+highest expected reporting rate, so a node reporting once a minute holds
+about a day of samples, not 86 400 slots. Ingestion from the paho callback
+thread is amortized O(1); windowed aggregates (delivered volume, mean soil
+moisture) are vectorized over the retained window. Samples can optionally be
+spilled to an append-only per-device segment file for history beyond RAM.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+DEFAULT_DEVICE = "default"
+DEFAULT_RETENTION = 86_400         # seconds of history visible to queries
+MAX_SAMPLE_RATE_HZ = 1.0           # fastest expected reporting rate; sizes the buffer cap
+INITIAL_CAPACITY = 256             # samples allocated for a new device
+MAX_DEVICES = 10_000               # series kept at most (each may hold a segment fd)
+
+# On-disk segment record: timestamp, water_flow, soil_moisture
+SEGMENT_DTYPE = np.dtype([("ts", "<f8"), ("water_flow", "<f4"), ("soil_moisture", "<f4")])
+
+
+def start_of_today():
+    """Epoch seconds of local midnight."""
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def read_segment(path):
+    """Load a spilled segment file as a structured array (SEGMENT_DTYPE)."""
+    return np.fromfile(path, dtype=SEGMENT_DTYPE)
+
+
+def segment_filename(device_id):
+    """
+    File name of a device's segment. Device ids come from the network, so
+    anything outside [A-Za-z0-9_.~-] is percent-encoded: no separators, and
+    ".." becomes "...seg", a plain name inside the segment directory.
+    """
+    return quote(device_id, safe="") + ".seg"
+
+
+def capacity_for(retention, rate_hz=MAX_SAMPLE_RATE_HZ):
+    """Samples needed to keep `retention` seconds at `rate_hz`."""
+    return max(int(retention * rate_hz), 1)
+
+
+class DeviceSeries:
+    """
+    Ring buffer for one device. The arrays grow (doubling) until `capacity`;
+    after that appends overwrite the oldest sample.
+    """
+
+    def __init__(self, capacity=None, segment_path=None, initial_capacity=INITIAL_CAPACITY):
+        self.capacity = capacity_for(DEFAULT_RETENTION) if capacity is None else capacity
+        size = min(initial_capacity, self.capacity)
+        self.ts = np.zeros(size, dtype=np.float64)
+        self.water_flow = np.zeros(size, dtype=np.float32)
+        self.soil_moisture = np.zeros(size, dtype=np.float32)
+        self._head = 0          # next write position
+        self._count = 0
+        self._lock = threading.Lock()
+        self._segment = open(segment_path, "ab") if segment_path else None
+        self._record = np.zeros(1, dtype=SEGMENT_DTYPE)
+
+    def append(self, ts, water_flow, soil_moisture):
+        with self._lock:
+            if self._count == len(self.ts) < self.capacity:
+                self._grow()
+            i = self._head
+            self.ts[i] = ts
+            self.water_flow[i] = water_flow
+            self.soil_moisture[i] = soil_moisture
+            self._head = (i + 1) % len(self.ts)
+            self._count = min(self._count + 1, len(self.ts))
+
+            if self._segment is not None:
+                self._record[0] = (ts, water_flow, soil_moisture)
+                self._segment.write(self._record.tobytes())
+
+    def _grow(self):
+        # only called while full and not yet overwritten, so samples are in
+        # order at [0, count) and the head has wrapped to 0
+        size = min(len(self.ts) * 2, self.capacity)
+        for name in ("ts", "water_flow", "soil_moisture"):
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+        self._head = self._count
+
+    def latest(self):
+        with self._lock:
+            if not self._count:
+                return None
+            i = (self._head - 1) % len(self.ts)
+            return float(self.ts[i]), float(self.water_flow[i]), float(self.soil_moisture[i])
+
+    def window(self, since=None):
+        """Chronological copies of (ts, water_flow, soil_moisture) with ts >= since."""
+        with self._lock:
+            if self._count < len(self.ts):
+                order = slice(0, self._count)
+                ts, wf, sm = self.ts[order].copy(), self.water_flow[order].copy(), self.soil_moisture[order].copy()
+            else:
+                h = self._head
+                ts = np.concatenate((self.ts[h:], self.ts[:h]))
+                wf = np.concatenate((self.water_flow[h:], self.water_flow[:h]))
+                sm = np.concatenate((self.soil_moisture[h:], self.soil_moisture[:h]))
+
+        if since is not None:
+            start = np.searchsorted(ts, since, side="left")
+            ts, wf, sm = ts[start:], wf[start:], sm[start:]
+        return ts, wf, sm
+
+    def flush(self):
+        if self._segment is not None:
+            with self._lock:
+                self._segment.flush()
+
+    def close(self):
+        if self._segment is not None:
+            with self._lock:
+                self._segment.close()
+                self._segment = None
+
+
+class SensorStore:
+    """Telemetry ring buffers keyed by device id."""
+
+    def __init__(self, capacity=None, retention=DEFAULT_RETENTION, segment_dir=None, rate_hz=MAX_SAMPLE_RATE_HZ,
+                 max_devices=MAX_DEVICES):
+        """
+        capacity: samples kept per device at most (default: retention x rate_hz).
+        max_devices: series kept at most; samples from further device ids are refused.
+        """
+        self.capacity = capacity_for(retention, rate_hz) if capacity is None else capacity
+        self.max_devices = max_devices
+        self.retention = retention
+        self.segment_dir = segment_dir
+        self._series = {}
+        self._lock = threading.Lock()
+
+        if segment_dir:
+            os.makedirs(segment_dir, exist_ok=True)
+
+    def series(self, device_id):
+        series = self._series.get(device_id)
+        if series is None:
+            with self._lock:
+                series = self._series.get(device_id)
+                if series is None:
+                    if len(self._series) >= self.max_devices:
+                        raise ValueError(f"Sensor store is full ({self.max_devices} devices)")
+                    segment_path = None
+                    if self.segment_dir:
+                        segment_path = os.path.join(self.segment_dir, segment_filename(device_id))
+                    series = DeviceSeries(self.capacity, segment_path)
+                    self._series[device_id] = series
+        return series
+
+    def devices(self):
+        return list(self._series)
+
+    def ingest(self, device_id, water_flow, soil_moisture, ts=None):
+        self.series(device_id).append(time.time() if ts is None else ts, water_flow, soil_moisture)
+
+    def latest(self, device_id=DEFAULT_DEVICE):
+        series = self._series.get(device_id)
+        return series.latest() if series is not None else None
+
+    def _since(self, since):
+        floor = time.time() - self.retention
+        return floor if since is None else max(since, floor)
+
+    def aggregate(self, device_id=DEFAULT_DEVICE, since=None):
+        """
+        Window statistics for one device since `since` (default: retention window).
+        water_flow is the sensor's cumulative counter, so delivered volume is the
+        sum of its positive increments; a drop means the node rebooted and the
+        counter restarted from zero.
+        """
+        series = self._series.get(device_id)
+        if series is None:
+            return {"samples": 0, "delivered_volume": 0.0, "mean_soil_moisture": None, "last_ts": None}
+
+        ts, wf, sm = series.window(self._since(since))
+        if not len(ts):
+            return {"samples": 0, "delivered_volume": 0.0, "mean_soil_moisture": None, "last_ts": None}
+
+        steps = np.diff(wf.astype(np.float64))
+        delivered = float(np.where(steps >= 0, steps, wf[1:]).sum())
+
+        return {
+            "samples": int(len(ts)),
+            "delivered_volume": delivered,
+            "mean_soil_moisture": float(sm.mean()),
+            "last_ts": float(ts[-1]),
+        }
+
+    def delivered_today(self, device_id=DEFAULT_DEVICE):
+        return self.aggregate(device_id, start_of_today())["delivered_volume"]
+
+    def flush(self):
+        for series in list(self._series.values()):
+            series.flush()
+
+    def close(self):
+        for series in list(self._series.values()):
+            series.close()
@@ -0,0 +1,444 @@
+"""
+Memory-mapped telemetry / decision table shared by uvicorn workers.
+
+With `uvicorn --workers N` only one process may hold the MQTT subscription
+(SENSOR_CLIENT_ID is fixed, so a second connection kicks the first off). The
+worker that wins the ingest lock runs the MQTT clients and the control loop
+and writes every device's latest sample, today's aggregate and latest decision
+into a file-backed table (/dev/shm by default); the other workers answer HTTP
+requests from the same table without touching the broker.
+
+Layout (one file, mapped by every worker):
+
+    header      counters and flags (device count, registration generation, ...)
+    blobs       a few JSON documents (control state, motors, sites)
+    devices     fixed-size rows, one per device id, never moved once allocated
+
+Writers (the ingest worker for telemetry / decisions, any worker for a
+registration) serialize on a lock file; every row and blob carries a sequence
+counter that is odd while it is being written. Readers take no lock: they copy
+the row and retry if the counter was odd or changed meanwhile (seqlock). This
+relies on stores becoming visible in program order, as on x86-64.
+"""
+
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from sensor_store import start_of_today
+
+MAGIC = b"IRRSTATE"
+VERSION = 1
+DEFAULT_CAPACITY = 4096             # device rows
+DECISION_BYTES = 1024               # JSON of a device's latest decision
+DEVICE_ID_BYTES = 64                # UTF-8 lengths of the fixed-width name columns
+SITE_BYTES = 64
+CROP_BYTES = 32
+BLOB_NAMES = ("control", "motors", "sites")
+BLOB_BYTES = 1 << 20                # per JSON document
+READ_RETRIES = 1000
+# Device ids become MQTT topic levels (irregation/<id>/motor) and segment file
+# names, so names are limited to characters that are neither MQTT wildcards /
+# separators nor path components: letters, digits and _ : @ - with single
+# dots between them (no "." or ".."). Also used as the FastAPI path pattern.
+NAME_PATTERN = r"^(\.?[A-Za-z0-9_:@-])+\.?$"
+_NAME_RE = re.compile(NAME_PATTERN)
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u8"),
+    ("capacity", "<u8"),
+    ("epoch", "<f8"),               # set when the ingest worker (re)initializes the file
+    ("count", "<u8"),               # allocated device rows
+    ("registrations", "<u8"),       # bumped on every device / site registration
+    ("evaluate_requests", "<u8"),   # bumped by workers asking for a re-evaluation
+    ("evaluations", "<u8"),         # evaluate_requests served by the ingest worker
+    ("heartbeat", "<f8"),           # last time the ingest worker published its status
+    ("sensor_connected", "<u8"),
+    ("motor_connected", "<u8"),
+])
+BLOB_HEADER_DTYPE = np.dtype([("seq", "<u8"), ("length", "<u8")])
+DEVICE_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("device_id", f"S{DEVICE_ID_BYTES}"),
+    # registration (sowing date ordinal, 0 = not registered)
+    ("sowing", "<i8"),
+    ("crop", f"S{CROP_BYTES}"),
+    ("site", f"S{SITE_BYTES}"),
+    # latest sample (NaN timestamp = none yet)
+    ("latest_ts", "<f8"),
+    ("water_flow", "<f8"),
+    ("soil_moisture", "<f8"),
+    # today's aggregate, see SensorStore.aggregate
+    ("day_start", "<f8"),
+    ("samples", "<i8"),
+    ("delivered_volume", "<f8"),
+    ("mean_soil_moisture", "<f8"),
+    ("last_ts", "<f8"),
+    # latest decision
+    ("decided_at", "<f8"),
+    ("decision", f"S{DECISION_BYTES}"),
+])
+
+PAGE = 4096
+_BLOBS_OFFSET = PAGE
+_BLOB_DATA_OFFSET = 2 * PAGE
+_DEVICES_OFFSET = _BLOB_DATA_OFFSET + len(BLOB_NAMES) * BLOB_BYTES
+
+
+def default_path():
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "irrigation-state")
+
+
+def file_size(capacity=DEFAULT_CAPACITY):
+    return _DEVICES_OFFSET + capacity * DEVICE_DTYPE.itemsize
+
+
+def acquire_ingest_lock(path):
+    """
+    Non-blocking election of the ingest worker: returns an open lock file
+    (keep it open for the process lifetime) or None if another process has it.
+    The lock is released by the OS when the holder exits.
+    """
+    f = open(path + ".ingest", "a")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def check_name(kind, value, limit):
+    """
+    Encoded name for a fixed-width column. Names outside NAME_PATTERN are
+    rejected, and so are longer names rather than truncated: a truncated id
+    would no longer match its row.
+    """
+    if not _NAME_RE.fullmatch(value):
+        raise ValueError(f"{kind} {value[:16]!r} may only contain letters, digits, _ : @ - and single dots")
+    encoded = value.encode("utf-8")
+    if len(encoded) > limit:
+        raise ValueError(f"{kind} {value[:16]!r}... is longer than {limit} bytes (UTF-8)")
+    return encoded
+
+
+def check_registration(device_id, crop, site):
+    check_name("Device id", device_id, DEVICE_ID_BYTES)
+    check_name("Crop", crop, CROP_BYTES)
+    check_name("Site", site, SITE_BYTES)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+class SharedState:
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, create=False):
+        self.path = path
+        self._write_lock_file = open(path + ".lock", "a")
+        self._thread_lock = threading.Lock()
+        self._slots = {}
+        self._slots_epoch = None
+
+        if create:
+            self._create(capacity)
+        self._map()
+
+    # ---------------------------------------------------
+    # File
+    # ---------------------------------------------------
+    def _create(self, capacity):
+        """
+        (Re)initialize the file. A file of the right size is zeroed in place,
+        so workers that already mapped it keep a valid mapping; otherwise it is
+        replaced (restart the other workers after changing the capacity).
+        """
+        size = file_size(capacity)
+        with self._locked():
+            if not os.path.exists(self.path) or os.path.getsize(self.path) != size:
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.truncate(size)
+                os.replace(tmp, self.path)
+            mm = np.memmap(self.path, dtype=np.uint8, mode="r+")
+            mm[PAGE:] = 0
+            header = np.ndarray((1,), HEADER_DTYPE, buffer=mm, offset=0)
+            header[0] = (MAGIC, VERSION, capacity, time.time(), 0, 0, 0, 0, 0.0, 0, 0)
+            mm.flush()
+            del header, mm
+
+    def _map(self):
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode="r+")
+        self.header = np.ndarray((1,), HEADER_DTYPE, buffer=self._mm, offset=0)
+        if self.header["magic"][0] != MAGIC or self.header["version"][0] != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} shared state file")
+        self.capacity = int(self.header["capacity"][0])
+        self._blob_headers = np.ndarray((len(BLOB_NAMES),), BLOB_HEADER_DTYPE, buffer=self._mm, offset=_BLOBS_OFFSET)
+        self.devices = np.ndarray((self.capacity,), DEVICE_DTYPE, buffer=self._mm, offset=_DEVICES_OFFSET)
+        self._device_seq = self.devices["seq"]
+        self._count = self.header["count"]
+        self._epoch = self.header["epoch"]
+
+    @classmethod
+    def open(cls, path):
+        """Map an existing file; None if the ingest worker has not created it yet."""
+        try:
+            return cls(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            fcntl.flock(self._write_lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._write_lock_file.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        """Close the lock fd and drop this instance's views of the mapping (rows from read() are copies)."""
+        self._write_lock_file.close()
+        self.header = self.devices = self._blob_headers = None
+        self._device_seq = self._count = self._epoch = None
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------------------------------------------------
+    # Header
+    # ---------------------------------------------------
+    def get(self, field):
+        value = self.header[field][0]
+        return float(value) if value.dtype.kind == "f" else int(value)
+
+    def bump(self, field):
+        with self._locked():
+            self.header[field] += 1
+            return int(self.header[field][0])
+
+    def set_fields(self, **fields):
+        with self._locked():
+            for field, value in fields.items():
+                self.header[field] = value
+
+    # ---------------------------------------------------
+    # Device rows
+    # ---------------------------------------------------
+    def slot(self, device_id, allocate=False):
+        """Row index of a device (allocated under the write lock when asked); None if absent."""
+        epoch = float(self._epoch[0])
+        count = int(self._count[0])
+        if epoch != self._slots_epoch or len(self._slots) != count:
+            self._slots = {_text(name): i for i, name in enumerate(self.devices["device_id"][:count])}
+            self._slots_epoch = epoch
+
+        slot = self._slots.get(device_id)
+        if slot is not None or not allocate:
+            return slot
+        encoded = check_name("Device id", device_id, DEVICE_ID_BYTES)
+
+        with self._locked():
+            count = self.get("count")
+            names = [_text(name) for name in self.devices["device_id"][:count]]
+            if device_id in names:
+                slot = names.index(device_id)
+            else:
+                if count >= self.capacity:
+                    raise ValueError(f"Shared state is full ({self.capacity} devices)")
+                slot = count
+                row = np.zeros(1, dtype=DEVICE_DTYPE)[0]
+                row["device_id"] = encoded
+                for field in ("latest_ts", "water_flow", "soil_moisture", "mean_soil_moisture", "last_ts", "decided_at"):
+                    row[field] = np.nan
+                self.devices[slot] = row
+                self.header["count"] = count + 1
+        self._slots[device_id] = slot
+        return slot
+
+    def device_ids(self):
+        return [_text(name) for name in self.devices["device_id"][:self.get("count")]]
+
+    def write(self, device_id, **fields):
+        slot = self.slot(device_id, allocate=True)
+        seq = self._device_seq
+        with self._locked():
+            # fields are set on a private copy, so the row is odd only for one record copy
+            row = self.devices[slot].copy()
+            for field, value in fields.items():
+                row[field] = value
+            row["seq"] = seq[slot] + 1
+            seq[slot] += 1                  # odd: write in progress
+            self.devices[slot] = row
+            seq[slot] += 1
+
+    def read(self, device_id):
+        """Consistent copy of a device row (numpy record), or None."""
+        slot = self.slot(device_id)
+        if slot is None:
+            return None
+        seq = self._device_seq
+        for attempt in range(READ_RETRIES):
+            before = int(seq[slot])
+            if not before & 1:
+                row = self.devices[slot].copy()
+                if int(seq[slot]) == before:
+                    return row
+            if attempt % 16 == 15:
+                time.sleep(0)               # let the writer finish
+        raise TimeoutError(f"Shared row for {device_id} kept changing")
+
+    def read_all(self):
+        """Consistent copies of every allocated row."""
+        rows = []
+        for device_id in self.device_ids():
+            row = self.read(device_id)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    # ---------------------------------------------------
+    # Writers used by the ingest worker / registrations
+    # ---------------------------------------------------
+    def update_sensor(self, device_id, latest, today, day_start):
+        ts, water_flow, soil_moisture = latest
+        self.write(
+            device_id,
+            latest_ts=ts, water_flow=water_flow, soil_moisture=soil_moisture,
+            day_start=day_start,
+            samples=today["samples"],
+            delivered_volume=today["delivered_volume"],
+            mean_soil_moisture=np.nan if today["mean_soil_moisture"] is None else today["mean_soil_moisture"],
+            last_ts=np.nan if today["last_ts"] is None else today["last_ts"],
+        )
+
+    def update_decision(self, device_id, decision):
+        encoded = _encode(decision)
+        if len(encoded) > DECISION_BYTES:
+            raise ValueError(f"Decision for {device_id} is larger than {DECISION_BYTES} bytes")
+        self.write(device_id, decided_at=time.time(), decision=encoded)
+
+    def register(self, device_id, sowing_date, crop, site):
+        check_registration(device_id, crop, site)
+        self.write(
+            device_id, sowing=sowing_date.toordinal(),
+            crop=check_name("Crop", crop, CROP_BYTES), site=check_name("Site", site, SITE_BYTES),
+        )
+        self.bump("registrations")
+
+    # ---------------------------------------------------
+    # JSON documents
+    # ---------------------------------------------------
+    def put_blob(self, name, value):
+        with self._locked():
+            self._put_blob(name, value)
+
+    def update_blob(self, name, fn, default=None):
+        """Atomic read-modify-write of a document across workers: stores and returns fn(current)."""
+        with self._locked():
+            value = fn(self.get_blob(name, default))
+            self._put_blob(name, value)
+            return value
+
+    def _put_blob(self, name, value):
+        i = BLOB_NAMES.index(name)
+        data = np.frombuffer(_encode(value), dtype=np.uint8)
+        if len(data) > BLOB_BYTES:
+            raise ValueError(f"{name} document is larger than {BLOB_BYTES} bytes")
+        offset = _BLOB_DATA_OFFSET + i * BLOB_BYTES
+        headers = self._blob_headers
+        headers["seq"][i] += 1
+        self._mm[offset:offset + len(data)] = data
+        headers["length"][i] = len(data)
+        headers["seq"][i] += 1
+
+    def get_blob(self, name, default=None):
+        i = BLOB_NAMES.index(name)
+        offset = _BLOB_DATA_OFFSET + i * BLOB_BYTES
+        headers = self._blob_headers
+        for attempt in range(READ_RETRIES):
+            before = int(headers["seq"][i])
+            if not before & 1:
+                length = int(headers["length"][i])
+                data = self._mm[offset:offset + length].tobytes()
+                if int(headers["seq"][i]) == before:
+                    return json.loads(data) if length else default
+            if attempt % 16 == 15:
+                time.sleep(0)
+        raise TimeoutError(f"Shared document {name} kept changing")
+
+
+# ---------------------------------------------------
+# Reader-side views
+# ---------------------------------------------------
+def registration(row):
+    """(sowing date ordinal, crop, site) of a row, or None if not registered."""
+    if row["sowing"] <= 0:
+        return None
+    return int(row["sowing"]), _text(row["crop"]), _text(row["site"])
+
+
+def decision(row):
+    return json.loads(row["decision"]) if row["decision"] else None
+
+
+class SharedSensorView:
+    """
+    Read-only stand-in for SensorStore in HTTP workers. Only today's window
+    is published, so aggregate() ignores `since` and returns the aggregate
+    since local midnight computed by the ingest worker.
+    """
+
+    EMPTY = {"samples": 0, "delivered_volume": 0.0, "mean_soil_moisture": None, "last_ts": None}
+
+    def __init__(self, state):
+        self.state = state
+
+    def devices(self):
+        return [
+            _text(row["device_id"]) for row in self.state.read_all() if not np.isnan(row["latest_ts"])
+        ]
+
+    def latest(self, device_id):
+        row = self.state.read(device_id)
+        if row is None or np.isnan(row["latest_ts"]):
+            return None
+        return float(row["latest_ts"]), float(row["water_flow"]), float(row["soil_moisture"])
+
+    def aggregate(self, device_id, since=None):
+        row = self.state.read(device_id)
+        # a window from a previous day is stale until the next sample arrives
+        if row is None or not row["samples"] or row["day_start"] != start_of_today():
+            return dict(self.EMPTY)
+        return {
+            "samples": int(row["samples"]),
+            "delivered_volume": float(row["delivered_volume"]),
+            "mean_soil_moisture": float(row["mean_soil_moisture"]),
+            "last_ts": float(row["last_ts"]),
+        }
+
+    def delivered_today(self, device_id):
+        return self.aggregate(device_id)["delivered_volume"]
@@ -0,0 +1,156 @@
+"""
+Solar geometry lookup tables (FAO-56 eq. 21-25, 34).
+
+Extraterrestrial radiation Ra and daylight hours N depend only on latitude
+and day of year, so they are computed once per latitude for days 1..366 in
+one vectorized pass and cached. Radiation for any number of days (or sites)
+is then array indexing, with no trig per request.
+
+    Ra, daylight = site_tables(13.936811)
+    Ra[day_of_year - 1]
+"""
+
+import threading
+
+import numpy as np
+
+DAYS = np.arange(1, 367, dtype=np.float64)     # day of year 1..366
+SOLAR_CONSTANT = 0.0820                         # MJ m-2 min-1
+MAX_SITES = 4096                                # latitudes kept (~12 KB each)
+
+
+def solar_geometry(lat, day_of_year):
+    """
+    (Ra MJ/m²/day, daylight hours) for broadcastable arrays of latitude
+    (degrees) and day of year. The sunset hour angle is clipped for polar
+    day / night.
+    """
+    phi = np.radians(np.asarray(lat, dtype=np.float64))
+    day_of_year = np.asarray(day_of_year, dtype=np.float64)
+
+    dr = 1 + 0.033 * np.cos(2 * np.pi * day_of_year / 365)
+    delta = 0.409 * np.sin(2 * np.pi * day_of_year / 365 - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(delta), -1.0, 1.0))
+
+    Ra = (24 * 60 / np.pi) * SOLAR_CONSTANT * dr * (
+        ws * np.sin(phi) * np.sin(delta)
+        + np.cos(phi) * np.cos(delta) * np.sin(ws)
+    )
+    daylight = 24 / np.pi * ws
+
+    return Ra, daylight
+
+
+class RadiationTables:
+    """
+    366-entry Ra and daylight tables, one row per latitude, in two growing
+    (sites x 366) matrices. New latitudes are computed together in one
+    vectorized pass; lookups for any mix of sites and days are a single
+    fancy-index. Beyond max_sites, uncached latitudes are computed directly.
+    """
+
+    def __init__(self, max_sites=MAX_SITES):
+        self.max_sites = max_sites
+        self._rows = {}
+        self._Ra = np.empty((0, len(DAYS)))
+        self._daylight = np.empty((0, len(DAYS)))
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows(self, lats):
+        """Row index per latitude, building missing tables; -1 where the cache is full."""
+        lats = [float(lat) for lat in lats]
+        missing = [lat for lat in dict.fromkeys(lats) if lat not in self._rows]
+        if missing:
+            with self._lock:
+                missing = [lat for lat in missing if lat not in self._rows][:max(self.max_sites - len(self._rows), 0)]
+                if missing:
+                    Ra, daylight = solar_geometry(np.array(missing)[:, None], DAYS[None, :])
+                    first = len(self._rows)
+                    # replaced, not resized in place, so readers keep a consistent snapshot
+                    self._Ra = np.vstack((self._Ra, Ra))
+                    self._daylight = np.vstack((self._daylight, daylight))
+                    self._rows.update((lat, first + i) for i, lat in enumerate(missing))
+        return np.array([self._rows.get(lat, -1) for lat in lats], dtype=np.int64)
+
+    def site(self, lat):
+        """(Ra, daylight) tables for one latitude, indexed by day_of_year - 1. Read-only views."""
+        row = self.rows([lat])[0]
+        if row < 0:
+            Ra, daylight = solar_geometry(float(lat), DAYS)
+        else:
+            Ra, daylight = self._Ra[row], self._daylight[row]
+        Ra, daylight = Ra.view(), daylight.view()
+        Ra.flags.writeable = False
+        daylight.flags.writeable = False
+        return Ra, daylight
+
+    def lookup(self, lat, day_of_year):
+        """(Ra, daylight) for broadcastable lat and day_of_year arrays."""
+        if np.ndim(lat) == 0:
+            row = self._rows.get(float(lat))
+            if row is None:
+                row = self.rows([lat])[0]
+                if row < 0:
+                    return solar_geometry(lat, _day_index(day_of_year) + 1)
+            index = _day_index(day_of_year)
+            return self._Ra[row, index], self._daylight[row, index]
+
+        lat, day_of_year = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(day_of_year))
+        index = _day_index(day_of_year)
+
+        sites, inverse = np.unique(lat, return_inverse=True)
+        rows = self.rows(sites)[inverse].reshape(lat.shape)
+        Ra_matrix, daylight_matrix = self._Ra, self._daylight
+        Ra = Ra_matrix[rows, index]
+        daylight = daylight_matrix[rows, index]
+
+        uncached = rows < 0
+        if uncached.any():
+            Ra[uncached], daylight[uncached] = solar_geometry(lat[uncached], day_of_year[uncached])
+        return Ra, daylight
+
+
+def _day_index(day_of_year):
+    if isinstance(day_of_year, (int, np.integer)):
+        if not 1 <= day_of_year <= 366:
+            raise ValueError("Day of year must be between 1 and 366.")
+        return int(day_of_year) - 1
+    day_of_year = np.asarray(day_of_year, dtype=np.int64)
+    if np.any((day_of_year < 1) | (day_of_year > 366)):
+        raise ValueError("Day of year must be between 1 and 366.")
+    return day_of_year - 1
+
+
+# Shared by every calculator in the process
+radiation_tables = RadiationTables()
+
+
+def site_tables(lat):
+    return radiation_tables.site(lat)
+
+
+def extraterrestrial_radiation(lat, day_of_year):
+    """(Ra, daylight hours) by table lookup; scalars in, floats out."""
+    Ra, daylight = radiation_tables.lookup(lat, day_of_year)
+    if np.ndim(Ra) == 0:
+        return float(Ra), float(daylight)
+    return Ra, daylight
+
+
+def estimate_radiation(lat, clouds, day_of_year):
+    """
+    (sun_hours, radiation) from cloud cover (%) as used by the service:
+    sun hours scale a 12 h day, radiation is Angstrom-scaled Ra.
+    """
+    Ra, _ = extraterrestrial_radiation(lat, day_of_year)
+    if isinstance(Ra, float) and np.ndim(clouds) == 0:
+        clear = 1 - float(clouds) / 100
+    else:
+        clear = 1 - np.asarray(clouds, dtype=np.float64) / 100
+
+    sun_hours = 12 * clear
+    radiation = (0.25 + 0.50 * clear) * Ra
+    return sun_hours, radiation
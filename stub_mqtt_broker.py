@@ -0,0 +1,138 @@
+"""
+Minimal local MQTT 3.1.1 broker for benchmarks and offline runs.
+
+Plain TCP, no auth, no retained messages or sessions: CONNECT, SUBSCRIBE
+(with + / # wildcards), PUBLISH at QoS 0/1 (PUBACK to the sender, delivered
+to subscribers at QoS 0), PINGREQ and DISCONNECT. Enough for the sensor and
+motor clients to run against localhost:
+
+    python stub_mqtt_broker.py --port 1883
+"""
+
+import argparse
+import asyncio
+import logging
+
+import paho.mqtt.client as mqtt
+
+_LOGGER = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 0x10, 0x20, 0x30, 0x40
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 0x80, 0x90, 0xC0, 0xD0, 0xE0
+
+
+def encode_length(length):
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def packet(header, body=b""):
+    return bytes([header]) + encode_length(len(body)) + body
+
+
+class StubBroker:
+    def __init__(self):
+        self.subscriptions = {}         # writer -> [topic filter]
+        self.received = 0
+        self.delivered = 0
+        self._server = None
+        self._handlers = set()
+
+    async def start(self, host="127.0.0.1", port=1883):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self.subscriptions):
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def _read_packet(self, reader):
+        header = (await reader.readexactly(1))[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header, await reader.readexactly(length)
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        self.subscriptions[writer] = []
+        try:
+            while True:
+                header, body = await self._read_packet(reader)
+                kind = header & 0xF0
+
+                if kind == CONNECT:
+                    writer.write(packet(CONNACK, b"\x00\x00"))
+                elif kind == PUBLISH:
+                    self._publish(header, body, writer)
+                elif kind == SUBSCRIBE:
+                    self._subscribe(body, writer)
+                elif kind == PINGREQ:
+                    writer.write(packet(PINGRESP))
+                elif kind == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscriptions.pop(writer, None)
+            self._handlers.discard(task)
+            writer.close()
+
+    def _publish(self, header, body, writer):
+        qos = (header >> 1) & 0x03
+        topic_length = int.from_bytes(body[:2], "big")
+        topic = body[2:2 + topic_length].decode("utf-8")
+        offset = 2 + topic_length
+        if qos:
+            writer.write(packet(PUBACK, body[offset:offset + 2]))
+            offset += 2
+        self.received += 1
+
+        # forward at QoS 0 (no retain / dup flags)
+        forward = packet(PUBLISH, body[:2 + topic_length] + body[offset:])
+        for subscriber, filters in list(self.subscriptions.items()):
+            if any(mqtt.topic_matches_sub(f, topic) for f in filters):
+                subscriber.write(forward)
+                self.delivered += 1
+
+    def _subscribe(self, body, writer):
+        packet_id, offset, granted = body[:2], 2, bytearray()
+        while offset < len(body):
+            length = int.from_bytes(body[offset:offset + 2], "big")
+            self.subscriptions[writer].append(body[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length + 1
+            granted.append(0)
+        writer.write(packet(SUBACK, packet_id + bytes(granted)))
+
+
+async def serve(host, port):
+    broker = StubBroker()
+    port = await broker.start(host, port)
+    _LOGGER.info("Stub MQTT broker listening on %s:%d", host, port)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub MQTT broker (plain TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(serve(args.host, args.port))
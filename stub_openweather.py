@@ -0,0 +1,64 @@
+"""
+Local stand-in for the OpenWeather 5-day/3-hour forecast API.
+
+Serves a synthetic 40-entry forecast starting today (UTC) with a configurable
+artificial latency, so the /awsData path can be benchmarked offline:
+
+    python stub_openweather.py --port 9000 --latency-ms 250
+    OPENWEATHER_BASE_URL=http://127.0.0.1:9000 python api.py
+"""
+
+import argparse
+import asyncio
+import math
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI
+
+app = FastAPI()
+
+LATENCY_SECONDS = 0.0
+
+
+def build_forecast(start=None, entries=40):
+    """Deterministic forecast payload shaped like the real API response."""
+    if start is None:
+        now = datetime.now(timezone.utc)
+        start = int(datetime(now.year, now.month, now.day, tzinfo=timezone.utc).timestamp())
+
+    items = []
+    for i in range(entries):
+        phase = math.sin(2 * math.pi * (i % 8) / 8)
+        items.append({
+            "dt": start + i * 3 * 3600,
+            "main": {
+                "temp_min": round(21 + 5 * phase, 2),
+                "temp_max": round(24 + 8 * phase, 2),
+                "humidity": 60 - int(15 * phase),
+            },
+            "wind": {"speed": round(2.5 + phase, 2)},
+            "clouds": {"all": 20 + (i * 7) % 60},
+        })
+
+    return {"cod": "200", "cnt": entries, "list": items}
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(lat: float, lon: float, appid: str = "", units: str = "metric"):
+    if LATENCY_SECONDS:
+        await asyncio.sleep(LATENCY_SECONDS)
+    payload = build_forecast()
+    payload["city"] = {"coord": {"lat": lat, "lon": lon}}
+    return payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenWeather forecast server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    LATENCY_SECONDS = args.latency_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port)
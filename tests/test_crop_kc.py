@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from crop_kc import CROPS, CROP_STAGES, crop_kc, maize_kc, season_days
+
+
+def legacy_maize_kc(das):
+    """The service's original piecewise maize curve."""
+    for d0, d1, kc_start, kc_end in ((0, 25, 0.30, 0.40), (25, 55, 0.40, 0.80), (55, 95, 1.15, 1.20)):
+        if d0 <= das < d1:
+            return kc_start + (kc_end - kc_start) * ((das - d0) / (d1 - d0))
+    if 95 <= das <= 120:
+        return 0.70 + (0.35 - 0.70) * ((das - 95) / 25)
+    return 0.35
+
+
+def test_maize_matches_legacy_curve():
+    das = np.arange(0, 200)
+    np.testing.assert_allclose(crop_kc(das, "maize"), [legacy_maize_kc(d) for d in das], rtol=1e-12)
+
+
+def test_scalar_das_returns_float():
+    kc = maize_kc(60)
+    assert isinstance(kc, float)
+    assert kc == pytest.approx(legacy_maize_kc(60))
+
+
+@pytest.mark.parametrize("crop", CROPS)
+def test_stage_boundaries_and_after_season(crop):
+    stages, after_season = CROP_STAGES[crop]
+    for das_start, _, kc_start, _ in stages:
+        assert crop_kc(das_start, crop) == pytest.approx(kc_start)
+    end = stages[-1][1]
+    assert crop_kc(end, crop) == pytest.approx(stages[-1][3])
+    assert crop_kc(end + 1, crop) == pytest.approx(after_season)
+    assert crop_kc(10_000, crop) == pytest.approx(after_season)
+    assert season_days(crop) == end + 1
+
+
+def test_fao_development_stage_is_linear():
+    # sorghum: ini 20 d at 0.30, development 35 d up to 1.00
+    days = np.arange(35)
+    np.testing.assert_allclose(crop_kc(20 + days, "sorghum"), 0.30 + 0.70 * days / 35, rtol=1e-12)
+    assert crop_kc(55, "sorghum") == pytest.approx(1.00)
+
+
+def test_mixed_crops_match_single_crop_lookups():
+    rng = np.random.default_rng(0)
+    das = rng.integers(0, 200, 400)
+    crops = rng.choice(CROPS, 400)
+
+    mixed = crop_kc(das, list(crops))
+    expected = [crop_kc(int(d), str(c)) for d, c in zip(das, crops)]
+    np.testing.assert_allclose(mixed, expected, rtol=1e-12)
+
+
+def test_fractional_das_use_the_whole_day():
+    assert crop_kc(30.9, "maize") == crop_kc(30, "maize")
+
+
+def test_rejects_negative_das_and_unknown_crops():
+    with pytest.raises(ValueError):
+        crop_kc(-1)
+    with pytest.raises(ValueError):
+        crop_kc([1, -2, 3])
+    with pytest.raises(ValueError, match="Unknown crop"):
+        crop_kc(10, "rice")
+    with pytest.raises(ValueError, match="Unknown crop"):
+        crop_kc([10, 20], ["maize", "rice"])
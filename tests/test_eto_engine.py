@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eto_engine import compute_eto, compute_eto_frame, psychrometric_constant, verify_against_scalar
+from openweather import WeatherETcCalculator
+
+COLUMNS = ["min_temp", "max_temp", "humidity", "wind", "sun_hours", "radiation"]
+
+
+def random_days(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "min_temp": rng.uniform(5, 28, n),
+        "max_temp": rng.uniform(28, 45, n),
+        "humidity": rng.uniform(5, 100, n),
+        "wind": rng.uniform(0, 8, n),
+        "sun_hours": rng.uniform(0, 12, n),
+        "radiation": rng.uniform(5, 32, n),
+    })
+
+
+@pytest.mark.parametrize("altitude", [0, 545, 2000])
+def test_matches_scalar_fao56(altitude):
+    days = random_days(500)
+    calculator = WeatherETcCalculator(altitude=altitude)
+    scalar = [calculator.compute_eto(*row) for row in days[COLUMNS].itertuples(index=False, name=None)]
+
+    np.testing.assert_allclose(compute_eto_frame(days, altitude), scalar, rtol=1e-12)
+
+
+def test_scalar_inputs_give_scalar_output():
+    calculator = WeatherETcCalculator()
+    inputs = (21.0, 33.5, 58.0, 2.4, 8.1, 19.6)
+
+    eto = compute_eto(*inputs)
+    assert np.ndim(eto) == 0
+    assert float(eto) == pytest.approx(calculator.compute_eto(*inputs), rel=1e-12)
+
+
+def test_broadcasts_altitude_per_row():
+    days = random_days(3, seed=1)
+    altitudes = np.array([0.0, 545.0, 2000.0])
+
+    eto = compute_eto(*(days[name].to_numpy() for name in COLUMNS), altitude=altitudes)
+
+    for i, altitude in enumerate(altitudes):
+        calculator = WeatherETcCalculator(altitude=altitude)
+        assert eto[i] == pytest.approx(calculator.compute_eto(*days[COLUMNS].iloc[i]), rel=1e-12)
+
+
+def test_psychrometric_constant_at_sea_level():
+    # FAO-56 Table 2.2: gamma = 0.067 kPa/°C at z = 0
+    assert float(psychrometric_constant(0)) == pytest.approx(0.0674, abs=1e-4)
+    assert psychrometric_constant(1000) < psychrometric_constant(0)
+
+
+def test_verify_against_scalar():
+    max_diff, ok = verify_against_scalar(random_days(100, seed=2))
+    assert ok
+    assert max_diff < 1e-9
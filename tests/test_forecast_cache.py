@@ -0,0 +1,118 @@
+from datetime import date, datetime, timezone
+
+import pytest
+import requests
+
+import openweather
+from openweather import ForecastCache, WeatherETcCalculator
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(openweather.time, "monotonic", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ForecastCache(ttl=600)
+    cache.put("cell", {"day": 1})
+
+    clock.now += 600
+    assert cache.get("cell") == {"day": 1}
+    clock.now += 1
+    assert cache.get("cell") is None
+    assert cache.get("cell") is None        # expired entries are dropped
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_put_refreshes_the_timestamp(clock):
+    cache = ForecastCache(ttl=10)
+    cache.put("cell", 1)
+    clock.now += 8
+    cache.put("cell", 2)
+    clock.now += 8
+    assert cache.get("cell") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ForecastCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1              # "b" is now the oldest
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_clear():
+    cache = ForecastCache()
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+
+
+class Response:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise requests.HTTPError(f"{self.status} error")
+
+    def json(self):
+        return self.payload
+
+
+def forecast_payload():
+    entries = []
+    for hour, (tmin, tmax) in enumerate(((20.0, 25.0), (22.0, 31.0))):
+        dt = datetime(2026, 6, 1, hour * 3, tzinfo=timezone.utc).timestamp()
+        entries.append({
+            "dt": int(dt),
+            "main": {"temp_min": tmin, "temp_max": tmax, "humidity": 40 + 20 * hour},
+            "wind": {"speed": 2.0},
+            "clouds": {"all": 10 * hour},
+        })
+    return {"list": entries}
+
+
+def test_fields_in_one_cell_share_one_upstream_call(monkeypatch):
+    calls = []
+
+    def get(url, timeout):
+        calls.append(url)
+        return Response(forecast_payload())
+
+    monkeypatch.setattr(openweather._http_session, "get", get)
+    cache = ForecastCache()
+    first = WeatherETcCalculator(cache=cache, lat=13.93, lon=7.27, grid_step=0.1)
+    second = WeatherETcCalculator(cache=cache, lat=13.91, lon=7.29, grid_step=0.1)
+    today = date(2026, 6, 1)
+
+    days = first.fetch_forecast_days(today)
+    assert second.fetch_forecast_days(today) is days
+    assert len(calls) == 1
+    assert days == {today: (20.0, 31.0, 50.0, 2.0, 5.0)}
+
+
+def test_upstream_errors_are_not_cached(monkeypatch):
+    responses = [Response({"cod": 429}, status=429), Response(forecast_payload())]
+    monkeypatch.setattr(openweather._http_session, "get", lambda url, timeout: responses.pop(0))
+    calculator = WeatherETcCalculator(cache=ForecastCache())
+    today = date(2026, 6, 1)
+
+    with pytest.raises(requests.HTTPError):
+        calculator.fetch_forecast_days(today)
+    assert today in calculator.fetch_forecast_days(today)
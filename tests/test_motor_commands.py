@@ -0,0 +1,160 @@
+import time
+
+from motor_commands import MotorCommandPublisher
+
+
+class Recorder:
+    """send() stand-in; acks are delivered later, as the broker would."""
+
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.calls = []
+        self._pending = []
+
+    def __call__(self, device_id, state, on_ack):
+        self.calls.append((device_id, state))
+        if self.accept:
+            self._pending.append(on_ack)
+        return self.accept
+
+    def ack_all(self):
+        pending, self._pending = self._pending, []
+        for on_ack in pending:
+            on_ack()
+
+
+def publisher(**kwargs):
+    send = Recorder(kwargs.pop("accept", True))
+    return MotorCommandPublisher(send, **kwargs), send
+
+
+def test_repeated_decisions_are_suppressed():
+    pub, send = publisher()
+    assert pub.submit("node", True)
+    assert pub.flush() == 1
+
+    assert not pub.submit("node", True)      # in flight
+    send.ack_all()
+    assert not pub.submit("node", True)      # acked
+    assert pub.flush() == 0
+
+    assert send.calls == [("node", True)]
+    assert pub.stats()["suppressed"] == 2
+    assert pub.stats()["pending"] == 0
+    assert pub.motors["node"].acked is True
+
+
+def test_burst_coalesces_to_latest_state():
+    pub, send = publisher()
+    pub.submit("node", True)
+    pub.submit("node", False)
+    pub.submit("node", True)
+    assert not pub.submit("node", True)
+
+    assert pub.flush() == 1
+    assert send.calls == [("node", True)]
+    assert pub.coalesced == 2
+    assert pub.suppressed == 1
+
+
+def test_state_prefers_desired_over_acked():
+    pub, send = publisher()
+    assert pub.state("node") is None
+    pub.submit("node", True)
+    pub.flush()
+    send.ack_all()
+    assert pub.state("node") is True
+    pub.submit("node", False)
+    assert pub.state("node") is False
+
+
+def test_min_dwell_holds_a_state_change():
+    pub, send = publisher(min_dwell=30)
+    pub.submit("node", True)
+    pub.flush()
+    send.ack_all()
+    changed_at = pub.motors["node"].changed_at
+
+    pub.submit("node", False)
+    assert pub.flush(now=changed_at + 5) == 0
+    assert pub.flush(now=changed_at + 10) == 0
+    assert pub.held == 1                      # counted once per hold
+
+    assert pub.flush(now=changed_at + 31) == 1
+    assert send.calls == [("node", True), ("node", False)]
+
+
+def test_unacked_command_is_resent_after_timeout():
+    pub, send = publisher(ack_timeout=30)
+    pub.submit("node", True)
+    now = time.time()
+    pub.flush(now=now)
+
+    assert pub.flush(now=now + 10) == 0
+    assert pub.flush(now=now + 31) == 1
+    assert pub.retried == 1
+    assert send.calls == [("node", True), ("node", True)]
+
+    send.ack_all()
+    assert pub.motors["node"].inflight is None
+    assert pub.stats()["pending"] == 0
+
+
+def test_failed_send_is_dropped_until_next_decision():
+    pub, send = publisher(accept=False)
+    pub.submit("node", True)
+    assert pub.flush() == 0
+    assert pub.failed == 1
+    assert pub.stats()["pending"] == 0
+    assert pub.flush() == 0
+
+    send.accept = True
+    assert pub.submit("node", True)
+    assert pub.flush() == 1
+    assert len(send.calls) == 2
+
+
+def test_acked_state_is_republished_after_refresh_interval():
+    pub, send = publisher(refresh_interval=60, min_dwell=30)
+    pub.submit("node", True)
+    pub.flush()
+    send.ack_all()
+
+    assert not pub.submit("node", True)
+    pub.motors["node"].acked_at -= 61
+    assert pub.submit("node", True)
+    assert pub.flush() == 1                   # not held by min_dwell
+    assert pub.refreshed == 1
+    send.ack_all()
+
+    assert not pub.submit("node", True)       # acked again just now
+    assert send.calls == [("node", True), ("node", True)]
+
+
+def test_zero_refresh_interval_never_republishes():
+    pub, send = publisher(refresh_interval=0)
+    pub.submit("node", True)
+    pub.flush()
+    send.ack_all()
+    pub.motors["node"].acked_at -= 10 ** 6
+
+    assert not pub.submit("node", True)
+    assert pub.flush() == 0
+
+
+def test_explicit_refresh():
+    pub, send = publisher(min_dwell=30)
+    assert not pub.refresh("node")            # unknown motor
+
+    pub.submit("node", False)
+    pub.flush()
+    assert not pub.refresh("node")            # nothing acked yet
+    send.ack_all()
+
+    assert pub.refresh("node")
+    assert not pub.refresh("node")            # already pending
+    assert pub.flush() == 1
+    assert send.calls == [("node", False), ("node", False)]
+    assert pub.refreshed == 1
+    send.ack_all()
+    assert pub.stats()["pending"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+
+import paho.mqtt.client as mqtt
+
+from mqtt_async import AsyncMqttClient
+
+
+class Result:
+    def __init__(self, rc, mid):
+        self.rc = rc
+        self.mid = mid
+
+    def is_published(self):
+        return True
+
+
+class FakeClient:
+    """paho Client stand-in: rejects wildcard topics like paho 2.x does."""
+
+    def __init__(self, rc=mqtt.MQTT_ERR_SUCCESS):
+        self.rc = rc
+        self.published = []
+
+    def publish(self, topic, payload, qos=0):
+        if "+" in topic or "#" in topic:
+            raise ValueError("Publish topic cannot contain wildcards.")
+        self.published.append(topic)
+        return Result(self.rc, len(self.published))
+
+    def is_connected(self):
+        return False
+
+
+async def run_publishes(client, messages):
+    wrapper = AsyncMqttClient(client, "localhost", 1883, name="test")
+    await wrapper.start()
+    for task in wrapper._tasks:
+        if task.get_name() != "test-publish":
+            task.cancel()
+    wrapper._connected.set()
+
+    acked = []
+    done = asyncio.Event()
+    for topic in messages:
+        wrapper.publish_nowait(topic, b"1", on_ack=lambda topic=topic: acked.append(topic))
+    wrapper.publish_nowait("done", b"", qos=0, on_ack=done.set)
+    if client.rc == mqtt.MQTT_ERR_SUCCESS:
+        await asyncio.wait_for(done.wait(), 5)
+    else:
+        while not wrapper._publish_queue.empty():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+    await wrapper.stop()
+    return wrapper, acked
+
+
+def test_rejected_topic_does_not_stop_publishing():
+    client = FakeClient()
+    wrapper, acked = asyncio.run(run_publishes(client, ["irregation/a+b/motor", "irregation/ok/motor"]))
+
+    assert client.published == ["irregation/ok/motor", "done"]
+    assert acked == ["irregation/ok/motor"]
+    assert wrapper.dropped_publishes == 1
+
+
+def test_failed_publish_is_dropped_not_acked():
+    client = FakeClient(rc=mqtt.MQTT_ERR_NO_CONN)
+    wrapper, acked = asyncio.run(run_publishes(client, ["irregation/ok/motor"]))
+
+    assert client.published == ["irregation/ok/motor", "done"]
+    assert acked == []
+    assert wrapper.dropped_publishes == 2
@@ -0,0 +1,137 @@
+import time
+
+import numpy as np
+import pytest
+
+from sensor_store import DeviceSeries, SensorStore, capacity_for, read_segment, segment_filename
+
+
+def test_capacity_follows_retention_and_rate():
+    assert capacity_for(86_400) == 86_400
+    assert capacity_for(86_400, 1 / 60) == 1440
+    assert capacity_for(10, 0.01) == 1
+    assert SensorStore(retention=3600, rate_hz=0.5).capacity == 1800
+
+
+def test_delivered_volume_sums_counter_increments():
+    store = SensorStore()
+    now = time.time()
+    for i, counter in enumerate((10.0, 12.0, 12.0, 15.5)):
+        store.ingest("node", counter, 30.0 + i, ts=now - 40 + i * 10)
+
+    stats = store.aggregate("node")
+    assert stats["samples"] == 4
+    assert stats["delivered_volume"] == pytest.approx(5.5)
+    assert stats["mean_soil_moisture"] == pytest.approx(31.5)
+    assert stats["last_ts"] == pytest.approx(now - 10)
+
+
+def test_counter_reset_after_reboot_counts_from_zero():
+    store = SensorStore()
+    now = time.time()
+    for i, counter in enumerate((100.0, 104.0, 3.0, 5.0)):
+        store.ingest("node", counter, 20.0, ts=now - 40 + i * 10)
+
+    # 4 before the reboot, 3 since the counter restarted, then 2 more
+    assert store.aggregate("node")["delivered_volume"] == pytest.approx(9.0)
+
+
+def test_since_limits_the_window():
+    store = SensorStore()
+    now = time.time()
+    for i in range(5):
+        store.ingest("node", float(i), 10.0 * i, ts=now - 50 + i * 10)
+
+    stats = store.aggregate("node", since=now - 25)
+    assert stats["samples"] == 2
+    assert stats["delivered_volume"] == pytest.approx(1.0)
+    assert stats["mean_soil_moisture"] == pytest.approx(35.0)
+
+
+def test_samples_older_than_retention_are_ignored():
+    store = SensorStore(retention=60)
+    now = time.time()
+    store.ingest("node", 1.0, 10.0, ts=now - 3600)
+    store.ingest("node", 2.0, 20.0, ts=now - 30)
+
+    assert store.aggregate("node")["samples"] == 1
+    assert store.aggregate("node", since=0)["samples"] == 1
+
+
+def test_unknown_device_and_empty_window():
+    store = SensorStore()
+    empty = {"samples": 0, "delivered_volume": 0.0, "mean_soil_moisture": None, "last_ts": None}
+    assert store.aggregate("missing") == empty
+    assert store.latest("missing") is None
+
+    store.ingest("node", 1.0, 1.0, ts=time.time() - 100)
+    assert store.aggregate("node", since=time.time()) == empty
+
+
+def test_latest_returns_most_recent_sample():
+    store = SensorStore()
+    store.ingest("node", 1.0, 40.0, ts=100.0)
+    store.ingest("node", 2.5, 41.0, ts=101.0)
+    assert store.latest("node") == (101.0, 2.5, 41.0)
+    assert store.devices() == ["node"]
+
+
+def test_series_grows_lazily_up_to_capacity():
+    series = DeviceSeries(capacity=10, initial_capacity=2)
+    assert len(series.ts) == 2
+
+    for i in range(5):
+        series.append(float(i), float(i), 0.0)
+    assert len(series.ts) == 8
+    np.testing.assert_array_equal(series.window()[0], np.arange(5.0))
+
+    for i in range(5, 12):
+        series.append(float(i), float(i), 0.0)
+    assert len(series.ts) == 10
+    np.testing.assert_array_equal(series.window()[0], np.arange(2.0, 12.0))
+
+
+def test_ring_overwrites_oldest_samples():
+    series = DeviceSeries(capacity=4, initial_capacity=4)
+    for i in range(7):
+        series.append(float(i), float(i) * 2, float(i) * 3)
+
+    ts, wf, sm = series.window()
+    np.testing.assert_array_equal(ts, [3.0, 4.0, 5.0, 6.0])
+    np.testing.assert_array_equal(wf, [6.0, 8.0, 10.0, 12.0])
+    np.testing.assert_array_equal(sm, [9.0, 12.0, 15.0, 18.0])
+    np.testing.assert_array_equal(series.window(since=4.5)[0], [5.0, 6.0])
+    assert series.latest() == (6.0, 12.0, 18.0)
+
+
+def test_segment_files_keep_every_sample(tmp_path):
+    store = SensorStore(capacity=2, segment_dir=str(tmp_path))
+    for i in range(3):
+        store.ingest("node", float(i), 50.0, ts=float(i))
+    store.close()
+
+    records = read_segment(tmp_path / "node.seg")
+    np.testing.assert_array_equal(records["ts"], [0.0, 1.0, 2.0])
+    np.testing.assert_array_equal(records["water_flow"], [0.0, 1.0, 2.0])
+
+
+def test_segment_names_stay_inside_the_segment_dir(tmp_path):
+    segments = tmp_path / "segments"
+    store = SensorStore(segment_dir=str(segments))
+    for device_id in ("../escaped", "..", "a/b", "node-1"):
+        store.ingest(device_id, 1.0, 1.0, ts=1.0)
+    store.close()
+
+    assert not (tmp_path / "escaped.seg").exists()
+    assert sorted(p.name for p in segments.iterdir()) == sorted(["...seg", "..%2Fescaped.seg", "a%2Fb.seg", "node-1.seg"])
+    assert segment_filename("node-1") == "node-1.seg"
+
+
+def test_new_devices_are_refused_once_full():
+    store = SensorStore(max_devices=2)
+    store.ingest("a", 1.0, 1.0)
+    store.ingest("b", 1.0, 1.0)
+    with pytest.raises(ValueError, match="full"):
+        store.ingest("c", 1.0, 1.0)
+    store.ingest("a", 2.0, 1.0)
+    assert sorted(store.devices()) == ["a", "b"]
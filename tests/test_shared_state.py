@@ -0,0 +1,212 @@
+import multiprocessing
+import time
+from datetime import date
+
+import numpy as np
+import pytest
+
+import shared_state
+from sensor_store import start_of_today
+from shared_state import SharedSensorView, SharedState, acquire_ingest_lock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state")
+
+
+@pytest.fixture
+def state(path):
+    state = SharedState(path, capacity=8, create=True)
+    yield state
+    state.close()
+
+
+def today(i):
+    return {"samples": i, "delivered_volume": float(i), "mean_soil_moisture": float(i), "last_ts": float(i)}
+
+
+def test_slots_are_allocated_once_and_seen_by_other_mappings(state, path):
+    other = SharedState.open(path)
+
+    assert state.slot("a") is None
+    assert state.slot("a", allocate=True) == 0
+    assert state.slot("b", allocate=True) == 1
+    assert other.slot("b", allocate=True) == 1     # found, not re-allocated
+    assert other.slot("a") == 0
+    assert state.device_ids() == other.device_ids() == ["a", "b"]
+    assert state.get("count") == 2
+
+
+def test_full_table_rejects_new_devices(state):
+    for i in range(8):
+        state.slot(f"node-{i}", allocate=True)
+    with pytest.raises(ValueError, match="full"):
+        state.slot("one-too-many", allocate=True)
+    assert state.slot("node-7", allocate=True) == 7
+
+
+def test_over_long_names_are_rejected_not_truncated(state):
+    long_id = "x" * (shared_state.DEVICE_ID_BYTES + 1)
+    with pytest.raises(ValueError, match="Device id"):
+        state.slot(long_id, allocate=True)
+    with pytest.raises(ValueError, match="Device id"):
+        state.write(long_id, samples=1)
+    with pytest.raises(ValueError, match="Site"):
+        state.register("node", date(2026, 6, 1), "maize", "x" * (shared_state.SITE_BYTES + 1))
+    assert state.get("count") == 0
+
+    exact = "x" * shared_state.DEVICE_ID_BYTES
+    state.write(exact, samples=1)
+    assert state.device_ids() == [exact]
+
+
+@pytest.mark.parametrize("name", ["a+b", "a/b", "#", "a\x00b", "..", ".", "a..b", "x y", "é", "", "node\n"])
+def test_names_that_are_not_topic_or_path_safe_are_rejected(state, name):
+    with pytest.raises(ValueError, match="Device id"):
+        shared_state.check_name("Device id", name, shared_state.DEVICE_ID_BYTES)
+    with pytest.raises(ValueError):
+        state.slot(name, allocate=True)
+    assert state.get("count") == 0
+
+
+@pytest.mark.parametrize("name", ["default", "node-1", "field_2.north", "a.b.c", "esp32:aa@farm"])
+def test_safe_names_are_accepted(name):
+    assert shared_state.check_name("Device id", name, shared_state.DEVICE_ID_BYTES) == name.encode()
+
+
+def test_registration_and_decision_round_trip(state, path):
+    reader = SharedState.open(path)
+    state.register("node", date(2026, 6, 1), "maize", "north")
+    state.update_decision("node", {"motor": True, "threshold": np.float64(2.5)})
+
+    row = reader.read("node")
+    assert shared_state.registration(row) == (date(2026, 6, 1).toordinal(), "maize", "north")
+    assert shared_state.decision(row) == {"motor": True, "threshold": 2.5}
+    assert reader.get("registrations") == 1
+    assert reader.read("missing") is None
+
+    state.write("unregistered", samples=0)
+    assert shared_state.registration(reader.read("unregistered")) is None
+    assert shared_state.decision(reader.read("unregistered")) is None
+
+
+def test_oversized_decision_is_rejected(state):
+    with pytest.raises(ValueError, match="larger"):
+        state.update_decision("node", {"note": "x" * shared_state.DECISION_BYTES})
+
+
+def test_blobs(state, path):
+    reader = SharedState.open(path)
+    assert reader.get_blob("motors", {}) == {}
+
+    state.put_blob("control", {"a": 1})
+    assert reader.get_blob("control") == {"a": 1}
+    assert state.update_blob("sites", lambda sites: {**sites, "x": [1, 2]}, {}) == {"x": [1, 2]}
+    assert state.update_blob("sites", lambda sites: {**sites, "y": 3}, {}) == {"x": [1, 2], "y": 3}
+    assert reader.get_blob("sites") == {"x": [1, 2], "y": 3}
+
+
+def test_header_counters(state):
+    assert state.bump("evaluate_requests") == 1
+    assert state.bump("evaluate_requests") == 2
+    state.set_fields(heartbeat=12.5, sensor_connected=1)
+    assert state.get("heartbeat") == 12.5
+    assert state.get("sensor_connected") == 1
+
+
+def test_open_missing_or_foreign_file(tmp_path):
+    assert SharedState.open(str(tmp_path / "missing")) is None
+    foreign = tmp_path / "foreign"
+    foreign.write_bytes(b"\0" * shared_state.file_size(1))
+    assert SharedState.open(str(foreign)) is None
+
+
+def test_reinitializing_in_place_keeps_existing_mappings_valid(state, path):
+    reader = SharedState.open(path)
+    state.write("node", samples=3)
+    assert reader.read("node")["samples"] == 3
+
+    SharedState(path, capacity=8, create=True).close()
+    assert reader.read("node") is None
+    assert reader.get("count") == 0
+    state.write("other", samples=1)
+    assert reader.slot("other") == 0
+
+
+def test_ingest_lock_is_exclusive(path):
+    holder = acquire_ingest_lock(path)
+    assert holder is not None
+    # flock is per open file description, so a second open in this process competes too
+    assert acquire_ingest_lock(path) is None
+    holder.close()
+    second = acquire_ingest_lock(path)
+    assert second is not None
+    second.close()
+
+
+def test_sensor_view(state, path):
+    view = SharedSensorView(SharedState.open(path))
+    state.write("registered-only", samples=0)
+    assert view.devices() == []
+    assert view.latest("registered-only") is None
+    assert view.aggregate("registered-only") == SharedSensorView.EMPTY
+
+    state.update_sensor("node", (100.0, 4.0, 31.0), today(5), start_of_today())
+    assert view.devices() == ["node"]
+    assert view.latest("node") == (100.0, 4.0, 31.0)
+    assert view.aggregate("node") == today(5)
+    assert view.delivered_today("node") == 5.0
+
+    # yesterday's aggregate is stale
+    state.update_sensor("node", (100.0, 4.0, 31.0), today(5), start_of_today() - 86_400)
+    assert view.aggregate("node") == SharedSensorView.EMPTY
+
+
+def _write_rows(path, count):
+    writer = SharedState(path)
+    for i in range(count):
+        writer.update_sensor("node", (float(i), float(i), float(i)), today(i), float(i))
+    writer.close()
+
+
+def test_readers_never_see_a_torn_row(state, path):
+    state.slot("node", allocate=True)
+    writer = multiprocessing.get_context("fork").Process(target=_write_rows, args=(path, 20_000))
+    writer.start()
+
+    reads = 0
+    deadline = time.monotonic() + 60
+    while writer.is_alive() and time.monotonic() < deadline:
+        row = state.read("node")
+        if np.isnan(row["latest_ts"]):
+            continue
+        values = {float(row[field]) for field in (
+            "latest_ts", "water_flow", "soil_moisture", "day_start",
+            "delivered_volume", "mean_soil_moisture", "last_ts",
+        )}
+        values.add(float(row["samples"]))
+        assert len(values) == 1, row
+        assert not int(row["seq"]) & 1
+        reads += 1
+    writer.join(60)
+
+    assert writer.exitcode == 0
+    assert reads > 0
+    assert state.read("node")["samples"] == 19_999
+
+
+def mapped(path):
+    with open("/proc/self/maps") as maps:
+        return sum(line.rstrip().endswith(path) for line in maps)
+
+
+def test_close_releases_the_mapping(state, path):
+    state.write("node", samples=1)
+    before = mapped(path)
+    with SharedState.open(path) as other:
+        row = other.read("node")
+        assert mapped(path) == before + 1
+    assert mapped(path) == before
+    assert other._write_lock_file.closed
+    assert row["samples"] == 1              # rows are copies
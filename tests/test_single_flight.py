@@ -0,0 +1,168 @@
+import asyncio
+import threading
+
+from openweather import AsyncSingleFlight, SingleFlight, WeatherService, snap_to_grid
+
+
+def test_snap_to_grid():
+    assert snap_to_grid(13.936811, 7.270029, 0.1) == (13.9, 7.3)
+    assert snap_to_grid(13.91, 7.29, 0.1) == snap_to_grid(13.94, 7.26, 0.1)
+    assert snap_to_grid(-0.04, 0.04, 0.1) == (-0.0, 0.0)
+    assert snap_to_grid(13.9368114, 7.2700291, 0) == (13.936811, 7.270029)
+
+
+class CountingLock:
+    """
+    Stand-in for SingleFlight's lock that counts released critical sections.
+    A follower that has left the section while the leader is still running
+    holds the leader's future, so waiting on the count needs no sleeps.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._released = threading.Condition()
+        self.count = 0
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+        with self._released:
+            self.count += 1
+            self._released.notify_all()
+
+    def wait_for(self, count):
+        with self._released:
+            assert self._released.wait_for(lambda: self.count >= count, timeout=5)
+
+
+def counted_flight():
+    flight = SingleFlight()
+    flight._lock = CountingLock()
+    return flight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = counted_flight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "forecast"
+
+    def call():
+        results.append(flight.do("cell", work))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    flight._lock.wait_for(1 + len(followers))      # the leader's entry plus one per follower
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("forecast", False)] + [("forecast", True)] * 4
+    assert flight._calls == {}
+
+
+def test_exception_reaches_every_waiter_and_is_not_kept():
+    flight = counted_flight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    def call():
+        try:
+            flight.do("cell", fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    flight._lock.wait_for(2)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ["upstream down"] * 2
+    assert flight.do("cell", lambda: "ok") == ("ok", False)
+
+
+def test_async_awaiters_share_one_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "forecast"
+
+    async def main():
+        results = await asyncio.gather(*(flight.do("cell", fetch) for _ in range(5)))
+        assert flight._tasks == {}
+        return results, await flight.do("cell", fetch)
+
+    results, again = asyncio.run(main())
+    assert len(calls) == 2
+    assert results == [("forecast", False)] + [("forecast", True)] * 4
+    assert again == ("forecast", False)
+
+
+def test_cancelled_awaiter_does_not_cancel_the_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "forecast"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("cell", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("cell", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == ("forecast", True)
+
+
+def test_async_exception_is_shared():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("cell", fail) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert [str(e) for e in errors] == ["upstream down"] * 3
+
+
+def test_weather_service_groups_sites_by_cell():
+    service = WeatherService(grid_step=0.1)
+    service.add_site("north", 13.91, 7.29)
+    service.add_site("south", 13.94, 7.26)
+    service.add_site("far", 12.0, 8.0)
+
+    assert service.cells() == {(13.9, 7.3): ["north", "south"], (12.0, 8.0): ["far"]}
+    assert service.cells(["far"]) == {(12.0, 8.0): ["far"]}
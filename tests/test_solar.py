@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from solar import RadiationTables, estimate_radiation, extraterrestrial_radiation, solar_geometry
+
+
+def test_fao56_example_8_and_9():
+    # 20°S on 3 September (day 246): Ra = 32.2 MJ/m²/day, N = 11.7 h
+    Ra, daylight = solar_geometry(-20, 246)
+    assert float(Ra) == pytest.approx(32.2, abs=0.05)
+    assert float(daylight) == pytest.approx(11.7, abs=0.05)
+
+
+def test_polar_day_and_night_are_clipped():
+    _, summer = solar_geometry(80, 172)
+    Ra_winter, winter = solar_geometry(80, 355)
+    assert float(summer) == pytest.approx(24)
+    assert float(winter) == pytest.approx(0)
+    assert float(Ra_winter) == pytest.approx(0, abs=1e-9)
+
+
+def test_table_lookup_matches_direct_computation():
+    tables = RadiationTables()
+    for lat, day in ((13.936811, 1), (13.936811, 366), (-33.9, 200), (51.5, 80)):
+        Ra, daylight = tables.lookup(lat, day)
+        expected_Ra, expected_daylight = solar_geometry(lat, day)
+        assert float(Ra) == pytest.approx(float(expected_Ra), rel=1e-12)
+        assert float(daylight) == pytest.approx(float(expected_daylight), rel=1e-12)
+
+
+def test_array_lookup_over_sites_and_days():
+    tables = RadiationTables()
+    lats = np.array([[10.0], [20.0], [10.0]])
+    days = np.array([[1, 100, 366]])
+
+    Ra, daylight = tables.lookup(lats, days)
+    expected_Ra, expected_daylight = solar_geometry(lats, days)
+
+    assert Ra.shape == (3, 3)
+    np.testing.assert_allclose(Ra, expected_Ra, rtol=1e-12)
+    np.testing.assert_allclose(daylight, expected_daylight, rtol=1e-12)
+    assert len(tables) == 2         # repeated latitudes share a row
+
+
+def test_latitudes_beyond_max_sites_are_computed_directly():
+    tables = RadiationTables(max_sites=1)
+    tables.lookup(10.0, 50)
+    Ra, _ = tables.lookup(np.array([10.0, 45.0]), np.array([50, 50]))
+
+    assert len(tables) == 1
+    np.testing.assert_allclose(Ra, solar_geometry(np.array([10.0, 45.0]), 50)[0], rtol=1e-12)
+    assert float(tables.lookup(45.0, 50)[0]) == pytest.approx(float(solar_geometry(45.0, 50)[0]))
+
+
+def test_site_tables_are_read_only():
+    Ra, daylight = RadiationTables().site(12.5)
+    assert Ra.shape == daylight.shape == (366,)
+    with pytest.raises(ValueError):
+        Ra[0] = 0
+
+
+def test_day_of_year_is_validated():
+    with pytest.raises(ValueError):
+        extraterrestrial_radiation(10.0, 0)
+    with pytest.raises(ValueError):
+        extraterrestrial_radiation(10.0, np.array([1, 367]))
+
+
+def test_estimate_radiation_scales_with_cloud_cover():
+    Ra, _ = extraterrestrial_radiation(13.9, 150)
+
+    sun_hours, radiation = estimate_radiation(13.9, 0, 150)
+    assert sun_hours == pytest.approx(12)
+    assert radiation == pytest.approx(0.75 * Ra)
+
+    sun_hours, radiation = estimate_radiation(13.9, np.array([100.0, 50.0]), 150)
+    np.testing.assert_allclose(sun_hours, [0, 6])
+    np.testing.assert_allclose(radiation, [0.25 * Ra, 0.5 * Ra])
@@ -0,0 +1,194 @@
+"""
+Train the LightGBM, XGBoost and GradientBoosting ETo regressors in one run.
+
+The feature matrix is built once (float32, FEATURES order) and shared by all
+models. LightGBM and XGBoost use all cores through their native threading;
+sklearn's GradientBoostingRegressor has no threaded fit and runs on one core.
+
+Each run writes models/<version>/eto_<name>_model.pkl plus metrics.json
+(train time, MAE/RMSE/R², single-row and batch inference latency).
+
+    python train_models.py                 # train all three
+    python train_models.py --publish       # ...and copy to the paths api.py loads
+                                           #    (re-exporting eto_lightgbm_model.txt)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMRegressor
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from xgboost import XGBRegressor
+
+from dataset_builder import CLEANED_CSV
+from ml_predit import CSV_COLUMNS, FEATURES, LGBM_NATIVE, LGBM_PICKLE, export_native
+
+MODELS_DIR = "models"
+LATENCY_ROUNDS = 200
+
+# Same hyperparameters as the original model.ipynb runs
+MODEL_FACTORIES = {
+    "lightgbm": lambda: LGBMRegressor(
+        n_estimators=500,
+        learning_rate=0.05,
+        max_depth=-1,
+        num_leaves=31,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=42,
+        n_jobs=-1,
+        verbose=-1
+    ),
+    "xgboost": lambda: XGBRegressor(
+        n_estimators=400,
+        learning_rate=0.05,
+        max_depth=6,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        objective="reg:squarederror",
+        random_state=42,
+        n_jobs=-1
+    ),
+    "gradient_boosting": lambda: GradientBoostingRegressor(
+        n_estimators=300,
+        learning_rate=0.05,
+        max_depth=4,
+        random_state=42
+    ),
+}
+
+
+def artifact_name(name):
+    return f"eto_{name}_model.pkl"
+
+
+# ---------------------------------------------------
+# Feature matrix
+# ---------------------------------------------------
+def load_training_frame(source=None):
+    """
+    Cleaned history with model column names. Reads the Parquet store when
+    it exists, the cleaned CSV otherwise.
+    """
+    from eto_store import STORE_DIR, load_frame
+
+    source = source or (STORE_DIR if os.path.isdir(STORE_DIR) else CLEANED_CSV)
+    if os.path.isdir(source):
+        return load_frame(FEATURES + ["eto"], root=source)
+
+    df = pd.read_csv(source).rename(columns=CSV_COLUMNS)
+    return df[FEATURES + ["eto"]].apply(pd.to_numeric, errors="coerce")
+
+
+def build_feature_matrix(df):
+    """(X float32 C-contiguous, y float32) with incomplete rows dropped."""
+    df = df[FEATURES + ["eto"]].dropna()
+    X = np.ascontiguousarray(df[FEATURES].to_numpy(dtype=np.float32))
+    y = df["eto"].to_numpy(dtype=np.float32)
+    return X, y
+
+
+# ---------------------------------------------------
+# Metrics
+# ---------------------------------------------------
+def measure_latency(model, X, rounds=LATENCY_ROUNDS):
+    single = X[:1]
+    model.predict(single)   # warm-up
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        model.predict(single)
+        timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    model.predict(X)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "single_row_p50_ms": float(np.percentile(timings, 50) * 1000),
+        "single_row_p95_ms": float(np.percentile(timings, 95) * 1000),
+        "batch_rows": int(len(X)),
+        "batch_rows_per_sec": float(len(X) / batch_seconds) if batch_seconds else None,
+    }
+
+
+def train_one(name, X_train, y_train, X_test, y_test):
+    model = MODEL_FACTORIES[name]()
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - start
+
+    y_pred = model.predict(X_test)
+    metrics = {
+        "train_seconds": train_seconds,
+        "mae": float(mean_absolute_error(y_test, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "r2": float(r2_score(y_test, y_pred)),
+        "latency": measure_latency(model, X_test),
+    }
+    return model, metrics
+
+
+# ---------------------------------------------------
+# Pipeline
+# ---------------------------------------------------
+def train_all(names=None, source=None, models_dir=MODELS_DIR, publish=False):
+    names = names or list(MODEL_FACTORIES)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out_dir = os.path.join(models_dir, version)
+    os.makedirs(out_dir, exist_ok=True)
+
+    X, y = build_feature_matrix(load_training_frame(source))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    report = {
+        "version": version,
+        "features": FEATURES,
+        "rows": int(len(X)),
+        "models": {},
+    }
+
+    for name in names:
+        model, metrics = train_one(name, X_train, y_train, X_test, y_test)
+        path = os.path.join(out_dir, artifact_name(name))
+        joblib.dump(model, path)
+        metrics["artifact"] = path
+        report["models"][name] = metrics
+
+        print(f"{name:18s} train={metrics['train_seconds']:.2f}s "
+              f"MAE={metrics['mae']:.4f} RMSE={metrics['rmse']:.4f} "
+              f"p50={metrics['latency']['single_row_p50_ms']:.3f}ms")
+
+        if publish:
+            shutil.copyfile(path, artifact_name(name))
+            # api.py prefers the native dump, so it must follow the new pickle
+            if artifact_name(name) == LGBM_PICKLE:
+                export_native(LGBM_PICKLE, LGBM_NATIVE)
+
+    with open(os.path.join(out_dir, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train all ETo models from one feature matrix")
+    parser.add_argument("--source", help="Parquet store directory or cleaned CSV (default: store if built)")
+    parser.add_argument("--models", nargs="+", choices=list(MODEL_FACTORIES), help="subset to train")
+    parser.add_argument("--out", default=MODELS_DIR)
+    parser.add_argument("--publish", action="store_true", help="copy artifacts to the repo root for api.py")
+    args = parser.parse_args()
+
+    report = train_all(args.models, args.source, args.out, args.publish)
+    print(f"Artifacts and metrics written to {os.path.join(args.out, report['version'])}")